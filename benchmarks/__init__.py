@@ -0,0 +1,22 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Les modules du serveur s'importent à plat (import forest, import metrics...)
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+# Modèle, registre et grilles du dépôt par défaut, quel que soit le répertoire courant
+os.environ.setdefault("MODEL_PATH", os.path.join(SERVER_DIR, "iris_model.joblib"))
+os.environ.setdefault("MODEL_REGISTRY_DIR", os.path.join(SERVER_DIR, "models"))
+os.environ.setdefault("GRID_DIR", os.path.join(SERVER_DIR, "grids"))
+
+# État d'exécution (dérive, fenêtres de monitoring) dans un répertoire
+# temporaire : les défauts du serveur sont relatifs au répertoire courant
+STATE_DIR = tempfile.mkdtemp(prefix="iris_bench_")
+atexit.register(shutil.rmtree, STATE_DIR, ignore_errors=True)
+os.environ.setdefault("DRIFT_DIR", os.path.join(STATE_DIR, "drift_state"))
+os.environ.setdefault("MONITOR_DIR", os.path.join(STATE_DIR, "monitor_state"))
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from . import results
+
+
+def _add_output(parser):
+    parser.add_argument("--output", help="Fichier JSON du résultat (défaut: benchmarks/results/<type>-<date>.json)")
+    parser.add_argument("--baseline", help="Résultat de référence à comparer")
+    parser.add_argument("--max-throughput-drop", type=float, default=results.DEFAULT_THRESHOLDS["throughput"],
+                        help="Baisse relative de débit tolérée (défaut: %(default)s)")
+    parser.add_argument("--max-latency-increase", type=float, default=results.DEFAULT_THRESHOLDS["latency"],
+                        help="Hausse relative de latence tolérée (défaut: %(default)s)")
+
+
+def _thresholds(args):
+    return {"throughput": args.max_throughput_drop, "latency": args.max_latency_increase}
+
+
+def _check(baseline, report, args):
+    # Code de sortie 1 si une métrique dépasse son seuil
+    if baseline.get("config") != report.get("config"):
+        print("Attention: configurations différentes, comparaison indicative", file=sys.stderr)
+    rows = results.compare(baseline, report, _thresholds(args))
+    results.print_comparison(rows)
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks du service d'inférence")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = commands.add_parser("load", help="Test de charge HTTP")
+    load_parser.add_argument("--target", default="asgi",
+                             help="asgi (en mémoire), local (uvicorn sur un port libre) ou URL d'un serveur")
+    load_parser.add_argument("--mix", default="predict=1", help="Répartition des routes, ex. predict=8,batch=1,bulk=1")
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--duration", type=float, default=10.0, help="Durée mesurée (secondes)")
+    load_parser.add_argument("--warmup", type=float, default=1.0, help="Chauffe non mesurée (secondes)")
+    load_parser.add_argument("--distinct-rows", type=int, default=1000,
+                             help="Mesures différentes envoyées sur /predict/ (influe sur le cache)")
+    load_parser.add_argument("--batch-rows", type=int, default=100, help="Lignes par requête batch/bulk")
+    load_parser.add_argument("--pid", type=int, help="Pid du serveur distant pour mesurer CPU/RSS (psutil)")
+    load_parser.add_argument("--seed", type=int, default=0)
+    _add_output(load_parser)
+
+    model_parser = commands.add_parser("model", help="Micro-benchmark de l'appel au modèle")
+    model_parser.add_argument("--model-path")
+    model_parser.add_argument("--batch-sizes", default=",".join(str(size) for size in (1, 8, 64, 512, 4096)))
+    model_parser.add_argument("--min-time", type=float, default=0.2)
+    model_parser.add_argument("--repeat", type=int, default=5)
+    _add_output(model_parser)
+
+    replay_parser = commands.add_parser("replay", help="Rejoue une capture de trafic (CAPTURE_ENABLED=1)")
+    replay_parser.add_argument("capture", nargs="+", help="Fichiers JSONL de capture (un par worker)")
+    replay_parser.add_argument("--target", default="local",
+                               help="asgi (en mémoire), local (uvicorn sur un port libre) ou URL d'un serveur")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="Facteur de vitesse : 1 = rythme d'origine, 2 = deux fois plus vite, 0 = débit maximal")
+    replay_parser.add_argument("--concurrency", type=int, default=64, help="Requêtes simultanées en débit maximal")
+    replay_parser.add_argument("--limit", type=int, help="Nombre maximal de requêtes rejouées")
+    _add_output(replay_parser)
+
+    compare_parser = commands.add_parser("compare", help="Compare deux résultats JSON")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--max-throughput-drop", type=float, default=results.DEFAULT_THRESHOLDS["throughput"])
+    compare_parser.add_argument("--max-latency-increase", type=float, default=results.DEFAULT_THRESHOLDS["latency"])
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return _check(results.load(args.baseline), results.load(args.current), args)
+
+    if args.command == "load":
+        from . import load
+        try:
+            mix = load.parse_mix(args.mix)
+        except ValueError as e:
+            parser.error(str(e))
+        report = asyncio.run(load.run(
+            target=args.target,
+            mix=mix,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+            distinct_rows=args.distinct_rows,
+            batch_rows=args.batch_rows,
+            pid=args.pid,
+            seed=args.seed,
+        ))
+    elif args.command == "replay":
+        from . import replay
+        report = asyncio.run(replay.run(
+            args.capture,
+            target=args.target,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            limit=args.limit,
+        ))
+    else:
+        from . import model
+        report = model.run(
+            model_path=args.model_path,
+            batch_sizes=[int(size) for size in args.batch_sizes.split(",")],
+            min_time=args.min_time,
+            repeat=args.repeat,
+        )
+
+    json.dump(report["results"], sys.stdout, indent=2)
+    print()
+    print(f"Résultat enregistré: {results.save(report, args.output)}")
+
+    if args.baseline:
+        return _check(results.load(args.baseline), report, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import asyncio
+import contextlib
+import io
+import random
+import socket
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from . import results
+
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# Bornes des curseurs du client : mêmes valeurs que la grille du serveur
+LOW = np.array([4.0, 2.0, 1.0, 0.1])
+HIGH = np.array([8.0, 4.5, 7.0, 2.5])
+
+ROUTES = ("predict", "batch", "bulk")
+
+
+def parse_mix(text):
+    # "predict=8,batch=1" -> {"predict": 8.0, "batch": 1.0}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Route inconnue: {name} (possibles: {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class RequestFactory:
+    # Corps de requête précalculés : la génération ne pèse pas sur la mesure
+
+    def __init__(self, distinct_rows=1000, batch_rows=100, seed=0):
+        rng = np.random.default_rng(seed)
+        self.rows = np.round(LOW + rng.random((distinct_rows, 4)) * (HIGH - LOW), 1)
+        self.batch_rows = batch_rows
+        self._rng = random.Random(seed)
+
+        self._predict = [dict(zip(FEATURES, row.tolist())) for row in self.rows]
+        batch = self.rows[rng.integers(0, distinct_rows, batch_rows)]
+        self._batch = {name: batch[:, i].tolist() for i, name in enumerate(FEATURES)}
+        buffer = io.BytesIO()
+        np.save(buffer, batch.astype(np.float32))
+        self._bulk = buffer.getvalue()
+
+    def build(self, route):
+        if route == "predict":
+            return {"method": "POST", "url": "/predict/", "json": self._rng.choice(self._predict)}
+        if route == "batch":
+            return {"method": "POST", "url": "/predict/batch", "json": self._batch}
+        return {
+            "method": "POST",
+            "url": "/predict/bulk",
+            "content": self._bulk,
+            "headers": {"Content-Type": "application/x-npy", "Accept": "application/x-npy"},
+        }
+
+
+async def _worker(client, factory, routes, weights, deadline, record, rng):
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await client.request(**factory.build(route))
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        record(route, time.perf_counter() - start, ok)
+
+
+async def drive(client, mix, concurrency=16, duration=10.0, warmup=1.0, factory=None, seed=0):
+    # Lance concurrency boucles client pendant duration secondes (après une
+    # phase de chauffe non mesurée) et renvoie les latences par route
+    factory = factory or RequestFactory(seed=seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+
+    def ignore(route, elapsed, ok):
+        pass
+
+    def record(route, elapsed, ok):
+        if ok:
+            latencies[route].append(elapsed)
+        else:
+            errors[route] += 1
+
+    for phase_duration, callback in ((warmup, ignore), (duration, record)):
+        if phase_duration <= 0:
+            continue
+        deadline = time.perf_counter() + phase_duration
+        await asyncio.gather(*(
+            _worker(client, factory, routes, weights, deadline, callback, random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+    return latencies, errors
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def open_client(target, concurrency):
+    # "asgi" : application appelée en mémoire (ni réseau ni sérialisation HTTP) ;
+    # "local" : uvicorn démarré dans ce processus sur un port libre ;
+    # sinon URL d'un serveur déjà lancé
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if target == "asgi":
+        from app import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+                yield client
+        return
+
+    if target == "local":
+        import uvicorn
+        from app import app
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+                yield client
+        finally:
+            server.should_exit = True
+            thread.join()
+        return
+
+    async with httpx.AsyncClient(base_url=target.rstrip("/"), limits=limits, timeout=30) as client:
+        yield client
+
+
+async def wait_ready(client, timeout=120.0):
+    # Le serveur charge et chauffe le modèle en tâche de fond : /health
+    # répond 200 quand il est prêt
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError("Serveur non prêt")
+
+
+async def run(target="asgi", mix=None, concurrency=16, duration=10.0, warmup=1.0,
+              distinct_rows=1000, batch_rows=100, pid=None, seed=0):
+    mix = mix or {"predict": 1.0}
+    factory = RequestFactory(distinct_rows=distinct_rows, batch_rows=batch_rows, seed=seed)
+
+    async with open_client(target, concurrency) as client:
+        await wait_ready(client)
+
+        # Serveur distant : CPU/RSS mesurables seulement si son pid est donné
+        sampler = None
+        if target in ("asgi", "local"):
+            sampler = results.ResourceSampler()
+        elif pid is not None:
+            sampler = results.ResourceSampler(pid=pid)
+
+        with (sampler or contextlib.nullcontext()):
+            latencies, errors = await drive(client, mix, concurrency, duration, warmup, factory, seed)
+
+    routes = {}
+    for route in mix:
+        routes[route] = {
+            "requests": len(latencies[route]),
+            "errors": errors[route],
+            "requests_per_s": len(latencies[route]) / duration,
+            "latency": results.summarize(latencies[route]),
+        }
+        if route != "predict":
+            routes[route]["rows_per_s"] = len(latencies[route]) * batch_rows / duration
+
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "kind": "load",
+        "config": {
+            "target": target,
+            "mix": mix,
+            "concurrency": concurrency,
+            "duration": duration,
+            "warmup": warmup,
+            "distinct_rows": distinct_rows,
+            "batch_rows": batch_rows,
+            "seed": seed,
+        },
+        "environment": results.environment(),
+        "results": {
+            "requests": total,
+            "errors": sum(errors.values()),
+            "requests_per_s": total / duration,
+            "latency": results.summarize([value for values in latencies.values() for value in values]),
+            "routes": routes,
+            "resources": sampler.result() if sampler is not None else None,
+        },
+    }
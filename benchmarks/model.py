@@ -0,0 +1,86 @@
+import os
+import time
+
+import joblib
+import numpy as np
+
+from . import results
+
+import forest
+import grid
+from cache import PredictionCache
+
+BATCH_SIZES = (1, 8, 64, 512, 4096)
+
+
+def _time_call(fn, min_time=0.2, repeat=5):
+    # Durée d'un appel (s) : nombre d'appels calibré pour durer min_time,
+    # meilleure et médiane sur repeat séries (comme timeit)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings), float(np.median(timings))
+
+
+def run(model_path=None, batch_sizes=BATCH_SIZES, min_time=0.2, repeat=5, seed=0):
+    # Appel au modèle seul, sans HTTP : sklearn, forêt compilée, prédicteur
+    # hybride du serveur, table de décision et cache unitaire
+    model_path = model_path or os.environ["MODEL_PATH"]
+    model = joblib.load(model_path)
+    compiled = forest.compile_model(model)
+    predictor = forest.ForestPredictor(model, compiled) if compiled is not None else None
+
+    rng = np.random.default_rng(seed)
+    spec = grid.GridSpec()
+    candidates = {}
+    for size in batch_sizes:
+        data = np.round(spec.low + rng.random((size, 4)) * (spec.high - spec.low), 1)
+        candidates[f"sklearn[{size}]"] = (lambda d=data: model.predict(forest.as_model_input(model, d)), size)
+        if compiled is not None:
+            candidates[f"compiled[{size}]"] = (lambda d=data: compiled.predict(d), size)
+            candidates[f"predictor[{size}]"] = (lambda d=data: predictor.predict(d), size)
+
+    # Chemins unitaires de /predict/ qui ne touchent pas au modèle
+    row = [5.1, 3.5, 1.4, 0.2]
+    table = np.zeros(spec.shape, dtype=np.uint8)
+    decision_grid = grid.DecisionGrid(spec, table)
+    candidates["grid.lookup_one[1]"] = (lambda: decision_grid.lookup_one(row), 1)
+    cache = PredictionCache()
+    cache.put(cache.key(row), 0)
+    candidates["cache.get[1]"] = (lambda: cache.get(cache.key(row)), 1)
+
+    report = {}
+    for name, (fn, size) in candidates.items():
+        best, median = _time_call(fn, min_time=min_time, repeat=repeat)
+        report[name] = {
+            "rows": size,
+            "us_per_call": best * 1e6,
+            "us_per_call_median": median * 1e6,
+            "rows_per_s": size / best,
+        }
+
+    return {
+        "kind": "model",
+        "config": {
+            "model_path": model_path,
+            "model_version": grid.file_fingerprint(model_path),
+            "batch_sizes": list(batch_sizes),
+            "compiled": compiled is not None,
+            "min_time": min_time,
+            "repeat": repeat,
+        },
+        "environment": results.environment(),
+        "results": report,
+    }
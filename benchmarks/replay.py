@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import contextlib
+import json
+import time
+
+import httpx
+
+from . import load, results
+
+
+def read_capture(paths, limit=None):
+    # Requêtes de un ou plusieurs fichiers de capture (un par worker),
+    # fusionnées par heure d'arrivée
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry["t"])
+    return entries[:limit] if limit else entries
+
+
+def build_request(entry):
+    if "body_b64" in entry:
+        body = base64.b64decode(entry["body_b64"])
+    else:
+        body = (entry.get("body") or "").encode("utf-8")
+    url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+    headers = {"Content-Type": entry["content_type"]} if entry.get("content_type") else {}
+    return {"method": entry["method"], "url": url, "content": body, "headers": headers}
+
+
+async def _send(client, request, record):
+    start = time.perf_counter()
+    try:
+        response = await client.request(**request)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    record(request["url"], time.perf_counter() - start, status)
+
+
+async def replay(client, entries, speed=1.0, concurrency=64):
+    # speed > 0 : boucle ouverte, chaque requête part à son heure d'arrivée
+    # d'origine divisée par speed, quelle que soit la durée des précédentes.
+    # speed = 0 : débit maximal, `concurrency` requêtes en cours en continu.
+    latencies, statuses, lags = {}, {}, []
+
+    def record(url, elapsed, status):
+        path = url.split("?", 1)[0]
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            latencies.setdefault(path, []).append(elapsed)
+
+    requests = [build_request(entry) for entry in entries]
+    start = time.perf_counter()
+    if speed > 0:
+        first = entries[0]["t"] if entries else 0.0
+        tasks = []
+        for entry, request in zip(entries, requests):
+            due = start + (entry["t"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, time.perf_counter() - due))
+            tasks.append(asyncio.create_task(_send(client, request, record)))
+        await asyncio.gather(*tasks)
+    else:
+        pending = iter(requests)
+
+        async def worker():
+            for request in pending:
+                await _send(client, request, record)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, lags, time.perf_counter() - start
+
+
+async def run(paths, target="local", speed=1.0, concurrency=64, limit=None):
+    entries = read_capture(paths, limit)
+    if not entries:
+        raise ValueError("Capture vide")
+
+    async with load.open_client(target, concurrency) as client:
+        await load.wait_ready(client)
+        sampler = results.ResourceSampler() if target in ("asgi", "local") else None
+        with (sampler or contextlib.nullcontext()):
+            latencies, statuses, lags, elapsed = await replay(client, entries, speed, concurrency)
+
+    ok = [value for values in latencies.values() for value in values]
+    return {
+        "kind": "replay",
+        "config": {
+            "capture": list(paths),
+            "target": target,
+            "speed": speed,
+            "concurrency": concurrency if speed <= 0 else None,
+            "requests": len(entries),
+        },
+        "environment": results.environment(),
+        "results": {
+            "requests": len(ok),
+            "errors": len(entries) - len(ok),
+            "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            "captured_duration_s": entries[-1]["t"] - entries[0]["t"],
+            "duration_s": elapsed,
+            "requests_per_s": len(ok) / elapsed if elapsed > 0 else None,
+            "latency": results.summarize(ok),
+            "schedule_lag": results.summarize(lags) if lags else None,
+            "routes": {
+                path: {
+                    "requests": len(values),
+                    "requests_per_s": len(values) / elapsed if elapsed > 0 else None,
+                    "latency": results.summarize(values),
+                }
+                for path, values in latencies.items()
+            },
+            "resources": sampler.result() if sampler is not None else None,
+        },
+    }
+
@@ -0,0 +1,183 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Seuils de régression par défaut (variation relative tolérée)
+DEFAULT_THRESHOLDS = {
+    "throughput": 0.10,
+    "latency": 0.20,
+}
+
+
+def summarize(latencies):
+    # Latences en secondes -> résumé en millisecondes
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(len(values)),
+        "mean_ms": float(values.mean()),
+        "min_ms": float(values.min()),
+        "max_ms": float(values.max()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "commit": commit,
+    }
+
+
+class ResourceSampler:
+    # Échantillonne CPU et RSS d'un processus pendant la mesure. Sans psutil,
+    # seul le processus courant est mesurable (getrusage).
+
+    def __init__(self, pid=None, interval=0.25):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self._cpu = []
+        self._rss = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._start_wall = time.perf_counter()
+        self._start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        if psutil is not None:
+            self._process = psutil.Process(self.pid)
+            self._process.cpu_percent(None)
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._cpu.append(self._process.cpu_percent(None))
+                self._rss.append(self._process.memory_info().rss)
+            except psutil.Error:
+                return
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.wall = time.perf_counter() - self._start_wall
+        self.usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    def result(self):
+        if self._cpu:
+            return {
+                "pid": self.pid,
+                "cpu_percent_mean": float(np.mean(self._cpu)),
+                "cpu_percent_max": float(np.max(self._cpu)),
+                "rss_mb_max": max(self._rss) / 2**20,
+            }
+        if self.pid != os.getpid():
+            return None
+        cpu = (self.usage.ru_utime - self._start_usage.ru_utime) + (self.usage.ru_stime - self._start_usage.ru_stime)
+        return {
+            "pid": self.pid,
+            "cpu_percent_mean": 100 * cpu / self.wall if self.wall else None,
+            "cpu_percent_max": None,
+            # ru_maxrss est en kilo-octets sous Linux
+            "rss_mb_max": self.usage.ru_maxrss / 1024 if sys.platform != "darwin" else self.usage.ru_maxrss / 2**20,
+        }
+
+
+def save(report, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"{report['kind']}-{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _flatten(report):
+    # {nom: (valeur, famille)} : "throughput" plus c'est haut mieux c'est,
+    # "latency" plus c'est bas mieux c'est
+    metrics = {}
+    if report["kind"] in ("load", "replay"):
+        for route, stats in report["results"]["routes"].items():
+            metrics[f"{route} req/s"] = (stats["requests_per_s"], "throughput")
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if key in stats["latency"]:
+                    metrics[f"{route} {key}"] = (stats["latency"][key], "latency")
+        metrics["total req/s"] = (report["results"]["requests_per_s"], "throughput")
+    else:
+        for name, stats in report["results"].items():
+            metrics[f"{name} us/call"] = (stats["us_per_call"], "latency")
+    return metrics
+
+
+def compare(baseline, current, thresholds=None):
+    # Liste des comparaisons ; regression=True au-delà du seuil de la famille
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    if baseline["kind"] != current["kind"]:
+        raise ValueError(f"Rapports incomparables: {baseline['kind']} / {current['kind']}")
+
+    base_metrics = _flatten(baseline)
+    rows = []
+    for name, (value, family) in _flatten(current).items():
+        if name not in base_metrics:
+            continue
+        base_value = base_metrics[name][0]
+        if not base_value:
+            continue
+        change = (value - base_value) / base_value
+        if family == "throughput":
+            regression = change < -thresholds["throughput"]
+        else:
+            regression = change > thresholds["latency"]
+        rows.append({
+            "metric": name,
+            "baseline": base_value,
+            "current": value,
+            "change": change,
+            "regression": regression,
+        })
+    return rows
+
+
+def print_comparison(rows):
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else "ok"
+        print(f"{row['metric']:<32} {row['baseline']:>12.3f} {row['current']:>12.3f} {row['change']:>+8.1%}  {flag}")
@@ -6,10 +6,56 @@ import plotly.graph_objects as go
 from datetime import datetime
 import json
 import os
+import functools
+import time
+from collections import deque
+import transport
+import prometheus
+import charts
+import ingest
+from history_buffer import HistoryBuffer
 
 # Configuration du serveur API
 SERVER_URL = os.getenv('SERVER_URL', 'http://localhost:8000')
 
+# Prédiction batch : taille des blocs et nombre de requêtes simultanées
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '1000'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+# Tâches serveur : intervalle de rafraîchissement du suivi (secondes)
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+
+BATCH_MODES = ["⚡ Interactif", "🗄️ Tâche serveur (gros fichiers)"]
+
+# Historique serveur : lignes par page
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+
+# Tableaux de résultats : lignes envoyées au navigateur par page
+TABLE_PAGE_SIZE = int(os.getenv('TABLE_PAGE_SIZE', '500'))
+
+# Historique de session : nombre maximal de prédictions conservées
+HISTORY_MAX_SIZE = int(os.getenv('HISTORY_MAX_SIZE', '100000'))
+
+# Monitoring en direct : instantanés conservés pour les courbes
+MONITOR_HISTORY_POINTS = int(os.getenv('MONITOR_HISTORY_POINTS', '300'))
+
+SPECIES = ['Setosa', 'Versicolor', 'Virginica']
+
+FEATURE_LABELS = {
+    'sepal_length': 'Longueur sépale',
+    'sepal_width': 'Largeur sépale',
+    'petal_length': 'Longueur pétale',
+    'petal_width': 'Largeur pétale',
+}
+
+# Statuts de dérive renvoyés par /drift
+DRIFT_STATUS = {
+    'stable': '🟢 Stable',
+    'moderate': '🟡 Modérée',
+    'significant': '🔴 Significative',
+    'unknown': '⚪ Inconnue',
+}
+
 # ================================
 # CONFIGURATION DE LA PAGE
 # ================================
@@ -20,6 +66,110 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ================================
+# SESSION HTTP PARTAGÉE
+# ================================
+@st.cache_resource
+def get_session():
+    return transport.make_session(pool_size=BATCH_CONCURRENCY)
+
+# Session des lectures (historique, statistiques) : pas de retry, échec rapide
+@st.cache_resource
+def get_api_session():
+    return transport.make_session(pool_size=2, retries=0)
+
+def fetch_server(path, **params):
+    return transport.fetch_json(get_api_session(), f"{SERVER_URL}{path}", params=params)
+
+# Métriques Prometheus du serveur, None si indisponibles
+def fetch_metrics():
+    text = transport.fetch_text(get_api_session(), f"{SERVER_URL}/metrics")
+    return prometheus.parse(text) if text is not None else None
+
+def latency_quantile_ms(samples, q, **labels):
+    buckets, _, _ = prometheus.histogram(samples, "http_request_duration_seconds", **labels)
+    value = prometheus.quantile(buckets, q)
+    return value * 1000 if value is not None else None
+
+# Tableau paginé : seule la page affichée est envoyée au navigateur
+def show_paginated(df, key, **kwargs):
+    if len(df) <= TABLE_PAGE_SIZE:
+        st.dataframe(df, use_container_width=True, **kwargs)
+        return
+    pages = (len(df) - 1) // TABLE_PAGE_SIZE + 1
+    page_number = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1, key=key)
+    start = (page_number - 1) * TABLE_PAGE_SIZE
+    st.dataframe(df.iloc[start:start + TABLE_PAGE_SIZE], use_container_width=True, **kwargs)
+    st.caption(f"Lignes {start + 1}-{min(start + TABLE_PAGE_SIZE, len(df))} sur {len(df)}")
+
+# Variante sur le CSV d'un ingest.ResultWriter : seule la page est lue
+def show_paginated_file(writer, key, **kwargs):
+    rows = writer.rows
+    pages = max((rows - 1) // TABLE_PAGE_SIZE + 1, 1)
+    page_number = 1
+    if pages > 1:
+        page_number = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1, key=key)
+    start = (page_number - 1) * TABLE_PAGE_SIZE
+    st.dataframe(writer.read_page(start, TABLE_PAGE_SIZE), use_container_width=True, **kwargs)
+    if pages > 1:
+        st.caption(f"Lignes {start + 1}-{min(start + TABLE_PAGE_SIZE, rows)} sur {rows}")
+
+# ================================
+# VUES DE L'HISTORIQUE DE SESSION
+# ================================
+# Recalculées seulement quand le tampon change : la clé est (id, version),
+# l'id évite de mélanger les sessions dans le cache partagé
+@st.cache_data(max_entries=32)
+def history_frame(buffer_id, version, _buffer):
+    return _buffer.frame()
+
+@st.cache_data(max_entries=32)
+def history_figures(buffer_id, version, _buffer):
+    history_df = history_frame(buffer_id, version, _buffer)
+    counts = _buffer.species_counts()
+    
+    # Distribution des prédictions (compteurs tenus par le tampon)
+    fig1 = px.pie(
+        values=list(counts.values()),
+        names=list(counts.keys()),
+        title='📊 Distribution des espèces prédites',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    
+    # Temps de réponse
+    fig2 = charts.line(
+        _buffer.response_times(),
+        title='⚡ Temps de réponse au fil du temps',
+        labels={'y': 'Temps (ms)', 'index': 'Prédiction #'}
+    )
+    
+    fig3 = charts.scatter(
+        history_df,
+        x='sepal_length',
+        y='sepal_width',
+        color='prediction',
+        size='petal_length',
+        title='Relation Sépale: Longueur vs Largeur',
+        labels={'sepal_length': 'Longueur sépale (cm)', 'sepal_width': 'Largeur sépale (cm)'}
+    )
+    
+    fig4 = charts.scatter(
+        history_df,
+        x='petal_length',
+        y='petal_width',
+        color='prediction',
+        size='sepal_length',
+        title='Relation Pétale: Longueur vs Largeur',
+        labels={'petal_length': 'Longueur pétale (cm)', 'petal_width': 'Largeur pétale (cm)'}
+    )
+    return fig1, fig2, fig3, fig4
+
+@st.cache_data(max_entries=32)
+def filtered_history(buffer_id, version, _buffer, species, sort_by, ascending):
+    history_df = history_frame(buffer_id, version, _buffer)
+    filtered_df = history_df[history_df['prediction'].isin(species)]
+    return filtered_df.sort_values(by=sort_by, ascending=ascending, kind='stable')
+
 # ================================
 # STYLE CSS PERSONNALISÉ
 # ================================
@@ -90,7 +240,9 @@ with st.sidebar:
     st.markdown("## 🎯 Navigation")
     page = st.radio(
         "Choisir une page:",
-        ["🏠 Accueil", "🔮 Prédiction Simple", "📊 Prédiction Batch", "📈 Analyse & Statistiques", "🔄 Historique", "⚙️ API Monitoring"]
+        ["🏠 Accueil", "🔮 Prédiction Simple", "📊 Prédiction Batch", "📈 Analyse & Statistiques", "🔄 Historique", "⚙️ API Monitoring"],
+        # Une tâche suivie dans l'URL rouvre la page batch après rafraîchissement
+        index=2 if "job" in st.query_params else 0
     )
     
     st.markdown("---")
@@ -115,7 +267,7 @@ with st.sidebar:
 # INITIALISATION SESSION STATE
 # ================================
 if 'history' not in st.session_state:
-    st.session_state.history = []
+    st.session_state.history = HistoryBuffer(max_size=HISTORY_MAX_SIZE)
 
 # ================================
 # PAGE: ACCUEIL
@@ -142,11 +294,15 @@ if page == "🏠 Accueil":
         """, unsafe_allow_html=True)
     
     with col3:
-        st.markdown("""
+        # p95 mesuré par le serveur sur /predict/
+        samples = fetch_metrics()
+        p95 = latency_quantile_ms(samples, 0.95, route="/predict/") if samples else None
+        speed = f"{p95:.1f}ms" if p95 is not None else "—"
+        st.markdown(f"""
         <div class="metric-card">
             <h3>⚡ Vitesse</h3>
-            <h1>&lt;50ms</h1>
-            <p>Temps de réponse</p>
+            <h1>{speed}</h1>
+            <p>Temps de réponse (p95 serveur)</p>
         </div>
         """, unsafe_allow_html=True)
     
@@ -318,15 +474,7 @@ elif page == "🔮 Prédiction Simple":
                     flower_name = result["flower_name"]
                     
                     # Ajouter à l'historique
-                    st.session_state.history.append({
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'prediction': flower_name,
-                        'sepal_length': sepal_length,
-                        'sepal_width': sepal_width,
-                        'petal_length': petal_length,
-                        'petal_width': petal_width,
-                        'response_time': response_time
-                    })
+                    st.session_state.history.append(flower_name, data, response_time)
                     
                     st.success(f"✅ Prédiction réussie en {response_time:.2f}ms !")
                     
@@ -384,11 +532,23 @@ elif page == "📊 Prédiction Batch":
     
     st.info("📁 Uploadez un fichier CSV avec les colonnes: sepal_length, sepal_width, petal_length, petal_width")
     
+    # Les gros fichiers sont confiés au serveur : traitement en tâche de fond,
+    # sans garder l'onglet ouvert ni charger le fichier dans le navigateur
+    batch_mode = st.radio(
+        "Mode",
+        BATCH_MODES,
+        index=1 if "job" in st.query_params else 0,
+        horizontal=True
+    )
+    
     # Template CSV
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        uploaded_file = st.file_uploader("Choisir un fichier CSV", type=['csv'])
+        if batch_mode == BATCH_MODES[0]:
+            uploaded_file = st.file_uploader("Choisir un fichier CSV", type=['csv'])
+        else:
+            uploaded_file = st.file_uploader("Choisir un fichier CSV ou Parquet", type=['csv', 'parquet'])
     
     with col2:
         # Bouton pour télécharger un template
@@ -408,68 +568,93 @@ elif page == "📊 Prédiction Batch":
             use_container_width=True
         )
     
-    if uploaded_file is not None:
+    if uploaded_file is not None and batch_mode == BATCH_MODES[0]:
         try:
-            df = pd.read_csv(uploaded_file)
+            # Seules les premières lignes sont lues pour l'aperçu
+            preview_df = ingest.preview(uploaded_file)
             
             st.markdown("### 📋 Aperçu des données")
-            st.dataframe(df.head(10), use_container_width=True)
+            st.dataframe(preview_df, use_container_width=True)
             
-            st.markdown(f"**Total de {len(df)} échantillons à prédire**")
+            st.markdown(
+                f"**Fichier de {uploaded_file.size / 1e6:.1f} Mo, lu et prédit par blocs de {BATCH_CHUNK_SIZE} lignes** "
+                f"(au plus {2 * BATCH_CONCURRENCY + 1} blocs en mémoire, résultat écrit sur disque)"
+            )
             
             if st.button("🚀 Lancer les prédictions", use_container_width=True, type="primary"):
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                predictions = []
+                def show_progress(done):
+                    # Avancement estimé sur la position de lecture du fichier
+                    status_text.text(f"Prédiction {done} lignes")
+                    progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0))
                 
-                for idx, row in df.iterrows():
-                    status_text.text(f"Prédiction {idx+1}/{len(df)}")
-                    progress_bar.progress((idx + 1) / len(df))
-                    
-                    data = {
-                        "sepal_length": float(row['sepal_length']),
-                        "sepal_width": float(row['sepal_width']),
-                        "petal_length": float(row['petal_length']),
-                        "petal_width": float(row['petal_width'])
-                    }
-                    
-                    try:
-                        response = requests.post(f"{SERVER_URL}/predict/", json=data)
-                        if response.status_code == 200:
-                            result = response.json()
-                            predictions.append(result['flower_name'])
-                        else:
-                            predictions.append("Erreur")
-                    except:
-                        predictions.append("Erreur")
+                # Blocs lus en float32, validés puis envoyés en parallèle
+                # sur une session keep-alive au fil de la lecture ; le
+                # résultat est écrit sur disque bloc par bloc
+                report = ingest.Report()
+                writer = ingest.ResultWriter()
+                try:
+                    errors = transport.predict_chunks(
+                        get_session(),
+                        SERVER_URL,
+                        writer.track(ingest.read_chunks(uploaded_file, BATCH_CHUNK_SIZE, report)),
+                        writer.resolve,
+                        max_workers=BATCH_CONCURRENCY,
+                        on_progress=show_progress
+                    )
+                finally:
+                    writer.close()
                 
-                df['Prédiction'] = predictions
+                # Résultat conservé (fichier temporaire) : la pagination
+                # relance le script
+                previous = st.session_state.get('batch_result')
+                if previous is not None and os.path.exists(previous[1].path):
+                    os.remove(previous[1].path)
+                st.session_state.batch_result = (uploaded_file.file_id, writer, errors, report)
                 
                 status_text.text("✅ Prédictions terminées!")
                 progress_bar.progress(1.0)
+            
+            batch_result = st.session_state.get('batch_result')
+            if batch_result is not None and batch_result[0] == uploaded_file.file_id:
+                _, writer, errors, report = batch_result
                 
-                st.success(f"✅ {len(df)} prédictions effectuées avec succès!")
+                for error in errors:
+                    st.warning(f"⚠️ {error}")
                 
-                # Résultats
-                st.markdown("### 📊 Résultats")
-                st.dataframe(df, use_container_width=True)
+                if report.invalid:
+                    st.warning(
+                        f"⚠️ {report.invalid} lignes invalides non envoyées "
+                        f"({report.missing} valeurs manquantes ou non numériques, {report.out_of_range} hors bornes, "
+                        f"{report.malformed} mal formées)"
+                    )
+                    with st.expander("Lignes rejetées"):
+                        st.dataframe(pd.DataFrame(report.examples), use_container_width=True, hide_index=True)
+                
+                predicted = sum(writer.counts[name] for name in SPECIES)
+                st.success(f"✅ {predicted} prédictions effectuées avec succès!")
                 
+                # Résultats : seule la page affichée est relue du fichier
+                st.markdown("### 📊 Résultats")
+                show_paginated_file(writer, key="batch_table_page")
+            
                 # Statistiques
                 col1, col2, col3 = st.columns(3)
-                
+            
                 with col1:
-                    setosa_count = len(df[df['Prédiction'] == 'Setosa'])
+                    setosa_count = writer.counts['Setosa']
                     st.metric("🌼 Setosa", setosa_count)
-                
+            
                 with col2:
-                    versicolor_count = len(df[df['Prédiction'] == 'Versicolor'])
+                    versicolor_count = writer.counts['Versicolor']
                     st.metric("🌺 Versicolor", versicolor_count)
-                
+            
                 with col3:
-                    virginica_count = len(df[df['Prédiction'] == 'Virginica'])
+                    virginica_count = writer.counts['Virginica']
                     st.metric("🌸 Virginica", virginica_count)
-                
+            
                 # Graphique
                 fig = px.pie(
                     values=[setosa_count, versicolor_count, virginica_count],
@@ -478,19 +663,105 @@ elif page == "📊 Prédiction Batch":
                     color_discrete_sequence=px.colors.qualitative.Pastel
                 )
                 st.plotly_chart(fig, use_container_width=True)
-                
-                # Export
-                csv_result = df.to_csv(index=False)
+            
+                # Export : fichier lu seulement au clic
                 st.download_button(
                     label="📥 Télécharger les résultats (CSV)",
-                    data=csv_result,
+                    data=functools.partial(ingest.read_bytes, writer.path),
                     file_name=f"predictions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv",
                     use_container_width=True
                 )
-                
+            
         except Exception as e:
             st.error(f"❌ Erreur lors de la lecture du fichier: {str(e)}")
+    
+    if batch_mode == BATCH_MODES[1]:
+        # Résultat de tâche téléchargé : fichier temporaire supprimé quand la
+        # tâche suivie change
+        def drop_job_result():
+            previous = st.session_state.pop("job_result", None)
+            if previous is not None and os.path.exists(previous[1]):
+                os.remove(previous[1])
+        
+        if uploaded_file is not None and st.button("🚀 Soumettre la tâche", use_container_width=True, type="primary"):
+            content_type = "application/vnd.apache.parquet" if uploaded_file.name.endswith(".parquet") else "text/csv"
+            try:
+                job = transport.submit_job(get_api_session(), SERVER_URL, uploaded_file, uploaded_file.name, content_type)
+                # L'identifiant reste dans l'URL : le suivi survit à un rafraîchissement
+                st.query_params["job"] = job["id"]
+                drop_job_result()
+            except requests.exceptions.RequestException as e:
+                st.error(f"❌ Soumission impossible: {str(e)}")
+        
+        recent_jobs = fetch_server("/jobs", limit=10)
+        if recent_jobs is None:
+            st.warning("⚠️ Tâches indisponibles (serveur injoignable ou MongoDB non configuré)")
+        elif recent_jobs["items"]:
+            job_ids = [job["id"] for job in recent_jobs["items"]]
+            labels = {job["id"]: f"{job['filename']} · {job['status']} · {job['created_at'][:19]}" for job in recent_jobs["items"]}
+            current = st.query_params.get("job")
+            if current and current not in job_ids:
+                job_ids.insert(0, current)
+            selected = st.selectbox(
+                "Tâche suivie",
+                job_ids,
+                index=job_ids.index(current) if current in job_ids else 0,
+                format_func=lambda job_id: labels.get(job_id, job_id)
+            )
+            if selected != current:
+                st.query_params["job"] = selected
+                drop_job_result()
+        
+        job_id = st.query_params.get("job")
+        job = fetch_server(f"/jobs/{job_id}") if job_id else None
+        if job_id and job is None:
+            st.warning(f"⚠️ Tâche introuvable: {job_id}")
+        
+        if job is not None:
+            st.markdown(f"### 🗄️ Tâche `{job['id']}`")
+            st.progress(min(job["progress"], 1.0), text=f"{job['status']} · {job['progress']:.0%}")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Lignes traitées", f"{job['processed_rows']:,}")
+            with col2:
+                st.metric("Lignes invalides", f"{job['invalid_rows']:,}")
+            with col3:
+                st.metric("Format", job["format"].upper())
+            
+            if job["status"] == "failed":
+                st.error(f"❌ Échec: {job['error']}")
+            
+            if job["status"] in ("queued", "running"):
+                if st.button("🛑 Annuler la tâche"):
+                    requests.delete(f"{SERVER_URL}/jobs/{job['id']}", timeout=5)
+                    st.rerun()
+                # Suivi automatique jusqu'à la fin de la tâche
+                time.sleep(JOB_POLL_SECONDS)
+                st.rerun()
+            
+            if job["status"] == "done":
+                st.success(f"✅ {job['processed_rows'] - job['invalid_rows']} prédictions effectuées avec succès!")
+                if st.session_state.get("job_result", (None,))[0] != job["id"]:
+                    if st.button("📦 Préparer le téléchargement", use_container_width=True):
+                        # Résultat copié par blocs dans un fichier temporaire,
+                        # relu seulement au clic sur le téléchargement
+                        with st.spinner("Récupération du résultat..."):
+                            path = transport.download(get_api_session(), f"{SERVER_URL}/jobs/{job['id']}/result")
+                        if path is None:
+                            st.error("❌ Résultat indisponible")
+                        else:
+                            drop_job_result()
+                            st.session_state.job_result = (job["id"], path)
+                if st.session_state.get("job_result", (None,))[0] == job["id"]:
+                    st.download_button(
+                        label="📥 Télécharger les résultats (CSV)",
+                        data=functools.partial(ingest.read_bytes, st.session_state.job_result[1]),
+                        file_name=f"{os.path.splitext(job['filename'])[0]}_predictions.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
 
 # ================================
 # PAGE: ANALYSE & STATISTIQUES
@@ -498,75 +769,148 @@ elif page == "📊 Prédiction Batch":
 elif page == "📈 Analyse & Statistiques":
     st.markdown("## 📈 Analyse et Statistiques")
     
-    if len(st.session_state.history) == 0:
-        st.warning("⚠️ Aucune prédiction dans l'historique. Effectuez d'abord quelques prédictions!")
-    else:
-        history_df = pd.DataFrame(st.session_state.history)
+    # Agrégats calculés par le serveur sur l'historique MongoDB
+    bucket = st.selectbox("Granularité temporelle", ['minute', 'hour', 'day'], index=1)
+    server_stats = fetch_server("/history/stats", bucket=bucket)
+    
+    if server_stats is not None and server_stats['total'] > 0:
+        species_counts = server_stats['species']
+        latency = server_stats['latency_ms']
         
         # Métriques
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total prédictions", len(history_df))
+            st.metric("Total prédictions", server_stats['total'])
         with col2:
-            avg_time = history_df['response_time'].mean()
-            st.metric("Temps moyen", f"{avg_time:.2f} ms")
+            st.metric("Latence serveur moyenne", f"{latency['mean']:.2f} ms")
         with col3:
-            most_common = history_df['prediction'].mode()[0]
-            st.metric("Plus fréquent", most_common)
+            st.metric("Plus fréquent", max(species_counts, key=species_counts.get))
         with col4:
-            unique_species = history_df['prediction'].nunique()
-            st.metric("Espèces détectées", unique_species)
+            st.metric("Espèces détectées", len(species_counts))
+        
+        if latency['p50'] is not None:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("p50", f"{latency['p50']:.2f} ms")
+            col2.metric("p95", f"{latency['p95']:.2f} ms")
+            col3.metric("p99", f"{latency['p99']:.2f} ms")
         
         st.markdown("---")
         
-        # Graphiques
         col1, col2 = st.columns(2)
         
         with col1:
-            # Distribution des prédictions
             fig1 = px.pie(
-                history_df,
-                names='prediction',
+                values=list(species_counts.values()),
+                names=list(species_counts.keys()),
                 title='📊 Distribution des espèces prédites',
                 color_discrete_sequence=px.colors.qualitative.Set3
             )
             st.plotly_chart(fig1, use_container_width=True)
         
         with col2:
-            # Temps de réponse
+            timeline_df = pd.DataFrame(server_stats['timeline'])
             fig2 = px.line(
-                history_df,
-                y='response_time',
-                title='⚡ Temps de réponse au fil du temps',
-                labels={'response_time': 'Temps (ms)', 'index': 'Prédiction #'}
+                timeline_df,
+                x='bucket',
+                y='mean_latency_ms',
+                markers=True,
+                title='⚡ Latence serveur au fil du temps',
+                labels={'mean_latency_ms': 'Latence moyenne (ms)', 'bucket': 'Période'}
             )
             st.plotly_chart(fig2, use_container_width=True)
         
+    elif len(st.session_state.history) == 0:
+        st.warning("⚠️ Aucune prédiction dans l'historique. Effectuez d'abord quelques prédictions!")
+    else:
+        st.info("ℹ️ Historique serveur indisponible : statistiques de la session en cours.")
+        history = st.session_state.history
+        
+        # Métriques (agrégats tenus à jour par le tampon)
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Total prédictions", len(history))
+        with col2:
+            st.metric("Temps moyen", f"{history.mean_response_time():.2f} ms")
+        with col3:
+            st.metric("Plus fréquent", history.most_common())
+        with col4:
+            st.metric("Espèces détectées", len(history.species_counts()))
+        
+        st.markdown("---")
+        
+        fig1, fig2, fig3, fig4 = history_figures(history.id, history.version, history)
+        
+        # Graphiques
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.plotly_chart(fig1, use_container_width=True)
+        
+        with col2:
+            st.plotly_chart(fig2, use_container_width=True)
+        
         # Scatter plots
         st.markdown("### 🔬 Analyse des caractéristiques")
         
-        fig3 = px.scatter(
-            history_df,
-            x='sepal_length',
-            y='sepal_width',
-            color='prediction',
-            size='petal_length',
-            title='Relation Sépale: Longueur vs Largeur',
-            labels={'sepal_length': 'Longueur sépale (cm)', 'sepal_width': 'Largeur sépale (cm)'}
-        )
         st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(fig4, use_container_width=True)
+    
+    # Dérive des entrées : résumés tenus en mémoire par le serveur (sans
+    # MongoDB), comparés à la distribution d'entraînement du modèle actif
+    st.markdown("---")
+    st.markdown("### 🔬 Dérive des caractéristiques")
+    
+    drift_summary = fetch_server("/drift")
+    if drift_summary is None or not drift_summary.get('enabled'):
+        st.info("ℹ️ Suivi de la dérive indisponible sur le serveur.")
+    elif not drift_summary.get('ready') or drift_summary['count'] == 0:
+        st.info("ℹ️ Pas encore de trafic observé pour la version active du modèle.")
+    else:
+        features = drift_summary['features']
+        st.caption(
+            f"Modèle {drift_summary['model_version']} · {drift_summary['count']} entrées observées "
+            f"· {drift_summary['workers']} worker(s) · PSI : < 0.1 stable, 0.1–0.25 modérée, ≥ 0.25 significative"
+        )
         
-        fig4 = px.scatter(
-            history_df,
-            x='petal_length',
-            y='petal_width',
-            color='prediction',
-            size='sepal_length',
-            title='Relation Pétale: Longueur vs Largeur',
-            labels={'petal_length': 'Longueur pétale (cm)', 'petal_width': 'Largeur pétale (cm)'}
+        columns = st.columns(len(features))
+        for column, (name, feature) in zip(columns, features.items()):
+            with column:
+                st.metric(
+                    FEATURE_LABELS.get(name, name),
+                    f"{feature['psi']:.3f}" if feature['psi'] is not None else "—",
+                    DRIFT_STATUS.get(feature['status'], feature['status']),
+                    delta_color="off"
+                )
+        
+        drift_table = pd.DataFrame([
+            {
+                'Caractéristique': FEATURE_LABELS.get(name, name),
+                'Moyenne': feature['mean'],
+                'Moyenne (entraînement)': feature['training']['mean'],
+                'Écart (σ)': feature['mean_shift'],
+                'Écart-type': feature['std'],
+                'Médiane': feature['quantiles']['0.5'],
+                'Médiane (entraînement)': feature['training']['quantiles']['0.5'],
+                'Min': feature['min'],
+                'Max': feature['max'],
+            }
+            for name, feature in features.items()
+        ])
+        st.dataframe(drift_table.round(3), use_container_width=True, hide_index=True)
+        
+        selected = st.selectbox(
+            "Distribution", list(features), format_func=lambda name: FEATURE_LABELS.get(name, name)
         )
-        st.plotly_chart(fig4, use_container_width=True)
+        feature = features[selected]
+        fig3 = charts.drift_histogram(
+            feature['training']['edges'],
+            feature['training']['histogram'],
+            feature['histogram'],
+            title=f"{FEATURE_LABELS.get(selected, selected)} : trafic vs entraînement"
+        )
+        st.plotly_chart(fig3, use_container_width=True)
 
 # ================================
 # PAGE: HISTORIQUE
@@ -574,10 +918,79 @@ elif page == "📈 Analyse & Statistiques":
 elif page == "🔄 Historique":
     st.markdown("## 🔄 Historique des prédictions")
     
-    if len(st.session_state.history) == 0:
+    # L'historique serveur est paginé : seule la page affichée est chargée
+    server_page = fetch_server("/history", limit=1)
+    
+    if server_page is not None:
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            species_filter = st.multiselect(
+                "Filtrer par espèce",
+                options=SPECIES,
+                default=SPECIES
+            )
+        
+        with col2:
+            sort_by = st.selectbox(
+                "Trier par",
+                options=['timestamp', 'latency_ms', 'flower_name']
+            )
+        
+        with col3:
+            sort_order = st.radio("Ordre", ['Décroissant', 'Croissant'])
+        
+        # Pile des curseurs des pages visitées, remise à zéro si les filtres changent
+        filters = (tuple(species_filter), sort_by, sort_order)
+        if st.session_state.get('history_filters') != filters:
+            st.session_state.history_filters = filters
+            st.session_state.history_cursors = [None]
+        
+        cursors = st.session_state.history_cursors
+        page_data = fetch_server(
+            "/history",
+            limit=HISTORY_PAGE_SIZE,
+            species=species_filter,
+            sort=sort_by,
+            order='asc' if sort_order == 'Croissant' else 'desc',
+            cursor=cursors[-1]
+        ) if species_filter else {"items": [], "next_cursor": None}
+        
+        if page_data is None:
+            st.error("❌ Impossible de charger l'historique")
+        else:
+            page_df = pd.DataFrame(page_data['items'])
+            
+            st.markdown(f"### 📋 Page {len(cursors)} — {len(page_df)} prédictions")
+            st.dataframe(page_df, use_container_width=True, hide_index=True)
+            
+            col1, col2, col3 = st.columns([1, 1, 1])
+            
+            with col1:
+                if st.button("⬅️ Page précédente", use_container_width=True, disabled=len(cursors) == 1):
+                    cursors.pop()
+                    st.rerun()
+            
+            with col2:
+                st.download_button(
+                    label="📥 Télécharger la page (CSV)",
+                    data=page_df.to_csv(index=False),
+                    file_name=f"historique_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+            
+            with col3:
+                if st.button("Page suivante ➡️", use_container_width=True, disabled=page_data['next_cursor'] is None):
+                    cursors.append(page_data['next_cursor'])
+                    st.rerun()
+    
+    elif len(st.session_state.history) == 0:
         st.info("📭 Aucune prédiction dans l'historique.")
     else:
-        history_df = pd.DataFrame(st.session_state.history)
+        st.info("ℹ️ Historique serveur indisponible : prédictions de la session en cours.")
+        history = st.session_state.history
+        species = list(history.species_counts())
         
         # Filtres
         col1, col2, col3 = st.columns(3)
@@ -585,8 +998,8 @@ elif page == "🔄 Historique":
         with col1:
             species_filter = st.multiselect(
                 "Filtrer par espèce",
-                options=history_df['prediction'].unique(),
-                default=history_df['prediction'].unique()
+                options=species,
+                default=species
             )
         
         with col2:
@@ -598,15 +1011,18 @@ elif page == "🔄 Historique":
         with col3:
             sort_order = st.radio("Ordre", ['Décroissant', 'Croissant'])
         
-        # Appliquer les filtres
-        filtered_df = history_df[history_df['prediction'].isin(species_filter)]
-        filtered_df = filtered_df.sort_values(
-            by=sort_by,
-            ascending=(sort_order == 'Croissant')
+        # Appliquer les filtres (vue mise en cache jusqu'au prochain ajout)
+        filtered_df = filtered_history(
+            history.id,
+            history.version,
+            history,
+            tuple(species_filter),
+            sort_by,
+            sort_order == 'Croissant'
         )
         
         st.markdown(f"### 📋 {len(filtered_df)} prédictions")
-        st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+        show_paginated(filtered_df, key="history_table_page", hide_index=True)
         
         # Export
         col1, col2, col3 = st.columns([1, 1, 1])
@@ -625,7 +1041,7 @@ elif page == "🔄 Historique":
         st.markdown("---")
         
         if st.button("🗑️ Vider l'historique", use_container_width=True, type="secondary"):
-            st.session_state.history = []
+            st.session_state.history.clear()
             st.success("✅ Historique vidé!")
             st.rerun()
 
@@ -635,44 +1051,108 @@ elif page == "🔄 Historique":
 elif page == "⚙️ API Monitoring":
     st.markdown("## ⚙️ Monitoring de l'API")
     
+    # Vue en direct : emplacements remplis à la fin de la page par le flux
+    # /monitor/stream (une seule connexion, instantanés poussés par le serveur)
+    st.markdown("### 📡 En direct")
+    live = st.toggle("Suivi en direct", value=True)
+    live_status = st.empty()
+    live_metrics = st.empty()
+    live_queues = st.empty()
+    live_charts = st.empty()
+    
+    if 'monitor_points' not in st.session_state:
+        st.session_state.monitor_points = deque(maxlen=MONITOR_HISTORY_POINTS)
+    
+    samples = fetch_metrics()
+    
+    st.markdown("---")
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### 🔗 Endpoints disponibles")
         
-        try:
-            response = requests.get(f"{SERVER_URL}/docs")
-            if response.status_code == 200:
-                st.success("✅ API disponible")
-            else:
-                st.error("❌ API inaccessible")
-        except:
-            st.error("❌ Impossible de se connecter à l'API")
-        
         endpoints = [
             {"Endpoint": "/", "Méthode": "GET", "Description": "Root"},
             {"Endpoint": "/predict/", "Méthode": "POST", "Description": "Prédiction"},
+            {"Endpoint": "/predict/batch", "Méthode": "POST", "Description": "Prédiction par lot"},
+            {"Endpoint": "/metrics", "Méthode": "GET", "Description": "Métriques Prometheus"},
+            {"Endpoint": "/monitor/stream", "Méthode": "GET", "Description": "Instantanés en direct (server-sent events)"},
             {"Endpoint": "/docs", "Méthode": "GET", "Description": "Documentation"},
         ]
         
         st.dataframe(pd.DataFrame(endpoints), use_container_width=True, hide_index=True)
     
     with col2:
-        st.markdown("### 📊 Statistiques serveur")
+        st.markdown("### 📊 Depuis le démarrage du worker")
         
-        if len(st.session_state.history) > 0:
-            history_df = pd.DataFrame(st.session_state.history)
+        if samples:
+            total = prometheus.value(samples, "http_requests_total")
+            errors = sum(
+                value for labels, value in samples.get("http_requests_total", [])
+                if labels.get("status", "").startswith("5")
+            )
             
-            avg_response = history_df['response_time'].mean()
-            min_response = history_df['response_time'].min()
-            max_response = history_df['response_time'].max()
+            metric_cols = st.columns(2)
+            metric_cols[0].metric("Requêtes traitées", f"{total:.0f}")
+            metric_cols[1].metric("Erreurs 5xx", f"{errors:.0f}")
             
-            st.metric("Temps moyen", f"{avg_response:.2f} ms")
-            st.metric("Temps minimum", f"{min_response:.2f} ms")
-            st.metric("Temps maximum", f"{max_response:.2f} ms")
+            p50 = latency_quantile_ms(samples, 0.5, route="/predict/")
+            p95 = latency_quantile_ms(samples, 0.95, route="/predict/")
+            metric_cols = st.columns(2)
+            metric_cols[0].metric("/predict/ p50", f"{p50:.2f} ms" if p50 is not None else "—")
+            metric_cols[1].metric("/predict/ p95", f"{p95:.2f} ms" if p95 is not None else "—")
         else:
             st.info("Aucune donnée disponible")
     
+    if samples:
+        st.markdown("---")
+        
+        # Latence par route (quantiles estimés sur les histogrammes serveur)
+        st.markdown("### ⏱️ Latence par route")
+        rows = []
+        for route in prometheus.labels_of(samples, "http_request_duration_seconds_count", "route"):
+            _, total_seconds, count = prometheus.histogram(samples, "http_request_duration_seconds", route=route)
+            rows.append({
+                "Route": route,
+                "Requêtes": int(count),
+                "Moyenne (ms)": round(total_seconds / count * 1000, 3) if count else None,
+                "p50 (ms)": latency_quantile_ms(samples, 0.5, route=route),
+                "p95 (ms)": latency_quantile_ms(samples, 0.95, route=route),
+                "p99 (ms)": latency_quantile_ms(samples, 0.99, route=route),
+            })
+        if rows:
+            st.dataframe(pd.DataFrame(rows).round(3), use_container_width=True, hide_index=True)
+        
+        # Décomposition de la latence de chaque route par étape
+        st.markdown("### 🧩 Temps moyen par étape")
+        stage_rows = []
+        for route in prometheus.labels_of(samples, "inference_stage_duration_seconds_count", "route"):
+            for stage in prometheus.labels_of(samples, "inference_stage_duration_seconds_count", "stage"):
+                _, total_seconds, count = prometheus.histogram(
+                    samples, "inference_stage_duration_seconds", route=route, stage=stage
+                )
+                if count:
+                    stage_rows.append({"Route": route, "Étape": stage, "Moyenne (ms)": total_seconds / count * 1000})
+        if stage_rows:
+            fig = px.bar(
+                pd.DataFrame(stage_rows),
+                x="Moyenne (ms)",
+                y="Route",
+                color="Étape",
+                orientation="h",
+                title="Répartition du temps de traitement"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        _, model_seconds, model_calls = prometheus.histogram(samples, "model_predict_duration_seconds")
+        _, model_rows, _ = prometheus.histogram(samples, "model_batch_size")
+        if model_calls:
+            metric_cols = st.columns(3)
+            metric_cols[0].metric("Appels au modèle", f"{model_calls:.0f}")
+            metric_cols[1].metric("Lignes par appel", f"{model_rows / model_calls:.1f}")
+            metric_cols[2].metric("Durée moyenne d'un appel", f"{model_seconds / model_calls * 1000:.3f} ms")
+    
     st.markdown("---")
     
     st.markdown("### 🧪 Test de l'API")
@@ -707,4 +1187,90 @@ elif page == "⚙️ API Monitoring":
     st.markdown("### 📖 Documentation API")
     st.markdown("[Ouvrir la documentation Swagger](http://localhost:8000/docs)")
 
- 
\ No newline at end of file
+ 
+    
+    # Flux en direct, en dernier : la boucle occupe le script tant que la
+    # page est affichée (Streamlit l'interrompt à la prochaine interaction)
+    def show_snapshot(snapshot, points):
+        # Instantané fusionné sur tous les workers du serveur
+        health = snapshot['health']
+        workers = snapshot['workers']
+        versions = ", ".join(health['model_versions']) or "—"
+        if health['ready']:
+            live_status.success(f"✅ Serveur prêt · modèle {versions} · {len(workers)} worker(s)")
+        else:
+            ready = sum(worker['health']['ready'] for worker in workers)
+            live_status.warning(f"⏳ Modèle en cours de chargement · {ready}/{len(workers)} worker(s) prêt(s)")
+        
+        throughput = snapshot['throughput']
+        latency = snapshot['latency_ms']
+        
+        def fmt(value, unit=""):
+            return f"{value:.2f}{unit}" if value is not None else "—"
+        
+        with live_metrics.container():
+            metric_cols = st.columns(5)
+            metric_cols[0].metric("Requêtes/s", fmt(throughput['requests_per_s']))
+            metric_cols[1].metric("Erreurs 5xx/s", fmt(throughput['errors_per_s']))
+            metric_cols[2].metric("p50", fmt(latency['p50'], " ms"))
+            metric_cols[3].metric("p95", fmt(latency['p95'], " ms"))
+            metric_cols[4].metric("p99", fmt(latency['p99'], " ms"))
+        
+        queues = snapshot['queues']
+        admission_routes = queues['admission'].values()
+        with live_queues.container():
+            metric_cols = st.columns(4)
+            metric_cols[0].metric("File micro-batch", queues['microbatch'] if queues['microbatch'] is not None else "—")
+            metric_cols[1].metric("Requêtes en cours", sum(route['in_flight'] for route in admission_routes))
+            metric_cols[2].metric("En attente d'admission", sum(route['queued'] for route in admission_routes))
+            metric_cols[3].metric(
+                "Journal en tampon", queues['prediction_log'] if queues['prediction_log'] is not None else "—"
+            )
+            if len(workers) > 1:
+                # Détail par worker (le tableau est redessiné à chaque instantané)
+                st.dataframe(pd.DataFrame([
+                    {
+                        'Worker': worker['pid'],
+                        'Prêt': worker['health']['ready'],
+                        'Modèle': worker['health']['model_version'],
+                        'File micro-batch': worker['queues']['microbatch'],
+                        'Requêtes en cours': sum(route['in_flight'] for route in worker['queues']['admission'].values()),
+                    }
+                    for worker in workers
+                ]), use_container_width=True, hide_index=True)
+        
+        if len(points) > 1:
+            points_df = pd.DataFrame(points)
+            with live_charts.container():
+                chart_cols = st.columns(2)
+                with chart_cols[0]:
+                    fig = px.line(points_df, x='Heure', y='Requêtes/s', title='Débit')
+                    st.plotly_chart(fig, use_container_width=True, key=f"monitor_throughput_{snapshot['t']}")
+                with chart_cols[1]:
+                    fig = px.line(
+                        points_df.melt(id_vars='Heure', value_vars=['p50', 'p95', 'p99'], var_name='Percentile', value_name='ms'),
+                        x='Heure', y='ms', color='Percentile', title='Latence (ms)'
+                    )
+                    st.plotly_chart(fig, use_container_width=True, key=f"monitor_latency_{snapshot['t']}")
+    
+    if live:
+        points = st.session_state.monitor_points
+        try:
+            # Le serveur ferme le flux au bout de quelques minutes : reconnexion
+            while True:
+                for event, snapshot in transport.stream_events(get_api_session(), f"{SERVER_URL}/monitor/stream"):
+                    if event != 'snapshot':
+                        continue
+                    if snapshot['interval_s'] is not None:
+                        points.append({
+                            'Heure': datetime.fromtimestamp(snapshot['t']),
+                            'Requêtes/s': snapshot['throughput']['requests_per_s'],
+                            'p50': snapshot['latency_ms']['p50'],
+                            'p95': snapshot['latency_ms']['p95'],
+                            'p99': snapshot['latency_ms']['p99'],
+                        })
+                    show_snapshot(snapshot, points)
+        except requests.exceptions.RequestException as e:
+            live_status.error(f"❌ Flux de monitoring interrompu : {e}")
+    else:
+        live_status.info("Suivi en direct désactivé.")
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Au-delà de ces tailles, le navigateur ne reçoit plus chaque point :
+# - WEBGL_THRESHOLD : nuages de points rendus en WebGL (Scattergl)
+# - BINNING_THRESHOLD : nuages de points agrégés en cases (une bulle par
+#   case et par classe, taille = effectif)
+# - LINE_MAX_POINTS : courbes réduites par LTTB à ce nombre de points
+WEBGL_THRESHOLD = 1000
+BINNING_THRESHOLD = 20000
+BINS = 60
+LINE_MAX_POINTS = 2000
+
+
+def scatter(df, x, y, color, size=None, title=None, labels=None,
+            webgl_threshold=WEBGL_THRESHOLD, binning_threshold=BINNING_THRESHOLD, bins=BINS):
+    # Identique à px.scatter pour les petits volumes
+    if len(df) <= webgl_threshold:
+        return px.scatter(df, x=x, y=y, color=color, size=size, title=title, labels=labels)
+    if len(df) <= binning_threshold:
+        return px.scatter(df, x=x, y=y, color=color, size=size, title=title, labels=labels, render_mode="webgl")
+
+    binned = bin_points(df, x, y, color, bins)
+    return px.scatter(
+        binned, x=x, y=y, color=color, size="count",
+        title=f"{title} ({len(df)} points, par cases)" if title else None,
+        labels={**(labels or {}), "count": "Effectif"},
+        render_mode="webgl",
+    )
+
+
+def bin_points(df, x, y, color, bins=BINS):
+    # Effectif par case d'une grille bins × bins et par classe ; chaque case
+    # non vide devient un point placé au centre de la case
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    x_edges = np.histogram_bin_edges(xs[finite], bins)
+    y_edges = np.histogram_bin_edges(ys[finite], bins)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+
+    frames = []
+    groups = df[color].to_numpy()
+    for group in pd.unique(groups[finite]):
+        mask = finite & (groups == group)
+        counts, _, _ = np.histogram2d(xs[mask], ys[mask], bins=(x_edges, y_edges))
+        i, j = np.nonzero(counts)
+        frames.append(pd.DataFrame({x: x_centers[i], y: y_centers[j], color: group, "count": counts[i, j]}))
+    if not frames:
+        return pd.DataFrame(columns=[x, y, color, "count"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def line(y, x=None, title=None, labels=None, max_points=LINE_MAX_POINTS, **kwargs):
+    # Identique à px.line pour les petits volumes, sinon courbe réduite par
+    # LTTB (pics et creux conservés) et rendue en WebGL
+    y = np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return px.line(x=x, y=y, title=title, labels=labels, **kwargs)
+    x = np.arange(len(y)) if x is None else np.asarray(x)
+    index = lttb(np.arange(len(y), dtype=float), y, max_points)
+    return px.line(x=x[index], y=y[index], title=title, labels=labels, render_mode="webgl", **kwargs)
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets : indices des `threshold` points qui
+    # préservent le mieux la forme de la courbe (premier et dernier inclus)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for k in range(threshold - 2):
+        start, end = edges[k], edges[k + 1]
+        # Sommet suivant : moyenne du seau d'après (le dernier point à la fin)
+        next_end = edges[k + 2] if k + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[k + 1] = previous
+    return selected
+
+
+def drift_histogram(edges, training, live, title=None):
+    # Proportions par intervalle (bornes d'entraînement, plus un intervalle
+    # de débordement de chaque côté) : entraînement et trafic superposés
+    edges = [float(edge) for edge in edges]
+    names = [f"< {edges[0]:.2f}"]
+    names += [f"{low:.2f} – {high:.2f}" for low, high in zip(edges[:-1], edges[1:])]
+    names.append(f"≥ {edges[-1]:.2f}")
+    frames = []
+    for source, counts in (("Entraînement", training), ("Trafic", live)):
+        counts = np.asarray(counts, dtype=float)
+        share = counts / counts.sum() if counts.sum() else counts
+        frames.append(pd.DataFrame({"Intervalle": names, "Proportion": share, "Source": source}))
+    return px.bar(
+        pd.concat(frames, ignore_index=True), x="Intervalle", y="Proportion", color="Source",
+        barmode="overlay", opacity=0.6, title=title,
+    )
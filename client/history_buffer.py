@@ -0,0 +1,114 @@
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+
+class HistoryBuffer:
+    # Historique de session en colonnes NumPy préallouées : un ajout écrit
+    # une ligne dans chaque tableau (O(1) amorti, capacité doublée au
+    # besoin). Au-delà de max_size, les plus anciennes lignes sont écrasées
+    # (tampon circulaire). Les agrégats sont tenus à jour à chaque ajout ;
+    # `version` change à chaque modification et sert de clé de cache.
+
+    def __init__(self, max_size=100000, initial_capacity=256):
+        self.max_size = max_size
+        self.id = uuid.uuid4().hex
+        self.labels = []
+        self._codes = {}
+        self.clear(initial_capacity)
+
+    def clear(self, initial_capacity=256):
+        capacity = min(initial_capacity, self.max_size)
+        self._timestamp = np.empty(capacity, dtype="datetime64[ms]")
+        self._prediction = np.empty(capacity, dtype=np.int16)
+        self._features = np.empty((capacity, len(FEATURES)), dtype=np.float32)
+        self._response_time = np.empty(capacity, dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        self.counts = np.zeros(len(self.labels), dtype=np.int64)
+        self.response_time_sum = 0.0
+        self.version = getattr(self, "version", 0) + 1
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._prediction)
+
+    def append(self, prediction, features, response_time, timestamp=None):
+        code = self._code(prediction)
+        if self._size == self.capacity and self.capacity < self.max_size:
+            self._grow(min(2 * self.capacity, self.max_size))
+
+        if self._size < self.capacity:
+            index = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            # Plein : la ligne la plus ancienne sort des agrégats et est écrasée
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+            self.counts[self._prediction[index]] -= 1
+            self.response_time_sum -= float(self._response_time[index])
+
+        self._timestamp[index] = np.datetime64(timestamp or datetime.now(), "ms")
+        self._prediction[index] = code
+        self._features[index] = [features[name] for name in FEATURES]
+        self._response_time[index] = response_time
+        self.counts[code] += 1
+        self.response_time_sum += float(self._response_time[index])
+        self.version += 1
+
+    def _code(self, label):
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+            self.counts = np.append(self.counts, 0)
+        return code
+
+    def _grow(self, capacity):
+        # Recopie dans l'ordre chronologique : la ligne la plus ancienne en 0
+        order = self._order()
+        self._timestamp = _resized(self._timestamp[order], capacity)
+        self._prediction = _resized(self._prediction[order], capacity)
+        self._features = _resized(self._features[order], capacity)
+        self._response_time = _resized(self._response_time[order], capacity)
+        self._start = 0
+
+    def _order(self):
+        return (self._start + np.arange(self._size)) % self.capacity
+
+    # Vues dérivées (lignes dans l'ordre chronologique)
+
+    def response_times(self):
+        return self._response_time[self._order()]
+
+    def frame(self):
+        order = self._order()
+        df = pd.DataFrame(self._features[order], columns=FEATURES)
+        df.insert(0, "prediction", pd.Categorical.from_codes(self._prediction[order], categories=self.labels))
+        df.insert(0, "timestamp", self._timestamp[order])
+        df["response_time"] = self._response_time[order]
+        return df
+
+    # Agrégats incrémentaux
+
+    def mean_response_time(self):
+        return self.response_time_sum / self._size if self._size else None
+
+    def species_counts(self):
+        return {label: int(count) for label, count in zip(self.labels, self.counts) if count}
+
+    def most_common(self):
+        return self.labels[int(np.argmax(self.counts))] if self._size else None
+
+
+def _resized(array, capacity):
+    resized = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
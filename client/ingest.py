@@ -0,0 +1,262 @@
+import bisect
+import io
+import os
+import tempfile
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from transport import ERROR_LABEL, FEATURES
+
+# Colonnes lues directement en float32 par le parseur C de pandas
+DTYPES = {name: np.float32 for name in FEATURES}
+
+# Bornes d'une mesure plausible (cm) : hors bornes, la ligne est invalide
+VALUE_RANGE = (0.0, 50.0)
+
+# Valeur affichée pour les lignes rejetées avant l'envoi au serveur
+INVALID_LABEL = "Invalide"
+
+# Remplace les champs d'une ligne mal formée (mode tolérant) : la ligne est
+# gardée, rejetée comme invalide, et les numéros de ligne restent exacts
+MALFORMED = "\x00"
+
+# Colonne ajoutée après celles de l'en-tête pour le moteur C : non vide, la
+# ligne a trop de champs. Le moteur C tronque sans erreur une telle ligne
+# quand elle ouvre un bloc.
+OVERFLOW = "\x00overflow"
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class Report:
+    # Bilan de la lecture : compteurs et premières lignes rejetées (numéro
+    # de ligne du fichier, en-tête compris)
+
+    def __init__(self, max_examples=100):
+        self.max_examples = max_examples
+        self.rows = 0
+        self.invalid = 0
+        self.missing = 0
+        self.out_of_range = 0
+        self.malformed = 0
+        self.examples = []
+
+    def add(self, start, frame, finite, in_range, malformed=None):
+        # Une ligne du bloc par ligne du fichier : la ligne start + index du
+        # bloc est la ligne start + index + 2 du fichier (en-tête compris)
+        self.rows += len(frame)
+        if malformed is None:
+            malformed = np.zeros(len(frame), dtype=bool)
+        missing = ~finite.all(axis=1) & ~malformed
+        out_of_range = finite.all(axis=1) & ~in_range.all(axis=1)
+        self.missing += int(missing.sum())
+        self.out_of_range += int(out_of_range.sum())
+        self.malformed += int(malformed.sum())
+        self.invalid += int((missing | out_of_range | malformed).sum())
+
+        for index in np.flatnonzero(missing | out_of_range | malformed)[:self.max_examples - len(self.examples)]:
+            if malformed[index]:
+                columns, reason = "", "ligne mal formée"
+            else:
+                columns = ", ".join(name for name, ok in zip(FEATURES, finite[index] & in_range[index]) if not ok)
+                reason = "valeur manquante ou non numérique" if missing[index] else "valeur hors bornes"
+            self.examples.append({"ligne": start + int(index) + 2, "colonnes": columns, "motif": reason})
+
+
+def check_header(source):
+    # Colonnes de l'en-tête ; SchemaError s'il en manque
+    source.seek(0)
+    columns = pd.read_csv(source, nrows=0).columns
+    source.seek(0)
+    missing = [name for name in FEATURES if name not in columns]
+    if missing:
+        raise SchemaError(f"Colonnes manquantes: {', '.join(missing)}")
+    return list(columns)
+
+
+def preview(source, rows=10):
+    check_header(source)
+    frame = pd.read_csv(source, nrows=rows)
+    source.seek(0)
+    return frame
+
+
+def read_chunks(source, chunk_size, report=None):
+    # Blocs (start, DataFrame float32, masque des lignes valides) : seul le
+    # bloc courant est en mémoire. Lecture stricte en float32 ; au premier
+    # bloc contenant une valeur non numérique, la lecture reprend à ce bloc
+    # en mode tolérant (valeurs converties une à une), puis, au premier bloc
+    # contenant une ligne mal formée, avec le moteur python (lignes mal
+    # formées remplacées par MALFORMED). Lignes vides conservées : la ligne
+    # start + i du bloc est la ligne start + i + 2 du fichier (une ligne par
+    # enregistrement, pas de retour à la ligne entre guillemets).
+    columns = check_header(source)
+    start = 0
+    modes = iter(("strict", "tolerant", "python"))
+    mode = next(modes)
+    while True:
+        # Reprise au bloc fautif : en-tête suivi du fichier à partir de sa
+        # position en octets, sans faire ignorer start lignes à pandas
+        stream = Resume(source, start)
+        # Sans usecols : avec, pandas tronque sans erreur les lignes ayant
+        # trop de champs au lieu de les signaler mal formées
+        options = dict(chunksize=chunk_size, skip_blank_lines=False)
+        c_options = dict(engine="c", on_bad_lines="error", header=0, names=columns + [OVERFLOW], **options)
+        if mode == "strict":
+            reader = pd.read_csv(stream, dtype={**DTYPES, OVERFLOW: str}, **c_options)
+        elif mode == "tolerant":
+            reader = pd.read_csv(stream, dtype=str, **c_options)
+        else:
+            # Seul le moteur python accepte une fonction pour les lignes mal formées
+            reader = pd.read_csv(
+                stream, dtype=str, engine="python",
+                on_bad_lines=lambda fields: [MALFORMED] * len(columns), **options
+            )
+        try:
+            for frame in reader:
+                if mode != "python" and frame[OVERFLOW].notna().any():
+                    raise pd.errors.ParserError("ligne avec trop de champs")
+                frame = frame[FEATURES].reset_index(drop=True)
+                malformed = None
+                if mode != "strict":
+                    malformed = (frame == MALFORMED).any(axis=1).to_numpy()
+                    frame = frame.apply(pd.to_numeric, errors="coerce").astype(np.float32)
+                yield start, frame, validate(frame, start, report, malformed)
+                start += len(frame)
+            return
+        except pd.errors.ParserError:
+            # Ligne mal formée : directement le moteur python
+            if mode == "python":
+                raise
+            mode = "python"
+        except ValueError:
+            if mode != "strict":
+                raise
+            mode = next(modes)
+
+
+def line_offset(source, lines, block_size=1 << 20):
+    # Position en octets du début de la ligne `lines` (0 = en-tête), en
+    # comptant les fins de ligne par blocs
+    source.seek(0)
+    offset = 0
+    while lines > 0:
+        block = source.read(block_size)
+        if not block:
+            break
+        count = block.count(b"\n")
+        if count >= lines:
+            position = -1
+            for _ in range(lines):
+                position = block.index(b"\n", position + 1)
+            return offset + position + 1
+        lines -= count
+        offset += len(block)
+    return offset
+
+
+class Resume(io.RawIOBase):
+    # Vue en lecture seule d'un fichier binaire : sa ligne d'en-tête, puis
+    # ses lignes de données à partir de la ligne `start`
+
+    def __init__(self, source, start=0):
+        super().__init__()
+        source.seek(0)
+        self._header = source.readline() if start else b""
+        source.seek(line_offset(source, start + 1) if start else 0)
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._header:
+            data, self._header = self._header[:len(buffer)], self._header[len(buffer):]
+        else:
+            data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def validate(frame, start=0, report=None, malformed=None):
+    values = frame.to_numpy()
+    finite = np.isfinite(values)
+    in_range = (values > VALUE_RANGE[0]) & (values <= VALUE_RANGE[1])
+    if report is not None:
+        report.add(start, frame, finite, in_range, malformed)
+    return (finite & in_range).all(axis=1)
+
+
+class ResultWriter:
+    # Résultat écrit bloc par bloc dans un CSV temporaire, dans l'ordre du
+    # fichier : seuls les blocs lus et pas encore prédits restent en mémoire
+    # (au plus 2 × max_workers de transport.predict_chunks, plus un). Seuls
+    # les comptes par prédiction et la position en octets de chaque bloc
+    # écrit sont gardés.
+
+    def __init__(self, column="Prédiction"):
+        self.column = column
+        self.columns = FEATURES + [column]
+        self.rows = 0
+        self.counts = Counter()
+        fd, self.path = tempfile.mkstemp(prefix="iris_batch_", suffix=".csv")
+        self._file = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        pd.DataFrame(columns=self.columns).to_csv(self._file, index=False)
+        self._starts = []
+        self._offsets = []
+        self._pending = {}
+        self._order = deque()
+
+    def track(self, chunks):
+        # Blocs de read_chunks -> lignes valides pour transport.predict_chunks
+        for start, frame, valid in chunks:
+            self._pending[start] = [frame, valid, None]
+            self._order.append(start)
+            if valid.any():
+                yield start, frame[valid]
+            else:
+                self.resolve(start, [])
+
+    def resolve(self, start, names):
+        # Noms prédits pour les lignes valides du bloc, None si la requête a échoué
+        self._pending[start][2] = names if names is not None else ERROR_LABEL
+        while self._order and self._pending[self._order[0]][2] is not None:
+            frame, valid, names = self._pending.pop(self._order.popleft())
+            labels = np.full(len(frame), INVALID_LABEL, dtype=object)
+            labels[valid] = names
+            self._starts.append(self.rows)
+            self._offsets.append(self._file.tell())
+            frame.assign(**{self.column: labels}).to_csv(self._file, header=False, index=False)
+            self.rows += len(frame)
+            self.counts.update(labels.tolist())
+
+    def close(self):
+        # Blocs restés sans réponse : marqués en erreur
+        while self._order:
+            self.resolve(self._order[0], None)
+        self._file.close()
+        return self
+
+    def read_page(self, start, rows):
+        # Lignes [start, start + rows) : lecture à partir du bloc qui contient
+        # start, quel que soit le rang de la page
+        if not 0 <= start < self.rows:
+            return pd.DataFrame(columns=self.columns)
+        index = bisect.bisect_right(self._starts, start) - 1
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[index])
+            return pd.read_csv(
+                f, header=None, names=self.columns,
+                skiprows=start - self._starts[index], nrows=rows, skip_blank_lines=False
+            )
+
+
+def read_bytes(path):
+    # Fichier entier en mémoire : st.download_button n'accepte que des octets
+    # (appelé seulement au clic sur le bouton)
+    with open(path, "rb") as f:
+        return f.read()
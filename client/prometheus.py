@@ -0,0 +1,66 @@
+import math
+import re
+
+# Une ligne d'échantillon : nom{labels} valeur
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    # {nom: [(labels, valeur), ...]} à partir du format texte Prometheus
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_RE.match(line.strip())
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        labels = dict(LABEL_RE.findall(labels or ""))
+        samples.setdefault(name, []).append((labels, float(value)))
+    return samples
+
+
+def value(samples, name, **labels):
+    # Somme des échantillons dont les labels correspondent
+    return sum(
+        sample_value for sample_labels, sample_value in samples.get(name, [])
+        if all(sample_labels.get(key) == wanted for key, wanted in labels.items())
+    )
+
+
+def histogram(samples, name, **labels):
+    # (bornes cumulées triées, somme, total) d'un histogramme, séries
+    # correspondantes additionnées
+    buckets = {}
+    for sample_labels, sample_value in samples.get(f"{name}_bucket", []):
+        if all(sample_labels.get(key) == wanted for key, wanted in labels.items()):
+            bound = float(sample_labels["le"])
+            buckets[bound] = buckets.get(bound, 0) + sample_value
+    return (
+        sorted(buckets.items()),
+        value(samples, f"{name}_sum", **labels),
+        value(samples, f"{name}_count", **labels),
+    )
+
+
+def quantile(buckets, q):
+    # Estimation par interpolation linéaire dans la borne, comme
+    # histogram_quantile de Prometheus ; None sans observation
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if math.isinf(bound):
+                return lower
+            if cumulative == below:
+                return bound
+            return lower + (bound - lower) * (rank - below) / (cumulative - below)
+        lower, below = bound, cumulative
+    return lower
+
+
+def labels_of(samples, name, label):
+    return sorted({sample_labels[label] for sample_labels, _ in samples.get(name, []) if label in sample_labels})
@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# Valeur affichée pour les lignes dont le lot n'a pas pu être prédit
+ERROR_LABEL = "Erreur"
+
+
+def make_session(pool_size=8, retries=3, backoff=0.3):
+    # Session keep-alive : les connexions TCP sont réutilisées entre requêtes
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def predict_chunk(session, server_url, chunk, timeout=30):
+    # Un appel /predict/batch par bloc, au format colonnes
+    payload = {name: chunk[name].astype(float).tolist() for name in FEATURES}
+    response = session.post(f"{server_url}/predict/batch", json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["flower_names"]
+
+
+def predict_chunks(session, server_url, chunks, on_result, max_workers=4, on_progress=None):
+    # Envoie les blocs (start, DataFrame) de ingest.ResultWriter.track au
+    # fil de leur lecture, max_workers requêtes à la fois : au plus
+    # 2 × max_workers blocs attendent en mémoire. Chaque bloc terminé est
+    # remis à on_result(start, noms prédits ou None si échec) ; renvoie les
+    # erreurs. Les rappels sont appelés depuis le thread appelant.
+    errors = []
+    done = 0
+
+    def collect(futures, return_when):
+        nonlocal done
+        finished, _ = wait(futures, return_when=return_when)
+        for future in finished:
+            start, size = futures.pop(future)
+            try:
+                names = future.result()
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                names = None
+                errors.append(f"Bloc à partir de la ligne {start + 2} ({size} lignes valides): {e}")
+            on_result(start, names)
+            done += size
+            if on_progress is not None:
+                on_progress(done)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for start, chunk in chunks:
+            if len(futures) >= 2 * max_workers:
+                collect(futures, FIRST_COMPLETED)
+            futures[pool.submit(predict_chunk, session, server_url, chunk)] = (start, len(chunk))
+        if futures:
+            collect(futures, ALL_COMPLETED)
+
+    return errors
+
+
+def fetch_json(session, url, params=None, timeout=5):
+    # None si le serveur est injoignable ou répond en erreur
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+
+def fetch_text(session, url, timeout=5):
+    # Variante texte de fetch_json (ex. /metrics au format Prometheus)
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.text
+
+
+def submit_job(session, server_url, file, filename, content_type, timeout=300):
+    # Envoie le fichier tel quel (flux, sans le charger en DataFrame) à
+    # /jobs et renvoie la tâche créée
+    response = session.post(
+        f"{server_url}/jobs",
+        params={"filename": filename},
+        data=file,
+        headers={"Content-Type": content_type},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def download(session, url, timeout=(5, 300), chunk_size=1 << 20):
+    # Réponse écrite par blocs dans un fichier temporaire, jamais chargée en
+    # entier (ex. résultat d'une tâche) ; chemin du fichier, None en cas
+    # d'échec
+    fd, path = tempfile.mkstemp(prefix="iris_job_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f, session.get(url, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(response.status_code)
+            for block in response.iter_content(chunk_size):
+                f.write(block)
+    except requests.exceptions.RequestException:
+        os.remove(path)
+        return None
+    return path
+
+
+def stream_events(session, url, timeout=(5, 30)):
+    # Événements server-sent events (nom, données JSON) lus sur une seule
+    # connexion, jusqu'à ce que le serveur ferme le flux. Les erreurs réseau
+    # remontent à l'appelant.
+    headers = {"Accept": "text/event-stream"}
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+        response.raise_for_status()
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                # Ligne vide : fin de l'événement
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif not line.startswith(":"):
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+
+
+class RouteLimiter:
+    # Au plus max_in_flight requêtes en cours ; au-delà, max_queue requêtes
+    # attendent une place (FIFO) pendant queue_timeout secondes au plus.
+    # File pleine ou attente dépassée : la requête est rejetée sans être
+    # exécutée.
+
+    def __init__(self, max_in_flight, max_queue=0, queue_timeout=1.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.expired = 0
+        self._waiters = deque()
+
+    @property
+    def queue_size(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        # True si une place est obtenue, False si la requête est rejetée
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # La place est arrivée en même temps que l'échéance
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self.expired += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self):
+        # La place libérée passe directement au premier en attente
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "expired": self.expired,
+        }
+
+
+class TokenBucket:
+    # Seau à jetons par client : `rate` requêtes/s en régime permanent,
+    # jusqu'à `burst` d'un coup. Les clients inactifs les plus anciens sont
+    # oubliés au-delà de max_clients.
+
+    def __init__(self, rate, burst=None, max_clients=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1.0, 2 * rate)
+        self.max_clients = max_clients
+        self.clock = clock
+        self.limited = 0
+        self._buckets = OrderedDict()
+
+    def take(self, client):
+        # 0 si la requête passe, sinon secondes avant le prochain jeton
+        now = self.clock()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+            self.limited += 1
+
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "limited": self.limited,
+        }
+
+
+class AdmissionMiddleware:
+    # Middleware ASGI pur placé avant le routage : les requêtes refusées ne
+    # coûtent ni lecture du corps ni validation. Les routes absentes de
+    # `limiters` (/health, /metrics...) ne sont jamais limitées.
+
+    def __init__(self, app, limiters=None, rate_limiter=None, client_header=None):
+        self.app = app
+        self.limiters = limiters or {}
+        self.rate_limiter = rate_limiter
+        self.client_header = client_header.lower().encode("latin-1") if client_header else None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiters.get(scope.get("path")) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.take(self._client(scope))
+            if wait > 0:
+                await _reject(scope, send, 429, "Trop de requêtes pour ce client", wait)
+                return
+
+        if not await limiter.acquire():
+            await _reject(scope, send, 503, "Serveur saturé, réessayer plus tard", limiter.queue_timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    def _client(self, scope):
+        # Adresse du client, ou premier élément d'un en-tête (ex. X-Forwarded-For)
+        if self.client_header is not None:
+            for name, value in scope.get("headers", []):
+                if name == self.client_header:
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else ""
+
+
+async def _reject(scope, send, status, detail, retry_after):
+    # Route jamais atteinte : son chemin sert d'étiquette aux métriques
+    scope.setdefault("state", {})["route_path"] = scope["path"]
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
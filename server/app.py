@@ -1,10 +1,139 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 import joblib
 import numpy as np
+import asyncio
+import logging
+import os
+import time
+import bulk_io
+import forest
+import grid
+from batching import MicroBatcher
+from executor import InferenceExecutor, cpu_count
+from cache import PredictionCache
+import streaming
+import database
+import history
+import jobs
+import metrics
+import admission
+import capture
+import drift
+import monitor
+import registry
+from prediction_log import PredictionLogger
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Chargement et chauffe du modèle en tâche de fond : /health répond 503
+    # jusqu'à ce que la première version soit active
+    bundled = await asyncio.to_thread(model_store.ensure, MODEL_PATH)
+    # Version imposée ou modèle livré nouvellement enregistré : publiés dans
+    # le pointeur une fois actifs ; sinon version du pointeur ACTIVE, la plus
+    # récente à défaut
+    version = MODEL_VERSION or bundled
+    if version is not None:
+        model_manager.reload(version, publish=True)
+    else:
+        model_manager.reload(await asyncio.to_thread(model_store.active))
+    if MODEL_WATCH_INTERVAL > 0:
+        model_manager.watch(MODEL_WATCH_INTERVAL)
+    if batcher is not None:
+        batcher.start()
+    if prediction_logger is not None:
+        prediction_logger.start()
+    await ensure_history_indexes()
+    if job_runner is not None:
+        job_runner.start()
+    if traffic_capture is not None:
+        traffic_capture.start()
+    if drift_monitor is not None:
+        drift_monitor.start()
+    monitor_hub.start()
+    yield
+    await model_manager.stop()
+    if batcher is not None:
+        await batcher.stop()
+    if prediction_logger is not None:
+        await prediction_logger.stop()
+    if job_runner is not None:
+        await job_runner.stop()
+    if traffic_capture is not None:
+        await traffic_capture.stop()
+    if drift_monitor is not None:
+        await asyncio.to_thread(drift_monitor.stop)
+    await monitor_hub.stop()
+    inference_executor.shutdown()
+    database.close()
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(history.router)
+app.include_router(jobs.router)
+
+# Contrôle d'admission : requêtes en cours et file d'attente bornées par
+# route, rejet immédiat (503 + Retry-After) au-delà, échéance d'attente
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000")) / 1000
+admission_limiters = {}
+if ADMISSION_ENABLED:
+    # /predict/ : requêtes légères regroupées par le micro-batching
+    admission_limiters["/predict/"] = admission.RouteLimiter(
+        max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "256")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "512")),
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT
+    )
+    # Lots, bulk et flux : chaque requête occupe un CPU
+    for path in ("/predict/batch", "/predict/bulk", "/predict/stream"):
+        admission_limiters[path] = admission.RouteLimiter(
+            max_in_flight=int(os.getenv("ADMISSION_BULK_MAX_IN_FLIGHT", "0")) or cpu_count(),
+            max_queue=int(os.getenv("ADMISSION_BULK_MAX_QUEUE", "16")),
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT
+        )
+
+# Limite de débit par client (seau à jetons), désactivée par défaut
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+rate_limiter = None
+if RATE_LIMIT_PER_SECOND > 0:
+    rate_limiter = admission.TokenBucket(
+        RATE_LIMIT_PER_SECOND,
+        burst=float(os.getenv("RATE_LIMIT_BURST", "0")) or None
+    )
+
+if admission_limiters:
+    app.add_middleware(
+        admission.AdmissionMiddleware,
+        limiters=admission_limiters,
+        rate_limiter=rate_limiter,
+        client_header=os.getenv("RATE_LIMIT_CLIENT_HEADER") or None
+    )
+
+# Capture du trafic en JSONL pour le rejeu (benchmarks replay), désactivée
+# par défaut ; placée avant l'admission pour dater l'arrivée des requêtes
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "0") == "1"
+traffic_capture = None
+if CAPTURE_ENABLED:
+    # Un fichier par processus : les workers de serve.py n'écrivent pas
+    # dans le même fichier
+    traffic_capture = capture.TrafficCapture(
+        os.getenv("CAPTURE_PATH", "captures/traffic-{pid}.jsonl").format(pid=os.getpid()),
+        max_buffer=int(os.getenv("CAPTURE_BUFFER_SIZE", "10000")),
+        flush_interval=float(os.getenv("CAPTURE_FLUSH_INTERVAL", "1.0"))
+    )
+    app.add_middleware(
+        capture.CaptureMiddleware,
+        capture=traffic_capture,
+        routes=[route.strip() for route in os.getenv("CAPTURE_ROUTES", "/predict/").split(",")],
+        sample_rate=float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0")),
+        max_body_bytes=int(os.getenv("CAPTURE_MAX_BODY_BYTES", "65536"))
+    )
 
 # Configuration CORS pour permettre les requêtes depuis Streamlit
 app.add_middleware(
@@ -15,8 +144,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Charger le modèle
-model = joblib.load("iris_model.joblib")
+# Compteurs et histogrammes de latence par route, exposés sur /metrics ; le
+# flux de monitoring, ouvert plusieurs minutes, fausserait les latences
+app.add_middleware(metrics.MetricsMiddleware, excluded=("/metrics", "/monitor/stream"))
+
+# Modèle livré avec l'image, enregistré comme première version si le registre est vide
+MODEL_PATH = os.getenv("MODEL_PATH", "iris_model.joblib")
+
+# Registre des versions du modèle ; MODEL_VERSION fixe la version chargée au démarrage
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+MODEL_VERSION = os.getenv("MODEL_VERSION") or None
+# Intervalle de lecture du pointeur ACTIVE : les workers de serve.py suivent
+# ainsi un /model/reload reçu par l'un d'eux
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "2"))
+model_store = registry.ModelStore(MODEL_REGISTRY_DIR)
+
+# Forêt compilée en tableaux plats pour le chemin chaud (désactivable)
+COMPILED_FOREST = os.getenv("COMPILED_FOREST", "1") == "1"
+
+# Forêt exportée une fois en tableaux .npy et mappée en lecture seule : les
+# pages sont partagées entre workers (activé par serve.py)
+SHARED_MODEL = os.getenv("SHARED_MODEL", "0") == "1"
+
+# Cache LRU des prédictions unitaires, clé = mesures arrondies
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+prediction_cache = None
+if CACHE_ENABLED:
+    prediction_cache = PredictionCache(
+        max_size=int(os.getenv("CACHE_MAX_SIZE", "10000")),
+        precision=int(os.getenv("CACHE_PRECISION", "3")),
+        ttl=float(os.getenv("CACHE_TTL_SECONDS", "0"))
+    )
+
+# Table de décision précalculée sur la grille des curseurs du client
+GRID_ENABLED = os.getenv("GRID_ENABLED", "0") == "1"
+GRID_DIR = os.getenv("GRID_DIR", "grids")
+grid_spec = grid.GridSpec.from_env() if GRID_ENABLED else None
+
+# Charger une version du modèle (appelé hors de la boucle d'événements)
+def load_model(version, path):
+    shared_forest = forest.load_shared(path) if SHARED_MODEL else None
+    if shared_forest is not None:
+        # Sans joblib.load : la forêt mappée sert aussi les gros lots
+        new_model, new_forest, new_predictor = None, shared_forest, shared_forest
+    else:
+        new_model = joblib.load(path)
+        new_forest = forest.compile_model(new_model) if COMPILED_FOREST else None
+        new_predictor = forest.ForestPredictor(new_model, new_forest)
+
+    # Construite une fois par version de modèle, puis relue depuis le disque
+    new_grid = None
+    if GRID_ENABLED:
+        new_grid = grid.load_or_build(
+            GRID_DIR, grid.file_fingerprint(path), grid_spec, new_predictor.predict
+        )
+        new_predictor = grid.GridPredictor(new_grid, new_predictor)
+
+    return registry.ModelVersion(
+        version, path, new_predictor, model=new_model, forest=new_forest, decision_grid=new_grid
+    )
+
+# Juste avant la bascule vers une nouvelle version
+async def activate_model(loaded):
+    await inference_executor.swap_model(loaded.path, warmup=registry.warmup_batches())
+
+    # Les prédictions en cache viennent de l'ancien modèle
+    if prediction_cache is not None and len(prediction_cache):
+        prediction_cache.clear()
+
+    # Référence de dérive : distribution d'entraînement de la nouvelle version
+    if drift_monitor is not None:
+        profile = model_store.metadata(loaded.version).get("profile")
+        if profile is None:
+            profile = await asyncio.to_thread(default_training_profile)
+        drift_monitor.set_profile(profile, loaded.version)
+
+model_manager = registry.ModelManager(model_store, load_model, on_swap=activate_model)
+
+def require_model():
+    active = model_manager.active
+    if active is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modèle en cours de chargement",
+            headers={"Retry-After": "1"}
+        )
+    return active
+
+# Taille maximale d'un lot pour /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Nombre maximal de lignes pour /predict/bulk (formats binaires)
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", "5000000"))
+
+# Exécution des prédictions hors de la boucle : thread, process ou inline
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0")) or None
+
+# Regroupement des requêtes /predict/ concurrentes (micro-batching)
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "1") == "1"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+
+# Lignes prédites par bloc sur /predict/stream
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+
+# Journalisation différée des prédictions dans MongoDB (si MONGODB_URL est défini)
+PREDICTION_LOG_ENABLED = os.getenv("PREDICTION_LOG_ENABLED", "1") == "1"
+prediction_logger = None
+if PREDICTION_LOG_ENABLED and database.get_database() is not None:
+    prediction_logger = PredictionLogger(
+        database.get_database()["predictions"],
+        max_buffer=int(os.getenv("LOG_BUFFER_SIZE", "10000")),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+    )
+
+async def ensure_history_indexes():
+    # Index de l'historique, créés sans bloquer le démarrage si MongoDB est absent
+    db = database.get_database()
+    if db is None:
+        return
+    try:
+        await asyncio.to_thread(history.ensure_indexes, db[history.COLLECTION])
+        await asyncio.to_thread(jobs.ensure_indexes, db)
+    except Exception as e:
+        logger.warning("Index de l'historique non créés: %s", e)
+
+# Ordre des colonnes attendu par le modèle
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# Suivi de la dérive des entrées : un résumé par variable, mis à jour à
+# chaque requête et comparé à la distribution d'entraînement
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "1") == "1"
+drift_monitor = None
+if DRIFT_ENABLED:
+    # Répertoire partagé : chaque worker y publie son état pour /drift
+    drift_monitor = drift.DriftMonitor(
+        FEATURES,
+        directory=os.getenv("DRIFT_DIR", "drift_state"),
+        flush_interval=float(os.getenv("DRIFT_FLUSH_INTERVAL", "10"))
+    )
+
+# Modèle sans profil enregistré (ex. modèle livré avec l'image) : profil
+# recalculé sur le jeu d'entraînement de train.py
+def default_training_profile():
+    import train
+    X_train, _, _, _ = train.load_data()
+    return drift.training_profile(X_train, train.FEATURES)
 
 # Mapping des prédictions vers les noms de fleurs
 iris_names = {
@@ -25,6 +300,49 @@ iris_names = {
     2: "Virginica"
 }
 
+# Prédiction vectorisée sur une matrice N x 4
+def predict_array(data):
+    # Version lue une seule fois : une bascule n'affecte pas un appel en cours
+    active = model_manager.active
+    start = time.perf_counter()
+    predictions = active.predictor.predict(data).astype(int)
+    metrics.model_latency.observe(time.perf_counter() - start)
+    metrics.model_batch_size.observe(len(data))
+    return predictions
+
+inference_executor = InferenceExecutor(
+    predict_array,
+    mode=INFERENCE_EXECUTOR,
+    workers=INFERENCE_WORKERS,
+    compiled=COMPILED_FOREST,
+    shared=SHARED_MODEL,
+    grid_dir=GRID_DIR,
+    grid_spec=grid_spec
+)
+
+batcher = None
+if MICROBATCH_ENABLED:
+    batcher = MicroBatcher(
+        inference_executor.run,
+        max_batch_size=MICROBATCH_MAX_SIZE,
+        max_wait_ms=MICROBATCH_MAX_WAIT_MS
+    )
+
+# Tâches de scoring asynchrones (fichiers CSV/Parquet stockés dans MongoDB)
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "1") == "1"
+job_runner = None
+if JOBS_ENABLED and database.get_database() is not None:
+    job_runner = jobs.JobRunner(
+        database.get_database(),
+        inference_executor.run,
+        iris_names,
+        FEATURES,
+        chunk_bytes=int(os.getenv("JOB_CHUNK_MB", "8")) << 20,
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+        ready=lambda: model_manager.ready
+    )
+    app.state.job_runner = job_runner
+
 # Définir le modèle de données
 class Item(BaseModel):
     sepal_length: float
@@ -32,36 +350,433 @@ class Item(BaseModel):
     petal_length: float
     petal_width: float
 
+# Lot de mesures : liste d'objets ou colonnes
+class BatchItem(BaseModel):
+    items: Optional[List[Item]] = None
+    sepal_length: Optional[List[float]] = None
+    sepal_width: Optional[List[float]] = None
+    petal_length: Optional[List[float]] = None
+    petal_width: Optional[List[float]] = None
+
+    def to_array(self):
+        if self.items is not None:
+            return np.array(
+                [[getattr(item, name) for name in FEATURES] for item in self.items],
+                dtype=np.float64
+            ).reshape(-1, len(FEATURES))
+
+        columns = [getattr(self, name) for name in FEATURES]
+        if any(column is None for column in columns):
+            raise ValueError("Fournir 'items' ou les quatre colonnes " + ", ".join(FEATURES))
+        if len({len(column) for column in columns}) != 1:
+            raise ValueError("Les colonnes doivent avoir la même longueur")
+        return np.column_stack([np.asarray(column, dtype=np.float64) for column in columns])
+
 @app.get("/")
 async def root():
     return {"message": "Iris ML API is running", "version": "1.0.0"}
 
 @app.get("/health")
-async def health():
-    return {"status": "healthy"}
+async def health(response: Response):
+    # Prêt seulement quand une version chargée et chauffée est active
+    status = model_manager.status()
+    if not status["ready"]:
+        response.status_code = 503
+    return {"status": "healthy" if status["ready"] else "starting", **status}
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None
+
+@app.get("/model")
+async def model_info():
+    return {
+        **model_manager.status(),
+        "registry_active": await asyncio.to_thread(model_store.active),
+        "versions": [
+            {"version": version, **model_store.metadata(version)}
+            for version in await asyncio.to_thread(model_store.versions)
+        ]
+    }
+
+@app.post("/model/reload", status_code=202)
+async def reload_model(reload: Optional[ReloadRequest] = None):
+    # Charge une version (la plus récente par défaut) en tâche de fond ; la
+    # bascule a lieu après la chauffe, voir /health
+    version = reload.version if reload is not None else None
+    try:
+        # Les autres workers suivent le pointeur du registre, écrit après la
+        # bascule : une version qui ne se charge pas n'y est jamais publiée
+        loading = model_manager.reload(version, publish=True)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Version inconnue: {version}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"loading_version": loading, **model_manager.status()}
+
+# Compteurs tenus par les composants, lus au moment de l'export
+metrics.registry.gauge(
+    "cache_events_total", "Événements du cache de prédictions",
+    lambda: {
+        (event,): prediction_cache.stats()[event]
+        for event in ("hits", "misses", "evictions", "expirations", "invalidations")
+    } if prediction_cache is not None else {},
+    labels=("event",), kind="counter"
+)
+metrics.registry.gauge(
+    "cache_entries", "Entrées dans le cache de prédictions",
+    lambda: len(prediction_cache) if prediction_cache is not None else None
+)
+metrics.registry.gauge(
+    "grid_lookups_total", "Lectures de la table de décision",
+    lambda: grid_lookups(),
+    labels=("result",), kind="counter"
+)
+metrics.registry.gauge(
+    "model_ready", "1 quand une version du modèle est active",
+    lambda: int(model_manager.ready)
+)
+metrics.registry.gauge(
+    "model_swaps_total", "Bascules vers une nouvelle version du modèle",
+    lambda: model_manager.swaps, kind="counter"
+)
+metrics.registry.gauge(
+    "admission_requests_total", "Décisions du contrôle d'admission par route",
+    lambda: {
+        (path, outcome): limiter.stats()[outcome]
+        for path, limiter in admission_limiters.items()
+        for outcome in ("admitted", "queued", "rejected", "expired")
+    },
+    labels=("route", "outcome"), kind="counter"
+)
+metrics.registry.gauge(
+    "admission_in_flight", "Requêtes admises en cours par route",
+    lambda: {(path,): limiter.in_flight for path, limiter in admission_limiters.items()},
+    labels=("route",)
+)
+metrics.registry.gauge(
+    "admission_queue_size", "Requêtes en attente d'admission par route",
+    lambda: {(path,): limiter.queue_size for path, limiter in admission_limiters.items()},
+    labels=("route",)
+)
+metrics.registry.gauge(
+    "input_drift_psi", "PSI des entrées de ce worker par rapport à l'entraînement",
+    lambda: drift_monitor.local_psi() if drift_monitor is not None else None,
+    labels=("feature",)
+)
+metrics.registry.gauge(
+    "monitor_subscribers", "Clients abonnés à /monitor/stream",
+    lambda: monitor_hub.subscribers
+)
+metrics.registry.gauge(
+    "rate_limited_total", "Requêtes refusées par la limite de débit par client",
+    lambda: rate_limiter.limited if rate_limiter is not None else None, kind="counter"
+)
+metrics.registry.gauge(
+    "microbatch_queue_size", "Requêtes en attente de micro-batching",
+    lambda: batcher.stats()["queue_size"] if batcher is not None else None
+)
+metrics.registry.gauge(
+    "microbatch_batches_total", "Micro-lots envoyés au modèle",
+    lambda: batcher.stats()["batches"] if batcher is not None else None, kind="counter"
+)
+metrics.registry.gauge(
+    "microbatch_items_total", "Requêtes traitées par micro-batching",
+    lambda: batcher.stats()["items"] if batcher is not None else None, kind="counter"
+)
+metrics.registry.gauge(
+    "microbatch_mean_batch_size", "Taille moyenne des micro-lots depuis le démarrage",
+    lambda: batcher.stats()["mean_batch_size"] if batcher is not None else None
+)
+metrics.registry.gauge(
+    "prediction_log_records_total", "Enregistrements de la journalisation MongoDB",
+    lambda: {
+        (state,): prediction_logger.stats()[state]
+        for state in ("enqueued", "written", "dropped", "failed")
+    } if prediction_logger is not None else {},
+    labels=("state",), kind="counter"
+)
+metrics.registry.gauge(
+    "prediction_log_buffered", "Enregistrements en attente d'écriture",
+    lambda: prediction_logger.stats()["buffered"] if prediction_logger is not None else None
+)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+def active_grid():
+    active = model_manager.active
+    return active.decision_grid if active is not None else None
+
+def grid_lookups():
+    decision_grid = active_grid()
+    if decision_grid is None:
+        return {}
+    return {("hit",): decision_grid.hits, ("miss",): decision_grid.misses}
+
+@app.get("/grid/stats")
+async def grid_stats():
+    decision_grid = active_grid()
+    if decision_grid is None:
+        return {"enabled": False}
+    return {"enabled": True, **decision_grid.stats()}
+
+@app.get("/log/stats")
+async def log_stats():
+    if prediction_logger is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_logger.stats()}
+
+@app.get("/drift")
+async def drift_summary():
+    # Résumés fusionnés de tous les workers et PSI par variable
+    if drift_monitor is None:
+        return {"enabled": False}
+    return await asyncio.to_thread(drift_monitor.summary)
+
+@app.get("/capture/stats")
+async def capture_stats():
+    if traffic_capture is None:
+        return {"enabled": False}
+    return {"enabled": True, **traffic_capture.stats()}
+
+@app.get("/admission/stats")
+async def admission_stats():
+    if not admission_limiters:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "routes": {path: limiter.stats() for path, limiter in admission_limiters.items()},
+        "rate_limit": rate_limiter.stats() if rate_limiter is not None else None
+    }
+
+# Santé et files d'attente de ce worker au moment de l'instantané
+def monitor_state():
+    status = model_manager.status()
+    return {
+        "pid": os.getpid(),
+        "health": {"status": "healthy" if status["ready"] else "starting", **status},
+        "queues": {
+            "microbatch": batcher.queue_size if batcher is not None else None,
+            "admission": {
+                path: {"in_flight": limiter.in_flight, "queued": limiter.queue_size}
+                for path, limiter in admission_limiters.items()
+            },
+            "prediction_log": prediction_logger.stats()["buffered"] if prediction_logger is not None else None,
+            "capture": traffic_capture.stats()["buffered"] if traffic_capture is not None else None,
+        },
+    }
+
+# Monitoring en direct : instantanés poussés en server-sent events
+monitor_hub = monitor.MonitorHub(
+    monitor_state,
+    interval=float(os.getenv("MONITOR_INTERVAL", "1.0")),
+    max_subscribers=int(os.getenv("MONITOR_MAX_SUBSCRIBERS", "32")),
+    max_duration=float(os.getenv("MONITOR_STREAM_MAX_SECONDS", "300")),
+    # Répertoire partagé : chaque worker y publie sa fenêtre, le flux
+    # fusionne celles de tous les workers ("" : ce worker seul)
+    directory=os.getenv("MONITOR_DIR", "monitor_state") or None
+)
+
+@app.get("/monitor/stream")
+async def monitor_stream():
+    queue = monitor_hub.subscribe()
+    if queue is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Trop d'abonnés au monitoring",
+            headers={"Retry-After": "5"}
+        )
+    return StreamingResponse(
+        monitor_hub.events(queue),
+        media_type="text/event-stream",
+        # Pas de mise en tampon par un proxy (nginx) ni de cache
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/predict/")
-async def predict(item: Item):
+async def predict(item: Item, request: Request):
+    route = "/predict/"
+    start = metrics.mark_handler_start(request, route)
+    active = require_model()
     try:
-        # Convertir en array numpy
-        data = np.array([[
-            item.sepal_length,
-            item.sepal_width,
-            item.petal_length,
-            item.petal_width
-        ]])
-        
-        # Faire la prédiction
-        prediction = model.predict(data)
-        prediction_number = int(prediction[0])
+        with metrics.stage(route, "array"):
+            row = [
+                item.sepal_length,
+                item.sepal_width,
+                item.petal_length,
+                item.petal_width
+            ]
+            if drift_monitor is not None:
+                drift_monitor.observe(row)
+
+        with metrics.stage(route, "lookup"):
+            # Point de la grille : simple lecture dans la table
+            prediction_number = None
+            if active.decision_grid is not None:
+                prediction_number = active.decision_grid.lookup_one(row)
+
+            # Réponse directe si ces mesures ont déjà été prédites ; la
+            # version dans la clé écarte les résultats d'un modèle remplacé
+            cache_key = None
+            if prediction_number is None and prediction_cache is not None:
+                cache_key = (active.version, prediction_cache.key(row))
+                prediction_number = prediction_cache.get(cache_key)
+
+        # Faire la prédiction (regroupée avec les requêtes concurrentes)
+        if prediction_number is None:
+            with metrics.stage(route, "predict"):
+                if batcher is not None:
+                    prediction_number = int(await batcher.submit(row))
+                else:
+                    prediction_number = int((await inference_executor.run(np.array([row])))[0])
+            if cache_key is not None:
+                prediction_cache.put(cache_key, prediction_number)
         
         # Obtenir le nom de la fleur
         flower_name = iris_names[prediction_number]
-        
+
+        # Trace d'audit, écrite plus tard par lot
+        if prediction_logger is not None:
+            prediction_logger.log({
+                **item.model_dump(),
+                "prediction": prediction_number,
+                "flower_name": flower_name,
+                "model_version": active.version,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "timestamp": datetime.now(timezone.utc)
+            })
+
+        metrics.mark_handler_end(request)
         return {
             "prediction": prediction_number,
             "flower_name": flower_name
         }
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/batch")
+async def predict_batch(batch: BatchItem, request: Request):
+    # /predict/bulk délègue ici les corps JSON : étapes comptées sous sa route
+    route = request.scope["route"].path
+    metrics.mark_handler_start(request, route)
+    require_model()
+    try:
+        with metrics.stage(route, "array"):
+            data = batch.to_array()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if drift_monitor is not None and len(data) <= MAX_BATCH_SIZE:
+        drift_monitor.observe_many(data)
+
+    if len(data) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop grand: {len(data)} > {MAX_BATCH_SIZE}"
+        )
+    if len(data) == 0:
+        return {"predictions": [], "flower_names": []}
+
+    try:
+        # Une seule prédiction sur la matrice N x 4
+        with metrics.stage(route, "predict"):
+            predictions = (await inference_executor.run(data)).tolist()
+
+        metrics.mark_handler_end(request)
+        return {
+            "predictions": predictions,
+            "flower_names": [iris_names[p] for p in predictions]
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/bulk")
+async def predict_bulk(request: Request):
+    route = "/predict/bulk"
+    content_type = bulk_io.media_type(request.headers.get("content-type"))
+    body = await request.body()
+
+    # Les clients JSON existants gardent le même contrat que /predict/batch
+    if content_type in ("", bulk_io.JSON_MEDIA_TYPE):
+        try:
+            batch = BatchItem.model_validate(await request.json())
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return await predict_batch(batch, request)
+
+    metrics.mark_handler_start(request, route)
+    require_model()
+
+    try:
+        with metrics.stage(route, "array"):
+            data = bulk_io.decode_body(
+                body,
+                content_type,
+                FEATURES,
+                dtype=request.headers.get("x-dtype", "float64")
+            )
+    except bulk_io.UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if len(data) > MAX_BULK_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop grand: {len(data)} > {MAX_BULK_ROWS}"
+        )
+    if drift_monitor is not None:
+        drift_monitor.observe_many(data)
+
+    try:
+        with metrics.stage(route, "predict"):
+            if len(data):
+                predictions = await inference_executor.run(data)
+            else:
+                predictions = np.empty(0, dtype=int)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    accept = bulk_io.negotiate(request.headers.get("accept"))
+    if accept == bulk_io.JSON_MEDIA_TYPE:
+        predictions = predictions.tolist()
+        metrics.mark_handler_end(request)
+        return {
+            "predictions": predictions,
+            "flower_names": [iris_names[p] for p in predictions]
+        }
+
+    with metrics.stage(route, "serialization"):
+        content = bulk_io.encode_predictions(predictions, accept)
+    return Response(content=content, media_type=accept)
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    # Corps CSV (avec en-tête) ou NDJSON lu au fil de l'eau, réponse NDJSON
+    require_model()
+    content_type = bulk_io.media_type(request.headers.get("content-type"))
+    parser = streaming.row_parser(content_type, FEATURES)
+    if parser is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content-Type non supporté: {content_type} (text/csv ou application/x-ndjson)"
+        )
+
+    return streaming.DuplexStreamingResponse(
+        streaming.stream_predictions(
+            request.stream(),
+            parser,
+            inference_executor.run,
+            iris_names,
+            chunk_size=STREAM_CHUNK_ROWS
+        ),
+        media_type=streaming.NDJSON_MEDIA_TYPE
+    )
@@ -0,0 +1,121 @@
+import asyncio
+import numpy as np
+
+
+class MicroBatcher:
+    # Regroupe les prédictions unitaires concurrentes en un seul lot.
+    #
+    # Les requêtes sont placées dans une file asyncio ; une tâche de fond la
+    # vide quand max_batch_size éléments attendent ou après max_wait_ms. La
+    # fenêtre d'attente n'est ouverte que si le lot précédent contenait
+    # plusieurs requêtes : une requête isolée part immédiatement.
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._full = None
+        self._task = None
+        self._stopping = False
+        self._last_batch_size = 1
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Sentinelle : le lot en cours se termine, puis la file est vidée
+        self._queue.put_nowait(None)
+        self._full.set()
+        await self._task
+        self._task = None
+
+    @property
+    def queue_size(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, row):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                self._stopping = True
+            else:
+                batch.append(item)
+        return batch
+
+    async def _run(self):
+        self._stopping = False
+        while not (self._stopping and self._queue.empty()):
+            item = await self._queue.get()
+            if item is None:
+                self._stopping = True
+                continue
+            batch = [item]
+
+            if not self._stopping and self.max_wait > 0 and (
+                self._last_batch_size > 1 or not self._queue.empty()
+            ):
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            batch = self._drain(batch)
+            self._last_batch_size = len(batch)
+            await self._predict(batch)
+
+    async def _predict(self, batch):
+        # Les appelants déjà partis (annulés) sont ignorés
+        batch = [(row, future) for row, future in batch if not future.done()]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        data = np.array([row for row, _ in batch], dtype=np.float64)
+
+        try:
+            predictions = await self.predict_fn(data)
+        except Exception:
+            # Une ligne invalide ne doit pas faire échouer tout le lot
+            for row, future in batch:
+                await self._predict_one(row, future)
+            return
+
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    async def _predict_one(self, row, future):
+        try:
+            prediction = (await self.predict_fn(np.array([row], dtype=np.float64)))[0]
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(prediction)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queue_size": self.queue_size,
+        }
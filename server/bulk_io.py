@@ -0,0 +1,115 @@
+import io
+import numpy as np
+
+# Arrow est optionnel : le format n'est proposé que si pyarrow est installé
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+NPY_MEDIA_TYPE = "application/x-npy"
+RAW_MEDIA_TYPE = "application/octet-stream"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+FLOAT_DTYPES = {"float32": np.float32, "float64": np.float64}
+
+
+class UnsupportedMediaType(Exception):
+    pass
+
+
+def media_type(header):
+    # "application/x-npy; charset=..." -> "application/x-npy"
+    return (header or "").split(";")[0].strip().lower()
+
+
+def _check_matrix(data, n_features):
+    if data.dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype non supporté: {data.dtype} (float32 ou float64 attendu)")
+    if data.ndim != 2 or data.shape[1] != n_features:
+        raise ValueError(f"Forme attendue (N, {n_features}), reçue {data.shape}")
+    return data
+
+
+def decode_npy(body, n_features):
+    # Lecture de l'en-tête seulement, le tableau est une vue sur le corps
+    stream = io.BytesIO(body)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+
+    count = int(np.prod(shape))
+    data = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    data = data.reshape(shape, order="F" if fortran_order else "C")
+    return _check_matrix(data, n_features)
+
+
+def decode_raw(body, n_features, dtype="float64"):
+    if dtype not in FLOAT_DTYPES:
+        raise ValueError(f"dtype non supporté: {dtype}")
+    itemsize = np.dtype(FLOAT_DTYPES[dtype]).itemsize
+    if len(body) % (itemsize * n_features) != 0:
+        raise ValueError("La taille du corps n'est pas un multiple d'une ligne")
+    data = np.frombuffer(body, dtype=FLOAT_DTYPES[dtype]).reshape(-1, n_features)
+    return _check_matrix(data, n_features)
+
+
+def decode_arrow(body, features):
+    if pa is None:
+        raise UnsupportedMediaType("pyarrow n'est pas installé")
+
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    missing = [name for name in features if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+
+    columns = []
+    for name in features:
+        column = table.column(name).combine_chunks()
+        if column.null_count:
+            raise ValueError(f"Valeurs manquantes dans la colonne {name}")
+        columns.append(column.to_numpy(zero_copy_only=False))
+    data = np.column_stack(columns) if columns[0].size else np.empty((0, len(features)))
+    return _check_matrix(data, len(features))
+
+
+def decode_body(body, content_type, features, dtype="float64"):
+    kind = media_type(content_type)
+    if kind == NPY_MEDIA_TYPE:
+        return decode_npy(body, len(features))
+    if kind == RAW_MEDIA_TYPE:
+        return decode_raw(body, len(features), dtype)
+    if kind == ARROW_MEDIA_TYPE:
+        return decode_arrow(body, features)
+    raise UnsupportedMediaType(f"Content-Type non supporté: {content_type}")
+
+
+def negotiate(accept):
+    # Premier format binaire demandé dans Accept, sinon JSON
+    for part in (accept or "").split(","):
+        kind = media_type(part)
+        if kind in (NPY_MEDIA_TYPE, RAW_MEDIA_TYPE):
+            return kind
+        if kind == ARROW_MEDIA_TYPE and pa is not None:
+            return kind
+    return JSON_MEDIA_TYPE
+
+
+def encode_predictions(predictions, kind):
+    predictions = np.ascontiguousarray(predictions, dtype=np.uint8)
+    if kind == NPY_MEDIA_TYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, predictions, allow_pickle=False)
+        return buffer.getvalue()
+    if kind == RAW_MEDIA_TYPE:
+        return predictions.tobytes()
+    if kind == ARROW_MEDIA_TYPE:
+        table = pa.table({"prediction": pa.array(predictions, type=pa.uint8())})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise UnsupportedMediaType(f"Format de réponse non supporté: {kind}")
@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    # Cache LRU borné des prédictions unitaires.
+    #
+    # La clé est le vecteur de caractéristiques arrondi à `precision`
+    # décimales : deux entrées égales à cette précision partagent le même
+    # résultat. `ttl` (secondes, 0 = illimité) borne l'âge d'une entrée.
+
+    def __init__(self, max_size=10000, precision=3, ttl=0.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.precision = precision
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+
+    def key(self, row):
+        return tuple(round(float(value), self.precision) for value in row)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        expires_at = self.clock() + self.ttl if self.ttl > 0 else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        # Appelé quand le modèle change : toutes les entrées sont périmées
+        self._entries.clear()
+        self.invalidations += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "precision": self.precision,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
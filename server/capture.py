@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficCapture:
+    # Capture des requêtes au format JSONL, une ligne par requête :
+    # {"t": arrivée (epoch, s), "method", "path", "query", "content_type",
+    #  "body"} (corps en texte, ou "body_b64" s'il n'est pas en UTF-8).
+    #
+    # Même principe que PredictionLogger : record() ajoute un tuple à un
+    # tampon borné (abandonné et compté s'il est plein), une tâche de fond
+    # sérialise et écrit le tampon dans un thread.
+
+    def __init__(self, path, max_buffer=10000, flush_interval=1.0):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._buffer = deque()
+        self._file = None
+        self._wake = None
+        self._task = None
+        self._stopping = False
+
+    def record(self, arrival, method, path, query, content_type, body):
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self._buffer.append((arrival, method, path, query, content_type, body))
+        self.captured += 1
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        records = [self._buffer.popleft() for _ in range(len(self._buffer))]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, records)
+        except Exception as e:
+            self.failed += len(records)
+            logger.warning("Échec d'écriture de %d requêtes capturées: %s", len(records), e)
+            return
+        self.written += len(records)
+
+    def _write(self, records):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        lines = []
+        for arrival, method, path, query, content_type, body in records:
+            entry = {"t": arrival, "method": method, "path": path, "query": query, "content_type": content_type}
+            try:
+                entry["body"] = body.decode("utf-8")
+            except UnicodeDecodeError:
+                entry["body_b64"] = base64.b64encode(body).decode("ascii")
+            lines.append(json.dumps(entry, separators=(",", ":")))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "buffered": len(self._buffer),
+        }
+
+
+class CaptureMiddleware:
+    # Middleware ASGI pur : l'heure d'arrivée est prise à l'entrée, le corps
+    # est recopié au fil de sa lecture par l'application. Seules les
+    # requêtes dont le corps a été lu en entier sont capturées (une requête
+    # refusée par le contrôle d'admission n'a pas de corps à rejouer).
+
+    def __init__(self, app, capture, routes=("/predict/",), sample_rate=1.0, max_body_bytes=65536):
+        self.app = app
+        self.capture = capture
+        self.routes = set(routes)
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] not in self.routes
+            or (self.sample_rate < 1.0 and random.random() >= self.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        arrival = time.time()
+        chunks = []
+        size = 0
+
+        async def receive_wrapper():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request" and size >= 0:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > self.max_body_bytes:
+                    # Corps trop gros : requête non capturée
+                    size = -1
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                    if not message.get("more_body", False):
+                        self.capture.record(
+                            arrival,
+                            scope["method"],
+                            scope["path"],
+                            scope.get("query_string", b"").decode("latin-1"),
+                            _header(scope, b"content-type"),
+                            b"".join(chunks),
+                        )
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
@@ -0,0 +1,25 @@
+import os
+
+from pymongo import MongoClient
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+MONGODB_DB = os.getenv("MONGODB_DB", "mlops")
+
+_client = None
+
+
+def get_database():
+    # Connexion paresseuse : None si MongoDB n'est pas configuré
+    global _client
+    if not MONGODB_URL:
+        return None
+    if _client is None:
+        _client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=2000)
+    return _client[MONGODB_DB]
+
+
+def close():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,342 @@
+import glob
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Intervalles égaux entre le min et le max d'entraînement, plus un
+# intervalle de débordement de chaque côté (le max y tombe, comme en direct)
+HISTOGRAM_BINS = 20
+
+# Quantiles comparés à ceux de l'entraînement
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Sketch de quantiles à erreur relative (DDSketch) : une case par puissance
+# de gamma entre MIN_VALUE et MAX_VALUE, bornée donc en mémoire
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-3
+MAX_VALUE = 1e3
+
+# Seuils usuels du PSI
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Lissage des proportions nulles dans le PSI
+EPSILON = 1e-4
+
+
+class QuantileSketch:
+    # DDSketch simplifié : une valeur x > 0 tombe dans la case
+    # ceil(log(x) / log(gamma)), tout quantile est estimé à
+    # RELATIVE_ACCURACY près. Deux sketches se fusionnent en additionnant
+    # leurs compteurs. Valeurs <= MIN_VALUE regroupées dans la case 0.
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    log_gamma = math.log(gamma)
+    offset = math.ceil(math.log(MIN_VALUE) / math.log(gamma))
+    size = math.ceil(math.log(MAX_VALUE) / math.log(gamma)) - offset + 1
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(self.size, dtype=np.int64) if counts is None else counts
+
+    def index(self, value):
+        if value <= MIN_VALUE:
+            return 0
+        return min(math.ceil(math.log(value) / self.log_gamma) - self.offset, self.size - 1)
+
+    def add(self, value):
+        self.counts[self.index(value)] += 1
+
+    def add_many(self, values):
+        values = np.maximum(values, MIN_VALUE)
+        index = np.ceil(np.log(values) / self.log_gamma).astype(np.int64) - self.offset
+        self.counts += np.bincount(np.clip(index, 0, self.size - 1), minlength=self.size)
+
+    def quantile(self, q):
+        total = self.counts.sum()
+        if total == 0:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), q * (total - 1), side="right"))
+        # Milieu (en erreur relative) de la case
+        return 2 * self.gamma ** (index + self.offset) / (self.gamma + 1)
+
+
+class FeatureSketch:
+    # Résumé d'une variable : histogramme sur les bornes d'entraînement,
+    # nombre, moyenne et variance (Welford), min/max et sketch de quantiles.
+    # Mise à jour en O(1) par valeur ; merge() combine deux résumés.
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.histogram = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = QuantileSketch()
+
+    def add(self, value):
+        self.histogram[bisect_right(self.edges, value)] += 1
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.quantiles.add(value)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.histogram += np.bincount(
+            np.searchsorted(self.edges, values, side="right"), minlength=len(self.histogram)
+        )
+        batch = FeatureSketch.__new__(FeatureSketch)
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        self._merge_moments(batch)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.quantiles.add_many(values)
+
+    def merge(self, other):
+        self.histogram += other.histogram
+        self._merge_moments(other)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.quantiles.counts += other.quantiles.counts
+
+    def _merge_moments(self, other):
+        # Formule de Chan et al. pour combiner moyennes et variances
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+    def state(self):
+        return {
+            "edges": np.asarray(self.edges), "histogram": self.histogram,
+            "moments": np.array([self.count, self.mean, self.m2, self.min, self.max]),
+            "quantiles": self.quantiles.counts,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["edges"].tolist())
+        sketch.histogram = state["histogram"].copy()
+        count, sketch.mean, sketch.m2, sketch.min, sketch.max = state["moments"].tolist()
+        sketch.count = int(count)
+        sketch.quantiles = QuantileSketch(state["quantiles"].copy())
+        return sketch
+
+
+def training_profile(X, features, bins=HISTOGRAM_BINS):
+    # Distribution d'entraînement enregistrée avec le modèle (métadonnées)
+    profile = {}
+    for index, name in enumerate(features):
+        values = np.asarray(X[:, index], dtype=np.float64)
+        edges = np.linspace(values.min(), values.max(), bins + 1)
+        histogram = np.bincount(np.searchsorted(edges, values, side="right"), minlength=bins + 2)
+        profile[name] = {
+            "edges": edges.tolist(),
+            "histogram": histogram.tolist(),
+            "mean": float(values.mean()),
+            "std": float(values.std(ddof=1)),
+            "quantiles": {str(q): float(np.quantile(values, q)) for q in QUANTILES},
+        }
+    return profile
+
+
+def psi(expected, actual):
+    # Population Stability Index entre deux histogrammes (mêmes bornes)
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    p = np.maximum(expected / expected.sum(), EPSILON)
+    q = np.maximum(actual / actual.sum(), EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def psi_status(value):
+    if value is None:
+        return "unknown"
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    if value >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    # Un FeatureSketch par variable, pour le processus courant. Chaque
+    # processus écrit périodiquement son état dans `directory` ; summary()
+    # fusionne l'état local et celui des autres workers encore actifs.
+
+    def __init__(self, features, directory=None, flush_interval=10.0):
+        self.features = list(features)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.profile = None
+        self.version = None
+        self.sketches = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_profile(self, profile, version=None):
+        # Nouveau profil (nouvelle version du modèle) : les résumés repartent
+        # de zéro si les bornes des histogrammes changent
+        with self._lock:
+            edges = [list(profile[name]["edges"]) for name in self.features]
+            if self.sketches is None or [sketch.edges for sketch in self.sketches] != edges:
+                self.sketches = [FeatureSketch(feature_edges) for feature_edges in edges]
+            self.profile = profile
+            self.version = version
+
+    # Valeurs non finies (NaN, inf acceptés par le JSON) ignorées : elles
+    # fausseraient définitivement moyenne, variance et min/max
+    def observe(self, row):
+        if self.sketches is None or not all(math.isfinite(value) for value in row):
+            return
+        with self._lock:
+            for sketch, value in zip(self.sketches, row):
+                sketch.add(float(value))
+
+    def observe_many(self, data):
+        if self.sketches is None:
+            return
+        data = data[np.isfinite(data).all(axis=1)]
+        if len(data) == 0:
+            return
+        with self._lock:
+            for index, sketch in enumerate(self.sketches):
+                sketch.add_many(data[:, index])
+
+    # Partage entre workers
+
+    def start(self):
+        if self.directory is not None and self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Écriture des résumés de dérive impossible: %s", e)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"worker-{pid}.npz")
+
+    def flush(self):
+        if self.directory is None or self.sketches is None:
+            return
+        with self._lock:
+            arrays = {}
+            for name, sketch in zip(self.features, self.sketches):
+                for key, value in sketch.state().items():
+                    arrays[f"{name}.{key}"] = np.array(value, copy=True)
+        tmp_path = f"{self._path(os.getpid())}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self._path(os.getpid()))
+
+    def _others(self):
+        # États des autres workers récents : un fichier plus vieux que
+        # quelques intervalles vient d'un processus arrêté
+        if self.directory is None:
+            return []
+        states = []
+        own = self._path(os.getpid())
+        for path in glob.glob(os.path.join(self.directory, "worker-*.npz")):
+            try:
+                if path == own or time.time() - os.path.getmtime(path) > 3 * self.flush_interval:
+                    continue
+                with np.load(path) as data:
+                    states.append({name: {key: data[f"{name}.{key}"] for key in
+                                          ("edges", "histogram", "moments", "quantiles")}
+                                   for name in self.features})
+            except (OSError, KeyError, ValueError):
+                continue
+        return states
+
+    def merged(self):
+        if self.sketches is None:
+            return None, 0
+        with self._lock:
+            merged = [FeatureSketch.from_state(sketch.state()) for sketch in self.sketches]
+        workers = 1
+        for state in self._others():
+            others = [FeatureSketch.from_state(state[name]) for name in self.features]
+            if [sketch.edges for sketch in others] != [sketch.edges for sketch in merged]:
+                continue
+            for sketch, other in zip(merged, others):
+                sketch.merge(other)
+            workers += 1
+        return merged, workers
+
+    def local_psi(self):
+        # PSI de ce processus seul, pour /metrics (chaque worker est scrapé)
+        if self.sketches is None:
+            return {}
+        with self._lock:
+            return {
+                (name,): psi(self.profile[name]["histogram"], sketch.histogram)
+                for name, sketch in zip(self.features, self.sketches)
+            }
+
+    def summary(self):
+        merged, workers = self.merged()
+        if merged is None:
+            return {"enabled": True, "ready": False}
+        features = {}
+        for name, sketch in zip(self.features, merged):
+            train = self.profile[name]
+            value = psi(train["histogram"], sketch.histogram)
+            features[name] = {
+                "psi": value,
+                "status": psi_status(value),
+                "count": sketch.count,
+                "mean": sketch.mean if sketch.count else None,
+                "std": sketch.std,
+                "min": sketch.min if sketch.count else None,
+                "max": sketch.max if sketch.count else None,
+                "mean_shift": (sketch.mean - train["mean"]) / train["std"] if sketch.count and train["std"] else None,
+                "quantiles": {str(q): sketch.quantiles.quantile(q) for q in QUANTILES},
+                "histogram": sketch.histogram.tolist(),
+                "training": train,
+            }
+        return {
+            "enabled": True,
+            "ready": True,
+            "model_version": self.version,
+            "workers": workers,
+            "count": merged[0].count,
+            "features": features,
+        }
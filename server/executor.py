@@ -0,0 +1,106 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import joblib
+
+import forest
+import grid
+
+# Prédicteur propre à chaque processus du pool, chargé une seule fois
+_worker_predictor = None
+
+
+def cpu_count():
+    # Respecte l'affinité CPU (conteneurs) quand elle est disponible
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_worker(model_path, compiled, grid_dir=None, grid_spec=None, shared=False):
+    global _worker_predictor
+    _worker_predictor = forest.load_shared(model_path) if shared else None
+    if _worker_predictor is None:
+        model = joblib.load(model_path)
+        compiled_forest = forest.compile_model(model) if compiled else None
+        _worker_predictor = forest.ForestPredictor(model, compiled_forest)
+
+    # La table de décision est mappée en lecture : pages partagées entre workers
+    if grid_spec is not None:
+        table = grid.load_or_build(
+            grid_dir, grid.file_fingerprint(model_path), grid_spec, _worker_predictor.predict
+        )
+        _worker_predictor = grid.GridPredictor(table, _worker_predictor)
+
+
+def _predict_in_worker(data):
+    return _worker_predictor.predict(data).astype(int)
+
+
+class InferenceExecutor:
+    # Exécute les prédictions hors de la boucle d'événements.
+    #
+    # mode "thread" : pool de threads partageant le modèle du processus
+    # mode "process" : pool de processus, chaque worker charge le modèle
+    #                  à son initialisation (seules les données transitent)
+    # mode "inline" : exécution directe sur la boucle (ancien comportement)
+
+    MODES = ("thread", "process", "inline")
+
+    def __init__(self, predict_fn, mode="thread", workers=None, model_path=None, compiled=True,
+                 shared=False, grid_dir=None, grid_spec=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Mode d'exécution inconnu: {mode} ({', '.join(self.MODES)})")
+        self.predict_fn = predict_fn
+        self.mode = mode
+        self.workers = workers or cpu_count()
+        self.compiled = compiled
+        self.shared = shared
+        self.grid_dir = grid_dir
+        self.grid_spec = grid_spec
+        self._pool = None
+
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference"
+            )
+        elif mode == "process" and model_path is not None:
+            self._pool = self._process_pool(model_path)
+
+    def _process_pool(self, model_path):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(model_path, self.compiled, self.grid_dir, self.grid_spec, self.shared)
+        )
+
+    async def swap_model(self, model_path, warmup=()):
+        # Mode process : les workers ont chargé l'ancien fichier. Un nouveau
+        # pool est démarré et chauffé, puis remplace l'ancien ; les tâches
+        # déjà soumises à l'ancien pool se terminent avant son arrêt.
+        if self.mode != "process":
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._process_pool(model_path)
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, _predict_in_worker, batch)
+            for _ in range(self.workers)
+            for batch in warmup
+        ))
+        previous, self._pool = self._pool, pool
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    async def run(self, data):
+        if self.mode == "inline":
+            return self.predict_fn(data)
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            return await loop.run_in_executor(self._pool, _predict_in_worker, data)
+        return await loop.run_in_executor(self._pool, self.predict_fn, data)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
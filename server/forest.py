@@ -0,0 +1,241 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+
+# Forêt compilée en tableaux plats : tous les arbres sont concaténés et
+# renumérotés en largeur pour que l'enfant droit suive toujours l'enfant
+# gauche (right == left + 1). Une feuille pointe sur elle-même avec un seuil
+# infini, la traversée n'a donc besoin d'aucun branchement.
+
+# Lignes traitées à la fois, pour borner la matrice (lignes x arbres) de nœuds
+CHUNK_SIZE = 2048
+
+# Tableaux exportés (un .npy chacun) pour le partage entre processus
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+
+# Répertoire de l'export, à côté de l'artefact du modèle
+SHARED_DIR = "forest"
+
+# Au-delà de ce nombre de lignes, la boucle Cython de sklearn redevient plus
+# rapide que la traversée NumPy ; en dessous son coût fixe domine
+MAX_COMPILED_ROWS = 512
+
+# Vérification de parité (10 000 lignes) à chaque compilation : désactivée
+# par défaut, la parité est couverte par tests/test_forest.py
+VERIFY_ON_LOAD = os.getenv("COMPILED_FOREST_VERIFY", "0") == "1"
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.n_features = int(feature.max()) + 1 if len(feature) else 0
+        self.depth = _max_depth(left, roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, values, roots = [], [], [], [], []
+        offset = 0
+        for estimator in _estimators(model):
+            tree = estimator.tree_
+            order, left = _breadth_first(tree.children_left, tree.children_right)
+            leaf = tree.children_left[order] == -1
+
+            # sklearn convertit X en float32 puis compare à un seuil float64 :
+            # x <= t équivaut à x <= plus grand float32 inférieur ou égal à t
+            threshold = tree.threshold[order].astype(np.float32)
+            above = threshold.astype(np.float64) > tree.threshold[order]
+            threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+            threshold[leaf] = np.inf
+
+            # Proportions de classes par feuille, comme predict_proba de l'arbre
+            value = tree.value[order, 0, :].astype(np.float64)
+            total = value.sum(axis=1, keepdims=True)
+            total[total == 0] = 1.0
+
+            features.append(np.where(leaf, 0, tree.feature[order]))
+            thresholds.append(threshold)
+            lefts.append(left + offset)
+            values.append(value / total)
+            roots.append(offset)
+            offset += tree.node_count
+
+        left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        leaf = left == np.arange(len(left))
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float32),
+            left=left,
+            right=np.where(leaf, left, left + 1),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+        )
+
+    def save(self, directory):
+        # Écrit dans un répertoire temporaire renommé à la fin : un export
+        # visible est toujours complet, même si plusieurs processus exportent
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Déjà exporté par un autre processus
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        # Tableaux mappés en lecture : les pages sont partagées par tous les
+        # processus qui chargent le même export. np.asarray retire la
+        # sous-classe memmap (coûteuse à chaque np.take) sans copier.
+        arrays = {
+            name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in ARRAYS if name != "classes"
+        }
+        # classes peut contenir des objets (noms de classes) : chargé en mémoire
+        arrays["classes"] = np.load(os.path.join(directory, "classes.npy"), allow_pickle=True)
+        return cls(**arrays)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaves(self, data):
+        flat = data.ravel()
+        base = (np.arange(len(data), dtype=np.intp) * data.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(data), self.n_trees)).copy()
+
+        # Une étape par niveau pour tous les arbres et toutes les lignes
+        for _ in range(self.depth):
+            values = np.take(flat, base + np.take(self.feature, nodes))
+            nodes = np.take(self.left, nodes) + (values > np.take(self.threshold, nodes))
+        return nodes
+
+    def predict_proba(self, data):
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        if data.shape[1] < self.n_features:
+            raise ValueError(f"{self.n_features} caractéristiques attendues, {data.shape[1]} reçues")
+        if not np.isfinite(data).all():
+            raise ValueError("Input contains NaN or infinity")
+
+        proba = np.zeros((len(data), self.value.shape[1]))
+        for start in range(0, len(data), CHUNK_SIZE):
+            nodes = self.leaves(data[start:start + CHUNK_SIZE])
+            chunk = proba[start:start + CHUNK_SIZE]
+            # Somme arbre par arbre dans le même ordre que sklearn
+            for tree in range(self.n_trees):
+                chunk += self.value[nodes[:, tree]]
+        return proba / self.n_trees
+
+    def predict(self, data):
+        return self.classes.take(np.argmax(self.predict_proba(data), axis=1))
+
+
+def _estimators(model):
+    # Arbres d'une forêt, ou l'arbre seul d'un DecisionTreeClassifier
+    if hasattr(model, "estimators_"):
+        return model.estimators_
+    return [model] if hasattr(model, "tree_") else None
+
+
+def _breadth_first(children_left, children_right):
+    # Renumérotation en largeur : order[nouveau] = ancien, left[nouveau] = nouveau
+    order = [0]
+    left = []
+    for node in order:
+        if children_left[node] == -1:
+            left.append(len(left))
+        else:
+            left.append(len(order))
+            order.extend([children_left[node], children_right[node]])
+    return np.asarray(order, dtype=np.intp), np.asarray(left, dtype=np.intp)
+
+
+def _max_depth(left, roots):
+    depth = 0
+    level = np.asarray(roots)
+    leaf = left == np.arange(len(left))
+    while True:
+        level = level[~leaf[level]]
+        if len(level) == 0:
+            return depth
+        level = np.concatenate([left[level], left[level] + 1])
+        depth += 1
+
+
+class ForestPredictor:
+    # Forêt compilée pour les petits lots, sklearn pour les gros
+
+    def __init__(self, model, forest, max_compiled_rows=MAX_COMPILED_ROWS):
+        self.model = model
+        self.forest = forest
+        self.max_compiled_rows = max_compiled_rows
+
+    def predict(self, data):
+        if self.forest is not None and len(data) <= self.max_compiled_rows:
+            return self.forest.predict(data)
+        return self.model.predict(as_model_input(self.model, data))
+
+
+def check_parity(model, forest, data):
+    # Nombre de lignes où la forêt compilée diffère de model.predict
+    expected = model.predict(as_model_input(model, data))
+    return int(np.sum(forest.predict(data) != expected))
+
+
+def parity_inputs(n_random=10000, seed=0):
+    # Jeu iris complet + points aléatoires sur une plage élargie
+    from sklearn.datasets import load_iris
+
+    iris = load_iris().data
+    rng = np.random.default_rng(seed)
+    low, high = iris.min(axis=0) - 1.0, iris.max(axis=0) + 1.0
+    random = rng.uniform(low, high, size=(n_random, iris.shape[1]))
+    return np.vstack([iris, random])
+
+
+def compile_model(model, verify=VERIFY_ON_LOAD):
+    # Compile la forêt ; avec verify, renvoie None si elle ne reproduit pas
+    # model.predict
+    if _estimators(model) is None:
+        return None
+    forest = CompiledForest.from_sklearn(model)
+    if verify and check_parity(model, forest, parity_inputs()) != 0:
+        return None
+    return forest
+
+
+def load_shared(model_path, verify=VERIFY_ON_LOAD):
+    # Forêt exportée une fois à côté de l'artefact puis mappée en lecture
+    # seule, sans joblib.load du modèle. None si le modèle n'est pas une
+    # forêt compilable (le serveur charge alors le modèle normalement).
+    directory = os.path.join(os.path.dirname(os.path.abspath(model_path)), SHARED_DIR)
+    if not os.path.isdir(directory):
+        forest = compile_model(joblib.load(model_path), verify=verify)
+        if forest is None:
+            return None
+        forest.save(directory)
+    return CompiledForest.load(directory)
+
+
+def as_model_input(model, data):
+    # Évite l'avertissement sur les noms de colonnes quand le modèle a été
+    # entraîné sur un DataFrame
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        return data
+    import pandas as pd
+    return pd.DataFrame(data, columns=names)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import math
+import os
+
+import struct
+from decimal import Decimal
+
+import numpy as np
+
+# Bornes des curseurs de la page "Prédiction Simple" du client
+DEFAULT_LOW = (4.0, 2.0, 1.0, 0.1)
+DEFAULT_HIGH = (8.0, 4.5, 7.0, 2.5)
+DEFAULT_STEP = 0.1
+
+# Points prédits à la fois pendant la construction de la table
+BUILD_CHUNK = 100000
+
+
+class GridSpec:
+    def __init__(self, low=DEFAULT_LOW, high=DEFAULT_HIGH, step=DEFAULT_STEP):
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.step = float(step)
+        # Décimales du pas (2 pour 0.25) : les points sont arrondis comme des
+        # saisies utilisateur
+        self.decimals = max(0, -Decimal(str(self.step)).normalize().as_tuple().exponent)
+        self.shape = tuple(int(n) for n in np.rint((self.high - self.low) / self.step) + 1)
+
+    @classmethod
+    def from_env(cls):
+        def floats(name, default):
+            value = os.getenv(name)
+            return tuple(float(v) for v in value.split(",")) if value else default
+
+        return cls(
+            low=floats("GRID_LOW", DEFAULT_LOW),
+            high=floats("GRID_HIGH", DEFAULT_HIGH),
+            step=float(os.getenv("GRID_STEP", DEFAULT_STEP))
+        )
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def points(self, flat_indices):
+        indices = np.stack(np.unravel_index(flat_indices, self.shape), axis=1)
+        return np.round(self.low + indices * self.step, self.decimals)
+
+    def fingerprint(self):
+        spec = {"low": self.low.tolist(), "high": self.high.tolist(), "step": self.step}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class DecisionGrid:
+    # Table uint8 des classes prédites sur tous les points de la grille
+
+    def __init__(self, spec, table):
+        self.spec = spec
+        self.table = table
+        self.flat = table.reshape(-1)
+        self._low = [float(low) for low in spec.low]
+        self.hits = 0
+        self.misses = 0
+
+    def locate(self, data):
+        # Indice plat de chaque ligne dans la grille, -1 hors grille.
+        # Une ligne n'est dans la grille que si sa conversion float32 (celle
+        # faite par le modèle) est identique à celle du point de grille.
+        data = np.asarray(data, dtype=np.float64)
+        steps = np.rint((data - self.spec.low) / self.spec.step)
+        inside = np.all((steps >= 0) & (steps < self.spec.shape), axis=1)
+
+        steps = np.where(inside[:, None], steps, 0).astype(np.intp)
+        grid_values = np.round(self.spec.low + steps * self.spec.step, self.spec.decimals)
+        exact = np.all(grid_values.astype(np.float32) == data.astype(np.float32), axis=1)
+
+        flat = np.ravel_multi_index(steps.T, self.spec.shape)
+        return np.where(inside & exact, flat, -1)
+
+    def lookup_one(self, row):
+        # Même calcul que locate, en scalaire : évite le coût fixe de NumPy
+        spec = self.spec
+        index = 0
+        for value, low, size in zip(row, self._low, spec.shape):
+            if not math.isfinite(value):
+                self.misses += 1
+                return None
+            step = round((value - low) / spec.step)
+            if not 0 <= step < size:
+                self.misses += 1
+                return None
+            grid_value = round(low + step * spec.step, spec.decimals)
+            if _float32(grid_value) != _float32(value):
+                self.misses += 1
+                return None
+            index = index * size + step
+
+        self.hits += 1
+        return int(self.flat[index])
+
+    def stats(self):
+        return {
+            "shape": list(self.spec.shape),
+            "points": self.spec.size,
+            "bytes": int(self.table.nbytes),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class GridPredictor:
+    # Table de décision pour les points de la grille, modèle pour les autres
+
+    def __init__(self, grid, fallback):
+        self.grid = grid
+        self.fallback = fallback
+
+    def predict(self, data):
+        indices = self.grid.locate(data)
+        in_grid = indices >= 0
+        hits = int(in_grid.sum())
+        self.grid.hits += hits
+        self.grid.misses += len(indices) - hits
+        predictions = np.empty(len(indices), dtype=np.intp)
+        predictions[in_grid] = self.grid.flat[indices[in_grid]]
+        if not in_grid.all():
+            predictions[~in_grid] = self.fallback.predict(np.asarray(data)[~in_grid])
+        return predictions
+
+
+def _float32(value):
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def grid_path(directory, model_fingerprint, spec):
+    return os.path.join(directory, f"grid_{model_fingerprint}_{spec.fingerprint()}.npy")
+
+
+def build_table(path, spec, predict_fn):
+    # Écrit la table directement dans un fichier mappé, par morceaux
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=spec.shape)
+    flat = table.reshape(-1)
+    for start in range(0, spec.size, BUILD_CHUNK):
+        indices = np.arange(start, min(start + BUILD_CHUNK, spec.size))
+        flat[start:start + len(indices)] = predict_fn(spec.points(indices))
+    table.flush()
+    del table, flat
+    os.replace(tmp_path, path)
+
+
+def load_or_build(directory, model_fingerprint, spec, predict_fn):
+    # Construite une seule fois par version de modèle, puis mappée en lecture
+    os.makedirs(directory, exist_ok=True)
+    path = grid_path(directory, model_fingerprint, spec)
+    if not os.path.exists(path):
+        build_table(path, spec, predict_fn)
+    table = np.load(path, mmap_mode="r")
+    if table.shape != spec.shape or table.dtype != np.uint8:
+        raise ValueError(f"Table de décision incompatible: {path}")
+    return DecisionGrid(spec, table)
@@ -0,0 +1,195 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from pymongo import ASCENDING, DESCENDING
+
+import database
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+COLLECTION = "predictions"
+
+# Champs de tri autorisés ; _id départage les égalités (pagination par clé)
+SORT_FIELDS = ("timestamp", "latency_ms", "flower_name")
+
+# Granularité des séries temporelles ($dateTrunc)
+BUCKET_UNITS = ("minute", "hour", "day", "week", "month")
+
+PROJECTION = {
+    "sepal_length": 1,
+    "sepal_width": 1,
+    "petal_length": 1,
+    "petal_width": 1,
+    "prediction": 1,
+    "flower_name": 1,
+    "model_version": 1,
+    "latency_ms": 1,
+    "timestamp": 1,
+}
+
+INDEXES = [
+    [("timestamp", DESCENDING), ("_id", DESCENDING)],
+    [("flower_name", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+    [("latency_ms", DESCENDING), ("_id", DESCENDING)],
+]
+
+
+def get_collection():
+    db = database.get_database()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Historique indisponible: MongoDB non configuré")
+    return db[COLLECTION]
+
+
+def ensure_indexes(collection):
+    for keys in INDEXES:
+        collection.create_index(keys)
+
+
+def _encode_cursor(document, sort):
+    value = document.get(sort)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    token = json.dumps({"v": value, "id": str(document["_id"])})
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = token["v"]
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(token["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Curseur invalide: {e}")
+
+
+def _species_filter(species):
+    return {"flower_name": {"$in": species}} if species else {}
+
+
+def _serialize(document):
+    document = dict(document)
+    document["id"] = str(document.pop("_id"))
+    if isinstance(document.get("timestamp"), datetime):
+        document["timestamp"] = document["timestamp"].isoformat()
+    return document
+
+
+@router.get("")
+def list_history(
+    limit: int = Query(50, ge=1, le=1000),
+    species: Optional[List[str]] = Query(None),
+    sort: str = Query("timestamp"),
+    order: str = Query("desc"),
+    cursor: Optional[str] = None,
+):
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=422, detail=f"Tri possible sur: {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=422, detail="order doit valoir 'asc' ou 'desc'")
+
+    direction = ASCENDING if order == "asc" else DESCENDING
+    query = _species_filter(species)
+
+    # Pagination par clé : on reprend strictement après le dernier élément
+    if cursor:
+        value, last_id = _decode_cursor(cursor)
+        op = "$gt" if direction == ASCENDING else "$lt"
+        query = {
+            "$and": [
+                query,
+                {"$or": [
+                    {sort: {op: value}},
+                    {sort: value, "_id": {op: last_id}},
+                ]},
+            ]
+        }
+
+    documents = list(
+        get_collection()
+        .find(query, PROJECTION)
+        .sort([(sort, direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    return {
+        "items": [_serialize(document) for document in documents],
+        "next_cursor": _encode_cursor(documents[-1], sort) if has_more else None,
+    }
+
+
+@router.get("/stats")
+def history_stats(
+    species: Optional[List[str]] = Query(None),
+    bucket: str = Query("hour"),
+):
+    if bucket not in BUCKET_UNITS:
+        raise HTTPException(status_code=422, detail=f"bucket possible: {', '.join(BUCKET_UNITS)}")
+
+    # Un seul passage sur la collection, plusieurs agrégats en parallèle
+    pipeline = [
+        {"$match": _species_filter(species)},
+        {"$facet": {
+            "species": [
+                {"$group": {"_id": "$flower_name", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+            "latency": [
+                {"$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "mean": {"$avg": "$latency_ms"},
+                    "min": {"$min": "$latency_ms"},
+                    "max": {"$max": "$latency_ms"},
+                    "percentiles": {"$percentile": {
+                        "input": "$latency_ms",
+                        "p": [0.5, 0.95, 0.99],
+                        "method": "approximate",
+                    }},
+                }},
+            ],
+            "timeline": [
+                {"$group": {
+                    "_id": {"$dateTrunc": {"date": "$timestamp", "unit": bucket}},
+                    "count": {"$sum": 1},
+                    "mean_latency_ms": {"$avg": "$latency_ms"},
+                }},
+                {"$sort": {"_id": 1}},
+            ],
+        }},
+    ]
+    result = next(get_collection().aggregate(pipeline), {})
+
+    latency = (result.get("latency") or [{}])[0]
+    percentiles = latency.get("percentiles") or [None, None, None]
+    return {
+        "total": latency.get("count", 0),
+        "species": {row["_id"]: row["count"] for row in result.get("species", [])},
+        "latency_ms": {
+            "mean": latency.get("mean"),
+            "min": latency.get("min"),
+            "max": latency.get("max"),
+            "p50": percentiles[0],
+            "p95": percentiles[1],
+            "p99": percentiles[2],
+        },
+        "timeline": [
+            {
+                "bucket": row["_id"].isoformat() if isinstance(row["_id"], datetime) else row["_id"],
+                "count": row["count"],
+                "mean_latency_ms": row["mean_latency_ms"],
+            }
+            for row in result.get("timeline", [])
+        ],
+    }
@@ -0,0 +1,466 @@
+import asyncio
+import io
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from gridfs import GridFSBucket
+from pymongo import ReturnDocument
+
+import bulk_io
+import database
+import streaming
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+COLLECTION = "jobs"
+INPUT_BUCKET = "job_inputs"
+RESULT_BUCKET = "job_results"
+
+PARQUET_MEDIA_TYPES = ("application/vnd.apache.parquet", "application/x-parquet", "application/parquet")
+
+# Taille d'écriture dans GridFS pendant l'upload
+UPLOAD_BUFFER_BYTES = 1 << 20
+
+# Taille maximale d'un fichier soumis (Mo)
+MAX_UPLOAD_MB = int(os.getenv("JOB_MAX_UPLOAD_MB", "2048"))
+
+# Date de bail d'une tâche jamais prise
+NEVER = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+INDEXES = [
+    (COLLECTION, [("status", 1), ("lease_until", 1), ("created_at", 1)]),
+    (COLLECTION, [("created_at", -1)]),
+    (f"{RESULT_BUCKET}.files", [("metadata.job_id", 1), ("metadata.chunk", 1)]),
+]
+
+
+class LeaseLost(Exception):
+    # La tâche a été annulée ou reprise par un autre processus
+    pass
+
+
+def get_database():
+    db = database.get_database()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Tâches indisponibles: MongoDB non configuré")
+    return db
+
+
+def ensure_indexes(db):
+    for collection, keys in INDEXES:
+        db[collection].create_index(keys)
+
+
+def _job_id(job_id):
+    try:
+        return ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue: {job_id}")
+
+
+def _format(content_type, filename):
+    if content_type in PARQUET_MEDIA_TYPES or filename.endswith(".parquet"):
+        return "parquet"
+    if content_type in streaming.CSV_MEDIA_TYPES or filename.endswith(".csv"):
+        return "csv"
+    return None
+
+
+def _serialize(job):
+    if job["format"] == "parquet" and job.get("total_chunks"):
+        progress = job["chunk"] / job["total_chunks"]
+    elif job["format"] == "csv" and job.get("input_size"):
+        progress = job.get("position", 0) / job["input_size"]
+    else:
+        progress = 0.0
+    if job["status"] == "done":
+        progress = 1.0
+
+    summary = {
+        "id": str(job["_id"]),
+        "status": job["status"],
+        "filename": job["filename"],
+        "format": job["format"],
+        "progress": progress,
+        "processed_rows": job.get("processed_rows", 0),
+        "invalid_rows": job.get("invalid_rows", 0),
+        "total_rows": job.get("total_rows"),
+        "error": job.get("error"),
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        value = job.get(field)
+        summary[field] = value.isoformat() if isinstance(value, datetime) else value
+    return summary
+
+
+@router.post("", status_code=202)
+async def submit_job(request: Request, filename: str = Query("upload.csv")):
+    # Le corps (CSV ou Parquet) est copié dans GridFS au fil de l'upload,
+    # puis la tâche est mise en file pour les workers de fond
+    db = get_database()
+    content_type = bulk_io.media_type(request.headers.get("content-type"))
+    file_format = _format(content_type, filename)
+    if file_format is None:
+        raise HTTPException(status_code=415, detail="Fichier CSV (text/csv) ou Parquet attendu")
+    if file_format == "parquet" and pq is None:
+        raise HTTPException(status_code=415, detail="Format Parquet indisponible: pyarrow non installé")
+
+    upload = GridFSBucket(db, INPUT_BUCKET).open_upload_stream(filename, metadata={"format": file_format})
+    size, pending, pending_size = 0, [], 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_MB << 20:
+                raise HTTPException(status_code=413, detail=f"Fichier limité à {MAX_UPLOAD_MB} Mo")
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= UPLOAD_BUFFER_BYTES:
+                await asyncio.to_thread(upload.write, b"".join(pending))
+                pending, pending_size = [], 0
+        if pending:
+            await asyncio.to_thread(upload.write, b"".join(pending))
+        await asyncio.to_thread(upload.close)
+    except BaseException:
+        await asyncio.to_thread(upload.abort)
+        raise
+
+    now = datetime.now(timezone.utc)
+    job = {
+        "status": "queued",
+        "filename": filename,
+        "format": file_format,
+        "input_id": upload._id,
+        "input_size": size,
+        "chunk": 0,
+        "position": 0,
+        "processed_rows": 0,
+        "invalid_rows": 0,
+        "lease_until": NEVER,
+        "created_at": now,
+        "updated_at": now,
+    }
+    job["_id"] = (await asyncio.to_thread(db[COLLECTION].insert_one, job)).inserted_id
+
+    runner = getattr(request.app.state, "job_runner", None)
+    if runner is not None:
+        runner.wake()
+    return _serialize(job)
+
+
+@router.get("")
+def list_jobs(limit: int = Query(20, ge=1, le=200)):
+    jobs = get_database()[COLLECTION].find().sort("created_at", -1).limit(limit)
+    return {"items": [_serialize(job) for job in jobs]}
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    job = get_database()[COLLECTION].find_one({"_id": _job_id(job_id)})
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue: {job_id}")
+    return _serialize(job)
+
+
+@router.get("/{job_id}/result")
+def job_result(job_id: str):
+    # Résultat reconstitué à la volée à partir des blocs stockés dans GridFS
+    db = get_database()
+    job = db[COLLECTION].find_one({"_id": _job_id(job_id)})
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue: {job_id}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Tâche non terminée ({job['status']})")
+
+    bucket = GridFSBucket(db, RESULT_BUCKET)
+
+    def chunks():
+        for stored in bucket.find({"metadata.job_id": job["_id"]}).sort("metadata.chunk", 1):
+            yield from iter(lambda: stored.read(UPLOAD_BUFFER_BYTES), b"")
+
+    name = os.path.splitext(os.path.basename(job["filename"]))[0].replace('"', "")
+    return StreamingResponse(
+        chunks(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{name}_predictions.csv"'}
+    )
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    # Annule la tâche et supprime ses fichiers ; un worker en cours s'arrête
+    # au prochain bloc
+    db = get_database()
+    job = db[COLLECTION].find_one_and_update(
+        {"_id": _job_id(job_id)},
+        {"$set": {"status": "cancelled", "updated_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue: {job_id}")
+    _delete_files(db, job)
+    return _serialize(job)
+
+
+def _delete_files(db, job):
+    inputs = GridFSBucket(db, INPUT_BUCKET)
+    for stored in inputs.find({"_id": job["input_id"]}):
+        inputs.delete(stored._id)
+    results = GridFSBucket(db, RESULT_BUCKET)
+    for stored in results.find({"metadata.job_id": job["_id"]}):
+        results.delete(stored._id)
+
+
+class CsvChunkReader:
+    # Lit le CSV par blocs d'environ chunk_bytes octets coupés en fin de
+    # ligne. La position (octets lus) suffit à reprendre exactement.
+
+    def __init__(self, file, features, chunk_bytes, position=0, header=None):
+        self.file = file
+        self.features = features
+        self.chunk_bytes = chunk_bytes
+        if header is None:
+            file.seek(0)
+            header = file.readline()
+            self._check_header(header)
+        else:
+            header = header.encode("utf-8")
+            file.seek(position)
+        self.header = header
+        self.position = file.tell()
+
+    def _check_header(self, header):
+        columns = [name.strip() for name in header.decode("utf-8").strip().split(",")]
+        missing = [name for name in self.features if name not in columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+
+    def next(self):
+        block = self.file.read(self.chunk_bytes)
+        if not block:
+            return None
+        if not block.endswith(b"\n"):
+            block += self.file.readline()
+        self.position = self.file.tell()
+
+        frame = pd.read_csv(io.BytesIO(self.header + block), usecols=self.features)
+        frame = frame.apply(pd.to_numeric, errors="coerce")
+        return frame[self.features].to_numpy(dtype=np.float64), self.position
+
+
+class ParquetChunkReader:
+    # Un bloc par row group ; la position est l'indice du prochain row group
+
+    def __init__(self, file, features, position=0):
+        self.file = parquet = pq.ParquetFile(file)
+        self.features = features
+        missing = [name for name in features if name not in parquet.schema_arrow.names]
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+        self.position = position
+        self.total_rows = parquet.metadata.num_rows
+        self.total_chunks = parquet.metadata.num_row_groups
+
+    def next(self):
+        if self.position >= self.total_chunks:
+            return None
+        table = self.file.read_row_group(self.position, columns=self.features)
+        self.position += 1
+        data = np.column_stack([
+            table.column(name).to_numpy(zero_copy_only=False).astype(np.float64)
+            for name in self.features
+        ]) if table.num_rows else np.empty((0, len(self.features)))
+        return data, self.position
+
+
+class JobRunner:
+    # Workers de fond : prennent une tâche par bail (lease) dans MongoDB,
+    # la traitent bloc par bloc et enregistrent chaque bloc terminé avec
+    # sa position. Après un redémarrage, une tâche dont le bail a expiré
+    # reprend au bloc suivant le dernier enregistré.
+
+    def __init__(self, db, predict, names, features, chunk_bytes=8 << 20, lease_seconds=60,
+                 poll_interval=2.0, owner=None, ready=None):
+        self.db = db
+        self.predict = predict
+        self.ready = ready
+        self.names = names
+        self.features = features
+        self.chunk_bytes = chunk_bytes
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_interval = poll_interval
+        self.owner = owner or f"{os.uname().nodename}:{os.getpid()}"
+        self._wake = None
+        self._task = None
+        self._stopping = False
+
+    @property
+    def jobs(self):
+        return self.db[COLLECTION]
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        # Le bloc en cours se termine puis le bail est rendu : un autre
+        # processus (ou le prochain démarrage) reprend sans attendre
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            job = None
+            if self.ready is None or self.ready():
+                try:
+                    job = await asyncio.to_thread(self._claim)
+                except Exception as e:
+                    logger.warning("Lecture des tâches impossible: %s", e)
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            try:
+                await self._process(job)
+            except LeaseLost:
+                logger.info("Tâche %s abandonnée (annulée ou reprise ailleurs)", job["_id"])
+            except Exception as e:
+                logger.exception("Tâche %s en échec", job["_id"])
+                await asyncio.to_thread(self._finish, job, "failed", error=str(e))
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        return self.jobs.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lt": now}},
+            {"$set": {
+                "status": "running",
+                "owner": self.owner,
+                "lease_until": now + self.lease,
+                "updated_at": now,
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _open(self, job):
+        file = GridFSBucket(self.db, INPUT_BUCKET).open_download_stream(job["input_id"])
+        if job["format"] == "parquet":
+            return ParquetChunkReader(file, self.features, position=job.get("position", 0))
+        return CsvChunkReader(
+            file, self.features,
+            chunk_bytes=self.chunk_bytes,
+            position=job.get("position", 0),
+            header=job.get("header")
+        )
+
+    async def _process(self, job):
+        reader = await asyncio.to_thread(self._open, job)
+        header = reader.header.decode("utf-8") if isinstance(reader, CsvChunkReader) else None
+        fields = {"started_at": job.get("started_at") or datetime.now(timezone.utc)}
+        if isinstance(reader, ParquetChunkReader):
+            fields.update(total_rows=reader.total_rows, total_chunks=reader.total_chunks)
+        await asyncio.to_thread(self._update, job, fields)
+
+        index = job["chunk"]
+        while True:
+            chunk = await asyncio.to_thread(reader.next)
+            if chunk is None:
+                break
+            data, position = chunk
+
+            # Lignes non numériques ou non finies : sans prédiction
+            valid = np.isfinite(data).all(axis=1)
+            predictions = np.full(len(data), -1, dtype=np.int64)
+            if valid.any():
+                predictions[valid] = await self.predict(np.ascontiguousarray(data[valid]))
+
+            await asyncio.to_thread(self._commit, job, index, data, predictions, position, header)
+            index += 1
+            if self._stopping:
+                await asyncio.to_thread(self._update, job, {"lease_until": NEVER})
+                return
+
+        await asyncio.to_thread(self._finish, job, "done")
+
+    def _encode(self, index, data, predictions):
+        frame = pd.DataFrame(data, columns=self.features)
+        frame["prediction"] = pd.Series(predictions).where(predictions >= 0).astype("Int64")
+        frame["flower_name"] = [self.names.get(int(p), "") for p in predictions]
+        return frame.to_csv(index=False, header=index == 0).encode("utf-8")
+
+    def _commit(self, job, index, data, predictions, position, header):
+        # Bloc écrit sous un nom déterministe (une reprise l'écrase), puis
+        # progression enregistrée seulement si le bail est toujours détenu
+        bucket = GridFSBucket(self.db, RESULT_BUCKET)
+        filename = f"{job['_id']}/{index:08d}"
+        for stored in bucket.find({"filename": filename}):
+            bucket.delete(stored._id)
+        file_id = bucket.upload_from_stream(
+            filename,
+            self._encode(index, data, predictions),
+            metadata={"job_id": job["_id"], "chunk": index, "rows": len(data)}
+        )
+
+        now = datetime.now(timezone.utc)
+        fields = {"chunk": index + 1, "position": position, "lease_until": now + self.lease, "updated_at": now}
+        if header is not None:
+            fields["header"] = header
+        result = self.jobs.update_one(
+            {"_id": job["_id"], "owner": self.owner, "status": "running", "chunk": index},
+            {"$set": fields, "$inc": {
+                "processed_rows": len(data),
+                "invalid_rows": int(np.sum(predictions < 0)),
+            }}
+        )
+        if result.matched_count == 0:
+            bucket.delete(file_id)
+            raise LeaseLost()
+
+    def _update(self, job, fields):
+        result = self.jobs.update_one(
+            {"_id": job["_id"], "owner": self.owner, "status": "running"},
+            {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}}
+        )
+        if result.matched_count == 0:
+            raise LeaseLost()
+
+    def _finish(self, job, status, error=None):
+        now = datetime.now(timezone.utc)
+        current = self.jobs.find_one({"_id": job["_id"]}, {"processed_rows": 1})
+        self.jobs.update_one(
+            {"_id": job["_id"], "owner": self.owner, "status": "running"},
+            {"$set": {
+                "status": status,
+                "error": error,
+                "total_rows": (current or {}).get("processed_rows", 0),
+                "finished_at": now,
+                "updated_at": now,
+            }}
+        )
@@ -0,0 +1,236 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes (secondes) communes aux histogrammes de latence
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    # Histogramme à bornes fixes : une recherche dichotomique et deux
+    # additions par observation
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *label_values):
+        # (comptes par borne, somme, total) pour une série
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                return [0] * (len(self.buckets) + 1), 0.0, 0
+            return list(series[0]), series[1], series[2]
+
+    def series(self):
+        return sorted(self._series)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values in self.series():
+            counts, total, count = self.snapshot(*label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels + ("le",), label_values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    # Valeur lue au moment de l'export via une fonction ; kind="counter" pour
+    # les compteurs déjà tenus par un autre objet (cache, journal...)
+
+    def __init__(self, name, help, read, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in sorted(values.items()):
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, read, labels=(), kind="gauge"):
+        return self.register(Gauge(name, help, read, labels, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "Durée totale des requêtes HTTP", ("route",)
+)
+stage_latency = registry.histogram(
+    "inference_stage_duration_seconds", "Durée de chaque étape d'une prédiction", ("route", "stage")
+)
+model_latency = registry.histogram(
+    "model_predict_duration_seconds", "Durée d'un appel au modèle (hors file d'attente)"
+)
+model_batch_size = registry.histogram(
+    "model_batch_size", "Lignes par appel au modèle",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+)
+
+
+@contextmanager
+def stage(route, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - start, route, name)
+
+
+def mark_handler_start(request, route):
+    # Étape "validation" : de l'arrivée de la requête (middleware) à l'entrée
+    # du handler, soit lecture du corps, décodage JSON et validation pydantic
+    now = time.perf_counter()
+    state = request.scope.get("state") or {}
+    started = state.get("metrics_start")
+    if started is not None:
+        stage_latency.observe(now - started, route, "validation")
+    return now
+
+
+def mark_handler_end(request):
+    # L'étape "serialization" est mesurée par le middleware à partir d'ici
+    state = request.scope.get("state")
+    if state is not None:
+        state["metrics_handler_end"] = time.perf_counter()
+
+
+class MetricsMiddleware:
+    # Middleware ASGI pur (compatible avec les réponses en flux) : compte les
+    # requêtes et mesure leur durée par route
+
+    def __init__(self, app, excluded=("/metrics",)):
+        self.app = app
+        self.excluded = set(excluded)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["metrics_start"] = start
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                handler_end = state.get("metrics_handler_end")
+                if handler_end is not None:
+                    route = _route_name(scope)
+                    stage_latency.observe(time.perf_counter() - handler_end, route, "serialization")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_name(scope)
+            if route not in self.excluded:
+                http_requests.inc(scope["method"], route, str(status[0]))
+                http_latency.observe(time.perf_counter() - start, route)
+
+
+def _route_name(scope):
+    # Gabarit de la route (cardinalité bornée), chemin d'une requête rejetée
+    # avant le routage, "other" si aucune ne correspond
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("state", {}).get("route_path") or "other"
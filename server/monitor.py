@@ -0,0 +1,285 @@
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Percentiles de latence calculés sur chaque intervalle
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def quantile(bounds, counts, q):
+    # Comptes par borne (non cumulés, dernière case = +Inf) ; interpolation
+    # linéaire dans la borne, comme histogram_quantile de Prometheus
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    lower, below = 0.0, 0
+    for bound, count in zip(tuple(bounds) + (math.inf,), counts):
+        if below + count >= rank:
+            if math.isinf(bound):
+                return lower
+            if count == 0:
+                return bound
+            return lower + (bound - lower) * (rank - below) / count
+        lower, below = bound, below + count
+    return lower
+
+
+def percentiles_ms(bounds, counts):
+    values = {f"p{round(q * 100)}": quantile(bounds, counts, q) for q in PERCENTILES}
+    return {name: value * 1000 if value is not None else None for name, value in values.items()}
+
+
+def add_queues(total, queues):
+    # Files d'attente additionnées entre workers ; None si la file est
+    # désactivée partout
+    for name, value in queues.items():
+        if isinstance(value, dict):
+            add_queues(total.setdefault(name, {}), value)
+        elif value is None:
+            total.setdefault(name, None)
+        else:
+            total[name] = (total.get(name) or 0) + value
+    return total
+
+
+def merge(local, others):
+    # Instantané du serveur : fenêtre de ce worker et des autres workers
+    # actifs. Débits sommés (chaque worker sur son propre intervalle),
+    # percentiles sur la somme des histogrammes, files additionnées
+    windows = [local] + sorted(others, key=lambda window: window["pid"])
+    measured = [window for window in windows if window["interval_s"]]
+
+    routes = {}
+    total = errors = 0.0
+    latency = {}
+    for window in measured:
+        elapsed = window["interval_s"]
+        for route, count in window["requests"].items():
+            routes[route] = routes.get(route, 0.0) + count / elapsed
+            total += count / elapsed
+        errors += window["errors"] / elapsed
+        for route, counts in window["latency"].items():
+            before = latency.get(route, [0] * len(counts))
+            latency[route] = [a + b for a, b in zip(before, counts)]
+
+    bounds = metrics.http_latency.buckets
+    overall = [sum(column) for column in zip(*latency.values())] if latency else []
+    health = [window["health"] for window in windows]
+    versions = sorted({status["model_version"] for status in health if status.get("model_version")})
+    queues = {}
+    for window in windows:
+        add_queues(queues, window["queues"])
+
+    return {
+        "t": local["t"],
+        "interval_s": local["interval_s"],
+        "pid": local["pid"],
+        "health": {
+            "status": "healthy" if all(status["ready"] for status in health) else "starting",
+            "ready": all(status["ready"] for status in health),
+            "model_version": versions[0] if len(versions) == 1 else None,
+            "model_versions": versions,
+        },
+        "queues": queues,
+        "workers": [
+            {"pid": window["pid"], "health": window["health"], "queues": window["queues"]}
+            for window in windows
+        ],
+        "throughput": {
+            "requests_per_s": total if measured else None,
+            "errors_per_s": errors if measured else None,
+            "routes": {route: rate for route, rate in sorted(routes.items()) if rate},
+        },
+        "latency_ms": {
+            **percentiles_ms(bounds, overall),
+            "routes": {
+                route: percentiles_ms(bounds, counts)
+                for route, counts in sorted(latency.items()) if sum(counts)
+            },
+        },
+    }
+
+
+class MonitorHub:
+    # Instantanés périodiques du serveur diffusés en server-sent events.
+    # Un seul calcul par intervalle quel que soit le nombre d'abonnés. Chaque
+    # abonné ne garde que le dernier instantané : un client lent en saute au
+    # lieu d'accumuler du retard.
+    #
+    # Chaque intervalle, le worker mesure sa fenêtre : requêtes et
+    # histogrammes de latence écoulés depuis la fenêtre précédente
+    # (différence des compteurs de metrics) et état courant renvoyé par
+    # `state` (santé, files d'attente). Avec `directory`, start() lance la
+    # tâche de fond dans chaque worker : chacun y publie sa fenêtre, et
+    # l'instantané envoyé fusionne celles des workers encore actifs (débits
+    # sommés, percentiles sur les histogrammes additionnés). Sans
+    # `directory`, la tâche ne tourne que s'il y a au moins un abonné.
+    #
+    # Un flux se termine après max_duration secondes : uvicorn attend la fin
+    # des réponses en cours pour s'arrêter, et le client se reconnecte.
+
+    def __init__(self, state, interval=1.0, max_subscribers=32, max_duration=300.0, directory=None):
+        self.state = state
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.max_duration = max_duration
+        self.directory = directory
+        self.sent = 0
+        self._subscribers = set()
+        self._task = None
+        self._always = False
+        self._previous = None
+        self._latest = None
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def start(self):
+        # Publication continue : les autres workers ont besoin de la fenêtre
+        # de celui-ci même s'il n'a pas d'abonné
+        if self.directory is None or self._task is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._always = True
+        self._previous = self._latest = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def subscribe(self):
+        # None si le nombre maximal d'abonnés est atteint
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        queue = asyncio.Queue(maxsize=1)
+        if self._task is None:
+            # Premier abonné : intervalles comptés à partir de maintenant
+            self._previous = self._latest = None
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif self._latest is not None:
+            # Dernier instantané tout de suite, sans attendre l'intervalle
+            queue.put_nowait(self._latest)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers and not self._always and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def stop(self):
+        self._subscribers.clear()
+        self._always = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.directory is not None:
+            try:
+                os.remove(self._path(os.getpid()))
+            except OSError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                window = self._window()
+                others = []
+                if self.directory is not None:
+                    others = await asyncio.to_thread(self._exchange, window)
+                snapshot = merge(window, others)
+            except Exception as e:
+                logger.warning("Instantané de monitoring impossible: %s", e)
+            else:
+                self._latest = snapshot
+                for queue in self._subscribers:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(snapshot)
+            await asyncio.sleep(self.interval)
+
+    def _window(self):
+        # Fenêtre de ce worker depuis l'appel précédent (sérialisable en JSON) ;
+        # appelée seulement par _run : chaque appel déplace la référence
+        now = time.monotonic()
+        requests = metrics.http_requests.snapshot()
+        latency = {route: metrics.http_latency.snapshot(route)[0] for (route,) in metrics.http_latency.series()}
+
+        previous_time, previous_requests, previous_latency = self._previous or (None, {}, {})
+        self._previous = (now, requests, latency)
+        # Première fenêtre : pas d'intervalle de référence, débit inconnu
+        elapsed = now - previous_time if previous_time is not None else None
+
+        routes = {}
+        errors = 0
+        for (method, route, status), count in requests.items():
+            delta = count - previous_requests.get((method, route, status), 0)
+            routes[route] = routes.get(route, 0) + delta
+            if status.startswith("5"):
+                errors += delta
+
+        window = {}
+        for route, counts in latency.items():
+            before = previous_latency.get(route, [0] * len(counts))
+            window[route] = [count - old for count, old in zip(counts, before)]
+
+        return {
+            "t": time.time(),
+            "interval_s": elapsed,
+            **self.state(),
+            "requests": routes if elapsed else {},
+            "errors": errors if elapsed else 0,
+            "latency": window if elapsed else {},
+        }
+
+    # Partage entre workers
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def _exchange(self, window):
+        # Publie la fenêtre de ce worker et lit celles des autres workers
+        # récents : un fichier plus vieux que quelques intervalles vient d'un
+        # processus arrêté
+        own = self._path(os.getpid())
+        tmp_path = f"{own}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(window, f, separators=(",", ":"))
+        os.replace(tmp_path, own)
+
+        others = []
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            try:
+                if path == own or time.time() - os.path.getmtime(path) > 3 * self.interval:
+                    continue
+                with open(path) as f:
+                    others.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return others
+
+    async def events(self, queue, retry_ms=2000):
+        # Flux text/event-stream : un événement "snapshot" par instantané
+        deadline = time.monotonic() + self.max_duration
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    return
+                self.sent += 1
+                yield f"event: snapshot\nid: {self.sent}\ndata: {json.dumps(snapshot, separators=(',', ':'))}\n\n"
+        finally:
+            self.unsubscribe(queue)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogger:
+    # Journalisation différée (write-behind) des prédictions.
+    #
+    # log() ajoute l'enregistrement à un tampon borné en mémoire, sans I/O :
+    # si le tampon est plein l'enregistrement est abandonné et compté. Une
+    # tâche de fond écrit le tampon avec insert_many dès que batch_size
+    # enregistrements attendent ou toutes les flush_interval secondes.
+
+    def __init__(self, collection, max_buffer=10000, batch_size=500, flush_interval=1.0):
+        self.collection = collection
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self._buffer = deque()
+        self._wake = None
+        self._task = None
+        self._stopping = False
+
+    def log(self, record):
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self._buffer.append(record)
+        self.enqueued += 1
+        if self._wake is not None and len(self._buffer) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        # Arrêt propre : tout ce qui reste dans le tampon est écrit
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        loop = asyncio.get_running_loop()
+        while self._buffer:
+            size = min(self.batch_size, len(self._buffer))
+            documents = [self._buffer.popleft() for _ in range(size)]
+            try:
+                # pymongo est synchrone : l'écriture se fait dans un thread
+                await loop.run_in_executor(None, self._insert, documents)
+            except Exception as e:
+                self.failed += len(documents)
+                logger.warning("Échec d'écriture de %d prédictions: %s", len(documents), e)
+                return
+            self.written += len(documents)
+            self.flushes += 1
+
+    def _insert(self, documents):
+        self.collection.insert_many(documents, ordered=False)
+
+    def stats(self):
+        return {
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
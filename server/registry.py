@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import grid
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT = "model.joblib"
+METADATA = "metadata.json"
+
+# Version servie par tous les workers : écrite par /model/reload (et par
+# serve.py au démarrage), surveillée par chaque worker (ModelManager.watch)
+ACTIVE = "ACTIVE"
+
+# Métadonnées livrées avec un artefact : iris_model.joblib -> iris_model.json
+SIDECAR_SUFFIX = ".json"
+
+# Lots de chauffe : chemin compilé (petits lots) et repli sklearn (gros lots)
+WARMUP_SIZES = (1, 64, 2048)
+
+
+class ModelStore:
+    # Un répertoire par version : <root>/<version>/model.joblib + metadata.json.
+    # Un artefact enregistré n'est jamais modifié.
+
+    def __init__(self, root):
+        self.root = root
+
+    def versions(self):
+        # Versions triées par date d'enregistrement, la plus récente en dernier
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            if os.path.isfile(os.path.join(self.root, name, ARTIFACT)):
+                found.append((self.metadata(name).get("registered_at", ""), name))
+        return [name for _, name in sorted(found)]
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def path(self, version):
+        path = os.path.join(self.root, version, ARTIFACT)
+        if os.path.basename(version) != version or not os.path.isfile(path):
+            raise KeyError(version)
+        return path
+
+    def metadata(self, version):
+        try:
+            with open(os.path.join(self.root, version, METADATA)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def active(self):
+        # Version du pointeur ACTIVE, None s'il est absent ou désigne une
+        # version inconnue
+        try:
+            with open(os.path.join(self.root, ACTIVE)) as f:
+                version = f.read().strip()
+            self.path(version)
+        except (OSError, KeyError):
+            return None
+        return version
+
+    def set_active(self, version):
+        # KeyError si la version est inconnue ; remplacement atomique
+        self.path(version)
+        tmp_path = os.path.join(self.root, f"{ACTIVE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE))
+
+    def register(self, source, version=None, metadata=None):
+        # Copie l'artefact dans un répertoire temporaire renommé à la fin :
+        # une version visible est toujours complète
+        fingerprint = grid.file_fingerprint(source)
+        now = datetime.now(timezone.utc)
+        version = version or f"{now:%Y%m%dT%H%M%S}-{fingerprint[:8]}"
+        target = os.path.join(self.root, version)
+        if os.path.basename(version) != version or os.path.exists(target):
+            raise ValueError(f"Version invalide ou déjà enregistrée: {version}")
+
+        tmp_dir = f"{target}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir)
+        shutil.copyfile(source, os.path.join(tmp_dir, ARTIFACT))
+        with open(os.path.join(tmp_dir, METADATA), "w") as f:
+            json.dump({
+                **read_sidecar(source),
+                **(metadata or {}),
+                "version": version,
+                "fingerprint": fingerprint,
+                "source": os.path.abspath(source),
+                "registered_at": now.isoformat(),
+            }, f, indent=2)
+        os.rename(tmp_dir, target)
+        return version
+
+    def ensure(self, bootstrap_path):
+        # Modèle livré avec l'image enregistré s'il n'y est pas encore (registre
+        # vide, ou image mise à jour sur un registre persistant) : renvoie la
+        # nouvelle version, None s'il y était déjà
+        fingerprint = grid.file_fingerprint(bootstrap_path)
+        if any(self.metadata(version).get("fingerprint") == fingerprint for version in self.versions()):
+            return None
+        return self.register(bootstrap_path)
+
+
+def metadata_path(artifact):
+    return os.path.splitext(artifact)[0] + SIDECAR_SUFFIX
+
+
+def read_sidecar(artifact):
+    # Métadonnées écrites à côté de l'artefact (ex. par train.py), {} sinon
+    try:
+        with open(metadata_path(artifact)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ModelVersion:
+    # Version chargée : tout ce qu'il faut pour prédire, figé après chargement
+
+    def __init__(self, version, path, predictor, model=None, forest=None, decision_grid=None):
+        self.version = version
+        self.path = path
+        self.predictor = predictor
+        self.model = model
+        self.forest = forest
+        self.decision_grid = decision_grid
+        self.fingerprint = grid.file_fingerprint(path)
+        self.loaded_at = datetime.now(timezone.utc)
+
+
+def warmup_batches(sizes=WARMUP_SIZES, seed=0):
+    spec = grid.GridSpec()
+    rng = np.random.default_rng(seed)
+    return [spec.low + rng.random((size, len(spec.low))) * (spec.high - spec.low) for size in sizes]
+
+
+def warm_up(predictor, sizes=WARMUP_SIZES):
+    for batch in warmup_batches(sizes):
+        predictor.predict(batch)
+
+
+class ModelManager:
+    # Détient la version active. Une nouvelle version est chargée et chauffée
+    # en tâche de fond, puis la référence est remplacée d'un coup : une
+    # requête qui a déjà lu `active` termine sur l'ancienne version.
+
+    def __init__(self, store, load_fn, on_swap=None, warmup_sizes=WARMUP_SIZES):
+        self.store = store
+        self.load_fn = load_fn
+        self.on_swap = on_swap
+        self.warmup_sizes = warmup_sizes
+        self.active = None
+        self.loading = None
+        self.last_error = None
+        self.swaps = 0
+        self.requested = None
+        self._task = None
+        self._watch_task = None
+
+    @property
+    def ready(self):
+        return self.active is not None
+
+    def reload(self, version=None, publish=False):
+        # Lance le chargement et rend la main ; KeyError si la version est
+        # inconnue, RuntimeError si un chargement est déjà en cours. Avec
+        # `publish`, la version n'est écrite dans le pointeur ACTIVE (suivi
+        # par les autres workers et au redémarrage) qu'une fois active
+        if self.loading is not None:
+            raise RuntimeError(f"Chargement déjà en cours: {self.loading}")
+        version = version or self.store.latest()
+        if version is None:
+            raise KeyError("Aucune version enregistrée")
+        path = self.store.path(version)
+
+        self.requested = version
+        self.loading = version
+        self._task = asyncio.create_task(self._load(version, path, publish))
+        return version
+
+    async def _load(self, version, path, publish=False):
+        start = time.perf_counter()
+        try:
+            loaded = await asyncio.to_thread(self.load_fn, version, path)
+            await asyncio.to_thread(warm_up, loaded.predictor, self.warmup_sizes)
+            if self.on_swap is not None:
+                await self.on_swap(loaded)
+            self.active = loaded
+            self.swaps += 1
+            self.last_error = None
+            logger.info("Modèle %s actif (%.2fs)", version, time.perf_counter() - start)
+            if publish:
+                # Avant de libérer `loading` : le suivi du pointeur ne doit
+                # pas relire l'ancienne version entre la bascule et l'écriture
+                try:
+                    await asyncio.to_thread(self.store.set_active, version)
+                except (OSError, KeyError) as e:
+                    logger.warning("Écriture du pointeur de version impossible: %s", e)
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            logger.exception("Chargement du modèle %s impossible", version)
+        finally:
+            self.loading = None
+
+    def watch(self, interval):
+        # Suit le pointeur ACTIVE du registre : une bascule demandée à un
+        # worker est reprise par tous les autres en `interval` secondes
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                version = await asyncio.to_thread(self.store.active)
+            except Exception as e:
+                logger.warning("Lecture du pointeur de version impossible: %s", e)
+                continue
+            # Une version déjà demandée n'est pas relancée (même en échec)
+            if version is None or version == self.requested:
+                continue
+            try:
+                self.reload(version)
+                logger.info("Pointeur du registre: chargement de %s", version)
+            except (RuntimeError, KeyError):
+                # Chargement en cours (ou version supprimée entre-temps) :
+                # nouvel essai au prochain tour
+                continue
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self):
+        active = self.active
+        return {
+            "ready": active is not None,
+            "model_version": active.version if active is not None else None,
+            "loaded_at": active.loaded_at.isoformat() if active is not None else None,
+            "loading_version": self.loading,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registre des versions du modèle")
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_DIR", "models"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    register_parser = commands.add_parser("register", help="Enregistre un fichier .joblib")
+    register_parser.add_argument("path")
+    register_parser.add_argument("--version")
+    commands.add_parser("list", help="Liste les versions")
+    args = parser.parse_args(argv)
+
+    store = ModelStore(args.root)
+    if args.command == "register":
+        print(store.register(args.path, version=args.version))
+    else:
+        for version in store.versions():
+            print(version, store.metadata(version).get("registered_at", ""))
+
+
+if __name__ == "__main__":
+    main()
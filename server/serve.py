@@ -0,0 +1,126 @@
+import argparse
+import logging
+import os
+import threading
+
+import uvicorn
+
+import forest
+import registry
+from executor import cpu_count
+
+logger = logging.getLogger("serve")
+
+# Champs de /proc/<pid>/smaps_rollup reportés par worker (en Mo)
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def prepare_model(registry_dir, model_path, version=None):
+    # Exporte la forêt de la version servie avant de démarrer les workers :
+    # ils n'ont plus qu'à la mapper
+    store = registry.ModelStore(registry_dir)
+    bundled = store.ensure(model_path)
+    # Version imposée, sinon le modèle livré s'il vient d'être enregistré
+    # (nouvelle image), sinon celle du dernier /model/reload, sinon la plus
+    # récente ; écrite dans le pointeur suivi par tous les workers
+    version = version or bundled or store.active() or store.latest()
+    if forest.load_shared(store.path(version)) is None:
+        logger.warning("Version %s non compilable : chaque worker chargera son modèle", version)
+    store.set_active(version)
+    return version
+
+
+def worker_pids(parent_pid):
+    # Workers uvicorn lancés en spawn par ce processus (hors resource_tracker)
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if ppid != parent_pid:
+                continue
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    pids.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return sorted(pids)
+
+
+def process_memory(pid):
+    # Mémoire d'un processus en Mo. Pss répartit les pages partagées entre
+    # les processus qui les mappent : c'est le coût réel de chaque worker.
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in MEMORY_FIELDS:
+                memory[name] = int(value.split()[0]) / 1024
+    return memory
+
+
+def report_memory(parent_pid=None):
+    parent_pid = parent_pid or os.getpid()
+    report = {}
+    for pid in worker_pids(parent_pid):
+        try:
+            report[pid] = process_memory(pid)
+        except OSError:
+            continue
+    return report
+
+
+def log_memory(interval, stop):
+    while not stop.wait(interval):
+        report = report_memory()
+        for pid, memory in report.items():
+            logger.info(
+                "worker %d: %s", pid,
+                ", ".join(f"{name}={value:.1f}Mo" for name, value in memory.items())
+            )
+        if report:
+            total_pss = sum(memory.get("Pss", 0) for memory in report.values())
+            logger.info("%d workers, Pss total %.1fMo", len(report), total_pss)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur multi-processus avec modèle partagé")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "0")) or cpu_count(),
+                        help="Processus uvicorn (défaut: nombre de CPU)")
+    parser.add_argument("--memory-report-interval", type=float,
+                        default=float(os.getenv("MEMORY_REPORT_INTERVAL", "60")),
+                        help="Secondes entre deux rapports mémoire par worker (0 = désactivé)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    # Les workers héritent de l'environnement : forêt mappée, et un seul
+    # thread d'inférence chacun puisque les processus occupent déjà les CPU
+    os.environ["SHARED_MODEL"] = "1"
+    os.environ.setdefault("INFERENCE_EXECUTOR", "thread")
+    os.environ.setdefault("INFERENCE_WORKERS", "1")
+
+    # MODEL_VERSION n'est pas transmis aux workers : ils suivent le pointeur,
+    # et un worker redémarré ne revient pas sur un /model/reload
+    version = prepare_model(
+        os.getenv("MODEL_REGISTRY_DIR", "models"),
+        os.getenv("MODEL_PATH", "iris_model.joblib"),
+        os.environ.pop("MODEL_VERSION", None) or None,
+    )
+    logger.info("Version %s, %d workers", version, args.workers)
+
+    stop = threading.Event()
+    if args.memory_report_interval > 0:
+        threading.Thread(target=log_memory, args=(args.memory_report_interval, stop), daemon=True).start()
+    try:
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import csv
+import json
+import math
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    # StreamingResponse écoute normalement la déconnexion en appelant
+    # receive() en parallèle, ce qui consommerait le corps de la requête
+    # encore en cours de lecture. Ici le générateur lit lui-même le corps :
+    # une déconnexion interrompt cette lecture.
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(byte_chunks):
+    # Découpe un flux d'octets en lignes sans attendre la fin du corps
+    pending = b""
+    async for chunk in byte_chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line.decode("utf-8")
+    if pending.strip():
+        yield pending.strip().decode("utf-8")
+
+
+class CsvRowParser:
+    def __init__(self, features):
+        self.features = features
+        self.columns = None
+
+    def parse(self, line):
+        # Renvoie None pour l'en-tête, sinon la ligne dans l'ordre du modèle
+        values = next(csv.reader([line]))
+        if self.columns is None:
+            header = [name.strip() for name in values]
+            missing = [name for name in self.features if name not in header]
+            if missing:
+                raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+            self.columns = [header.index(name) for name in self.features]
+            return None
+        return [float(values[i]) for i in self.columns]
+
+
+class NdjsonRowParser:
+    def __init__(self, features):
+        self.features = features
+
+    def parse(self, line):
+        record = json.loads(line)
+        if isinstance(record, list):
+            if len(record) != len(self.features):
+                raise ValueError(f"{len(self.features)} valeurs attendues")
+            return [float(value) for value in record]
+        return [float(record[name]) for name in self.features]
+
+
+def row_parser(content_type, features):
+    if content_type in CSV_MEDIA_TYPES:
+        return CsvRowParser(features)
+    if content_type in NDJSON_MEDIA_TYPES:
+        return NdjsonRowParser(features)
+    return None
+
+
+async def stream_predictions(byte_chunks, parser, predict, names, chunk_size=1000):
+    # Prédit par blocs de chunk_size lignes et renvoie chaque bloc en NDJSON
+    # dès qu'il est prêt : la mémoire reste bornée par la taille d'un bloc.
+    rows, indices, errors = [], [], []
+    index = 0
+
+    async def flush():
+        lines = [json.dumps(error) for error in errors]
+        if rows:
+            predictions = await predict(np.asarray(rows, dtype=np.float64))
+            for row_index, prediction in zip(indices, predictions):
+                prediction = int(prediction)
+                lines.append(json.dumps({
+                    "row": row_index,
+                    "prediction": prediction,
+                    "flower_name": names[prediction]
+                }))
+        rows.clear()
+        indices.clear()
+        errors.clear()
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    async for line in iter_lines(byte_chunks):
+        try:
+            row = parser.parse(line)
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            if isinstance(parser, CsvRowParser) and parser.columns is None:
+                # En-tête invalide : rien ne peut être prédit
+                yield (json.dumps({"error": str(e)}) + "\n").encode("utf-8")
+                return
+            errors.append({"row": index, "error": str(e)})
+            index += 1
+            continue
+        if row is None:
+            continue
+        if not all(math.isfinite(value) for value in row):
+            errors.append({"row": index, "error": "Valeur non finie"})
+            index += 1
+            continue
+
+        rows.append(row)
+        indices.append(index)
+        index += 1
+        if len(rows) + len(errors) >= chunk_size:
+            yield await flush()
+
+    if rows or errors:
+        yield await flush()
@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+import drift
+import forest
+import registry
+
+# Colonnes du jeu iris, dans l'ordre de l'API
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# Même découpage et même modèle de référence que le notebook iris.ipynb
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+BASELINE = {"n_estimators": 100}
+
+# Grille de recherche : forêts réduites, arbres seuls de profondeur bornée,
+# et arbres distillés (appris sur les prédictions de la référence)
+FOREST_GRID = [
+    {"n_estimators": n, "max_depth": depth, "min_samples_leaf": leaf}
+    for n in (5, 10, 25, 50) for depth in (None, 3, 5) for leaf in (1, 3)
+]
+TREE_GRID = [
+    {"max_depth": depth, "criterion": criterion}
+    for depth in (2, 3, 4, 5, None) for criterion in ("gini", "entropy")
+]
+DISTILLED_GRID = [{"max_depth": depth} for depth in (2, 3, 4, 5)]
+
+# Validation croisée sur le jeu d'entraînement
+CV_FOLDS = 5
+
+# Modèles entraînés et scores de validation croisée déjà calculés
+CACHE_DIR = os.getenv("TRAINING_CACHE_DIR", ".training_cache")
+
+# Points synthétiques étiquetés par la référence pour la distillation
+DISTILLATION_SAMPLES = 20000
+
+# Taille du lot pour la latence "batch" (par ligne)
+BATCH_ROWS = 1024
+
+# Écart relatif de latence en deçà duquel deux candidats sont à égalité :
+# départagés par la taille, pas par le bruit de mesure
+LATENCY_MARGIN = float(os.getenv("LATENCY_MARGIN", "0.1"))
+
+# Tours de mesure des latences (médiane par candidat)
+LATENCY_ROUNDS = 15
+
+
+def load_data():
+    # Colonnes dans l'ordre de l'API (FEATURES du serveur) ; entraîné sur un
+    # tableau NumPy, le modèle n'a pas à reconstruire de DataFrame à chaque appel
+    data = load_iris()
+    return train_test_split(data.data, data.target, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+
+def distill(teacher, X_train, max_depth, samples=DISTILLATION_SAMPLES, seed=RANDOM_STATE):
+    # Arbre unique appris sur les prédictions de la référence, sur les
+    # données d'entraînement et des points tirés autour d'elles
+    rng = np.random.default_rng(seed)
+    rows = X_train[rng.integers(len(X_train), size=samples)]
+    noise = rng.normal(scale=X_train.std(axis=0) * 0.25, size=rows.shape)
+    X = np.vstack([X_train, rows + noise])
+    student = DecisionTreeClassifier(max_depth=max_depth, random_state=seed)
+    return student.fit(X, teacher.predict(X))
+
+
+def search_space():
+    # (nom, famille, paramètres), la référence en premier
+    yield "baseline", "forest", BASELINE
+    for params in FOREST_GRID:
+        yield f"forest-{params['n_estimators']}-d{params['max_depth']}-l{params['min_samples_leaf']}", "forest", params
+    for params in TREE_GRID:
+        yield f"tree-d{params['max_depth']}-{params['criterion']}", "tree", params
+    for params in DISTILLED_GRID:
+        yield f"distilled-d{params['max_depth']}", "distilled", params
+
+
+def build(family, params, X, y):
+    if family == "forest":
+        return RandomForestClassifier(**params, random_state=RANDOM_STATE).fit(X, y)
+    if family == "tree":
+        return DecisionTreeClassifier(**params, random_state=RANDOM_STATE).fit(X, y)
+    if family == "distilled":
+        # Le professeur est la référence, réentraînée sur les mêmes données
+        return distill(build("forest", BASELINE, X, y), X, params["max_depth"])
+    raise ValueError(f"Famille inconnue: {family}")
+
+
+def dataset_hash(X, y):
+    digest = hashlib.sha256()
+    for array in (X, y):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(family, params, dataset, folds):
+    # Tout ce qui change le modèle ou ses scores : une configuration
+    # inchangée n'est jamais réentraînée
+    payload = {
+        "family": family,
+        "params": params,
+        "dataset": dataset,
+        "folds": folds,
+        "random_state": RANDOM_STATE,
+        "distillation_samples": DISTILLATION_SAMPLES if family == "distilled" else None,
+        # Un arbre distillé dépend aussi de la référence qui l'étiquette
+        "teacher": BASELINE if family == "distilled" else None,
+        "versions": {"sklearn": sklearn.__version__, "numpy": np.__version__},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def fit_config(family, params, X, y, folds, cache_dir):
+    # Scores de validation croisée et modèle final d'une configuration, lus
+    # dans le cache ou calculés puis écrits (renommage atomique : plusieurs
+    # workers peuvent écrire la même entrée sans la corrompre)
+    key = cache_key(family, params, dataset_hash(X, y), folds)
+    directory = os.path.join(cache_dir, key[:2], key)
+    model_path = os.path.join(directory, "model.joblib")
+    scores_path = os.path.join(directory, "cv.json")
+    if os.path.isfile(model_path) and os.path.isfile(scores_path):
+        with open(scores_path) as f:
+            return key, json.load(f), model_path, True
+
+    scores = []
+    for train_index, test_index in StratifiedKFold(folds, shuffle=True, random_state=RANDOM_STATE).split(X, y):
+        model = build(family, params, X[train_index], y[train_index])
+        scores.append(float(np.mean(model.predict(X[test_index]) == y[test_index])))
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    joblib.dump(build(family, params, X, y), os.path.join(tmp_dir, "model.joblib"))
+    with open(os.path.join(tmp_dir, "cv.json"), "w") as f:
+        json.dump(scores, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Déjà écrit par un autre worker : même clé, même contenu
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return key, scores, model_path, False
+
+
+def search(X, y, folds=CV_FOLDS, cache_dir=CACHE_DIR, n_jobs=-1):
+    # Validation croisée de toute la grille, une configuration par cœur
+    space = list(search_space())
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(fit_config)(family, params, X, y, folds, cache_dir) for _, family, params in space
+    )
+    return [
+        {"name": name, "family": family, "params": params, "cache_key": key,
+         "cv_accuracy": float(np.mean(scores)), "cv_std": float(np.std(scores)),
+         "cached": cached, "model_path": model_path}
+        for (name, family, params), (key, scores, model_path, cached) in zip(space, fitted)
+    ]
+
+
+def _calibrate(fn, min_time=0.01):
+    # Nombre d'appels par mesure, calibré comme timeit
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time or number >= 1 << 20:
+            return number
+        number *= 2
+
+
+def _time_calls(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def evaluate(model, X_test, y_test):
+    # Précision sur le jeu de test réservé, taille sérialisée, et prédicteur
+    # du chemin du serveur (forêt compilée pour les petits lots, sklearn
+    # au-delà) pour measure_latencies
+    predictor = forest.ForestPredictor(model, forest.compile_model(model))
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return predictor, {
+        "test_accuracy": float(np.mean(predictor.predict(X_test) == y_test)),
+        "size_bytes": len(buffer.getvalue()),
+        "compiled": predictor.forest is not None,
+    }
+
+
+def measure_latencies(predictors, X_test, rounds=LATENCY_ROUNDS, seed=0):
+    # Latences médianes (à l'unité, par ligne d'un lot) sur `rounds` tours.
+    # Dans chaque tour, les candidats sont mesurés à tour de rôle : une
+    # dérive de la machine (fréquence CPU, autre charge) touche tous les
+    # candidats au lieu d'en avantager un.
+    rng = np.random.default_rng(seed)
+    row = X_test[:1]
+    batch = X_test[rng.integers(len(X_test), size=BATCH_ROWS)]
+    calls = [
+        [(lambda p=predictor: p.predict(row)), (lambda p=predictor: p.predict(batch))]
+        for predictor in predictors
+    ]
+    numbers = [[_calibrate(fn) for fn in fns] for fns in calls]
+    timings = np.empty((rounds, len(calls), 2))
+    for round_index in range(rounds):
+        for index, (fns, counts) in enumerate(zip(calls, numbers)):
+            for kind, (fn, number) in enumerate(zip(fns, counts)):
+                timings[round_index, index, kind] = _time_calls(fn, number)
+    medians = np.median(timings, axis=0)
+    return [
+        {"row_latency_us": float(row_s * 1e6), "batch_latency_us_per_row": float(batch_s * 1e6 / BATCH_ROWS)}
+        for row_s, batch_s in medians
+    ]
+
+
+def select(results, tolerance, margin=LATENCY_MARGIN):
+    # Parmi les candidats à moins de `tolerance` de la précision de référence
+    # en validation croisée (moins bruitée que les 30 lignes du jeu de test),
+    # ceux à moins de `margin` du plus rapide à l'unité sont à égalité : le
+    # plus petit l'emporte, puis le nom. La latence par lot, trop bruitée
+    # entre petits arbres, n'est que rapportée. Deux entraînements sur le
+    # même cache exportent ainsi le même modèle.
+    baseline = results[0]["cv_accuracy"]
+    eligible = [result for result in results if result["cv_accuracy"] >= baseline - tolerance]
+    fastest = min(result["row_latency_us"] for result in eligible)
+    tied = [result for result in eligible if result["row_latency_us"] <= fastest * (1 + margin)]
+    return min(tied, key=lambda r: (r["size_bytes"], r["name"]))
+
+
+def train(tolerance=0.0, cache_dir=CACHE_DIR, n_jobs=-1, margin=LATENCY_MARGIN):
+    X_train, X_test, y_train, y_test = load_data()
+    results = search(X_train, y_train, cache_dir=cache_dir, n_jobs=n_jobs)
+
+    # Latences mesurées ici, en série : en parallèle elles seraient faussées
+    predictors = []
+    for result in results:
+        predictor, scores = evaluate(joblib.load(result["model_path"]), X_test, y_test)
+        predictors.append(predictor)
+        result.update(scores)
+    for result, latencies in zip(results, measure_latencies(predictors, X_test)):
+        result.update(latencies)
+
+    selected = select(results, tolerance, margin)
+    report = {
+        "tolerance": tolerance,
+        "latency_margin": margin,
+        "baseline": results[0],
+        "selected": selected,
+        "candidates": results,
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "cv_folds": CV_FOLDS,
+        "dataset": dataset_hash(X_train, y_train),
+        "cache_hits": sum(result["cached"] for result in results),
+        "profile": drift.training_profile(X_train, FEATURES),
+    }
+    return joblib.load(selected["model_path"]), report
+
+
+def metadata(report):
+    # Métadonnées de l'artefact, reprises par le registre (visibles sur /model)
+    selected = report["selected"]
+    return {
+        "training": {
+            "candidate": selected["name"],
+            "family": selected["family"],
+            "params": selected["params"],
+            "cv_accuracy": selected["cv_accuracy"],
+            "test_accuracy": selected["test_accuracy"],
+            "row_latency_us": selected["row_latency_us"],
+            "baseline_cv_accuracy": report["baseline"]["cv_accuracy"],
+            "dataset": report["dataset"],
+            "cache_key": selected["cache_key"],
+            "versions": {"sklearn": sklearn.__version__, "numpy": np.__version__},
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        # Distribution d'entraînement, référence du suivi de dérive (/drift)
+        "profile": report["profile"],
+    }
+
+
+def print_report(report):
+    print(f"{'candidat':<28} {'CV':>6} {'test':>6} {'1 ligne (µs)':>13} {'lot (µs/ligne)':>15} {'taille (Ko)':>12}")
+    for result in report["candidates"]:
+        marker = " *" if result["name"] == report["selected"]["name"] else ""
+        print(
+            f"{result['name']:<28} {result['cv_accuracy']:>6.3f} {result['test_accuracy']:>6.3f} "
+            f"{result['row_latency_us']:>13.1f} {result['batch_latency_us_per_row']:>15.3f} "
+            f"{result['size_bytes'] / 1024:>12.1f}{marker}"
+        )
+    print(f"{report['cache_hits']}/{len(report['candidates'])} configurations lues dans le cache")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraîne le modèle iris et exporte la variante compactée la plus rapide")
+    # Par défaut hors du modèle livré (MODEL_PATH) : l'artefact attend dans
+    # le registre d'être enregistré comme version (--register)
+    parser.add_argument("--output", default=os.path.join(os.getenv("MODEL_REGISTRY_DIR", "models"), "staging", "iris_model.joblib"))
+    parser.add_argument("--report", default="training_report.json")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("ACCURACY_TOLERANCE", "0")),
+                        help="Perte de précision acceptée par rapport à la référence (0.02 = 2 points)")
+    parser.add_argument("--latency-margin", type=float, default=LATENCY_MARGIN,
+                        help="Écart de latence traité comme une égalité (0.1 = 10 %%), départagé par la taille")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--jobs", type=int, default=int(os.getenv("TRAINING_JOBS", "-1")),
+                        help="Configurations entraînées en parallèle (-1 = tous les cœurs)")
+    parser.add_argument("--register", action="store_true",
+                        help="Enregistre aussi le modèle comme nouvelle version du registre")
+    args = parser.parse_args(argv)
+
+    model, report = train(args.tolerance, args.cache_dir, args.jobs, args.latency_margin)
+    print_report(report)
+
+    # L'artefact et ses métadonnées, lues par le registre à l'enregistrement
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    joblib.dump(model, args.output)
+    with open(registry.metadata_path(args.output), "w") as f:
+        json.dump(metadata(report), f, indent=2)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{report['selected']['name']} exporté dans {args.output}, rapport dans {args.report}")
+
+    if args.register:
+        store = registry.ModelStore(os.getenv("MODEL_REGISTRY_DIR", "models"))
+        print(store.register(args.output))
+
+
+if __name__ == "__main__":
+    main()
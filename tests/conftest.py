@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Modules du serveur importés à plat, comme dans l'image Docker
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+sys.path.insert(0, SERVER_DIR)
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    # Application complète sans MongoDB, registre et états dans un répertoire temporaire
+    root = tmp_path_factory.mktemp("server")
+    os.environ.pop("MONGODB_URL", None)
+    os.environ.update({
+        "MODEL_PATH": os.path.join(SERVER_DIR, "iris_model.joblib"),
+        "MODEL_REGISTRY_DIR": str(root / "models"),
+        "DRIFT_DIR": str(root / "drift_state"),
+        "GRID_DIR": str(root / "grids"),
+        "MONITOR_DIR": str(root / "monitor_state"),
+    })
+    import app
+    from fastapi.testclient import TestClient
+
+    with TestClient(app.app) as client:
+        deadline = time.monotonic() + 30
+        while client.get("/health").status_code != 200:
+            assert time.monotonic() < deadline, "Modèle non chargé"
+            time.sleep(0.1)
+        yield client
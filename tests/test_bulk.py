@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", '"x"', "3", "null", "{", '{"items": "x"}'])
+def test_malformed_json_body_is_rejected(api, body):
+    response = api.post("/predict/bulk", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+
+
+def test_json_body_keeps_batch_contract(api):
+    item = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+    batch = api.post("/predict/batch", json={"items": [item, item]})
+    bulk = api.post("/predict/bulk", json={"items": [item, item]})
+    assert bulk.status_code == 200
+    assert bulk.json()["predictions"] == batch.json()["predictions"]
@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+
+import drift
+
+ROW = {"sepal_length": 5.8, "sepal_width": 3.0, "petal_length": 4.3, "petal_width": 1.3}
+
+
+def test_non_finite_values_are_ignored():
+    X = np.random.default_rng(0).uniform(1, 7, size=(100, 4))
+    monitor = drift.DriftMonitor(["a", "b", "c", "d"])
+    monitor.set_profile(drift.training_profile(X, monitor.features))
+
+    monitor.observe([math.nan, 3.0, 4.3, 1.3])
+    monitor.observe([5.8, math.inf, 4.3, 1.3])
+    monitor.observe_many(np.array([[5.8, 3.0, -math.inf, 1.3], [5.8, 3.0, 4.3, math.nan]]))
+    monitor.observe_many(X[:10])
+
+    summary = monitor.summary()
+    assert summary["count"] == 10
+    for feature in summary["features"].values():
+        assert math.isfinite(feature["mean"]) and math.isfinite(feature["psi"])
+
+
+def test_nan_requests_do_not_break_drift(api):
+    before = api.get("/drift").json()["count"]
+
+    # NaN est accepté par le décodage JSON et par pydantic
+    api.post("/predict/", content='{"sepal_length": NaN, "sepal_width": 3.0, "petal_length": 4.3, "petal_width": 1.3}',
+             headers={"Content-Type": "application/json"})
+    api.post("/predict/batch", content='{"sepal_length": [NaN, 5.8], "sepal_width": [3.0, Infinity], '
+                                       '"petal_length": [4.3, 4.3], "petal_width": [1.3, 1.3]}',
+             headers={"Content-Type": "application/json"})
+    assert api.post("/predict/", json=ROW).status_code == 200
+
+    response = api.get("/drift")
+    assert response.status_code == 200
+    assert response.json()["count"] == before + 1
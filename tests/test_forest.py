@@ -0,0 +1,69 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+import forest
+from conftest import SERVER_DIR
+
+
+def boundary_points(model, seed=0):
+    # Pour chaque seuil de chaque arbre : le seuil lui-même et ses voisins
+    # float32 et float64 immédiats, les autres colonnes tirées au hasard
+    rng = np.random.default_rng(seed)
+    iris = load_iris().data
+    rows = []
+    estimators = getattr(model, "estimators_", [model])
+    for estimator in estimators:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue
+            for value in (
+                threshold,
+                np.nextafter(threshold, np.inf),
+                np.nextafter(threshold, -np.inf),
+                np.float64(np.float32(threshold)),
+                np.float64(np.nextafter(np.float32(threshold), np.float32(np.inf))),
+                np.float64(np.nextafter(np.float32(threshold), np.float32(-np.inf))),
+            ):
+                row = iris[rng.integers(len(iris))].copy()
+                row[feature] = value
+                rows.append(row)
+    return np.asarray(rows)
+
+
+@pytest.fixture(scope="module")
+def models():
+    X, y = load_iris(return_X_y=True)
+    return {
+        "bundled": joblib.load(os.path.join(SERVER_DIR, "iris_model.joblib")),
+        "forest": RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y),
+        "tree": DecisionTreeClassifier(random_state=0).fit(X, y),
+    }
+
+
+@pytest.mark.parametrize("name", ["bundled", "forest", "tree"])
+def test_compiled_forest_matches_sklearn(models, name):
+    model = models[name]
+    compiled = forest.CompiledForest.from_sklearn(model)
+    data = np.vstack([forest.parity_inputs(), boundary_points(model)])
+
+    expected = model.predict(forest.as_model_input(model, data))
+    np.testing.assert_array_equal(compiled.predict(data), expected)
+    # Ligne à ligne : même résultat que par lot
+    np.testing.assert_array_equal([compiled.predict(row[None])[0] for row in data[:200]], expected[:200])
+
+
+def test_saved_forest_matches_sklearn(models, tmp_path):
+    model = models["bundled"]
+    forest.CompiledForest.from_sklearn(model).save(str(tmp_path / "forest"))
+    loaded = forest.CompiledForest.load(str(tmp_path / "forest"))
+
+    data = np.vstack([forest.parity_inputs(1000), boundary_points(model)])
+    expected = model.predict(forest.as_model_input(model, data))
+    np.testing.assert_array_equal(loaded.predict(data), expected)
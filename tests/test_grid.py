@@ -0,0 +1,42 @@
+import numpy as np
+
+import grid
+
+
+class FakeModel:
+    # Classe = partie entière de la première variable
+    def predict(self, data):
+        data = np.asarray(data)
+        return np.floor(data[:, 0]).astype(np.intp) % 3
+
+
+def test_decimals_follow_step():
+    assert grid.GridSpec(step=0.1).decimals == 1
+    assert grid.GridSpec(step=0.25).decimals == 2
+    assert grid.GridSpec(step=0.05).decimals == 2
+    assert grid.GridSpec(step=1.0).decimals == 0
+
+
+def test_quarter_step_points_are_exact(tmp_path):
+    spec = grid.GridSpec(low=(4.0, 2.0, 1.0, 0.25), high=(5.0, 2.5, 1.5, 0.75), step=0.25)
+    assert spec.points(np.arange(spec.size))[:, 3].tolist()[:3] == [0.25, 0.5, 0.75]
+    decision = grid.load_or_build(str(tmp_path), "model", spec, FakeModel().predict)
+
+    assert decision.lookup_one([4.25, 2.25, 1.25, 0.25]) is not None
+    assert decision.locate(np.array([[4.25, 2.25, 1.25, 0.75]]))[0] >= 0
+
+
+def test_batch_path_counts_hits_and_misses(tmp_path):
+    spec = grid.GridSpec(low=(4.0, 2.0, 1.0, 0.1), high=(5.0, 2.5, 1.5, 0.5), step=0.1)
+    model = FakeModel()
+    decision = grid.load_or_build(str(tmp_path), "model", spec, model.predict)
+    predictor = grid.GridPredictor(decision, model)
+
+    data = np.array([
+        [4.1, 2.2, 1.3, 0.4],
+        [4.9, 2.5, 1.0, 0.1],
+        [4.15, 2.2, 1.3, 0.4],   # entre deux points
+        [9.0, 2.2, 1.3, 0.4],    # hors grille
+    ])
+    assert predictor.predict(data).tolist() == model.predict(data).tolist()
+    assert (decision.hits, decision.misses) == (2, 2)
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+
+import pandas as pd
+
+# Modules du client importés à plat, comme dans l'image Docker ; après
+# ceux du serveur (client/app.py masquerait server/app.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "client"))
+
+import ingest  # noqa: E402
+
+HEADER = "sepal_length,sepal_width,petal_length,petal_width\n"
+ROW = "5.1,3.5,1.4,0.2\n"
+
+
+def read(text, chunk_size):
+    report = ingest.Report()
+    chunks = list(ingest.read_chunks(io.BytesIO(text.encode()), chunk_size, report))
+    return chunks, report
+
+
+def test_line_numbers_in_tolerant_mode():
+    # Ligne mal formée, ligne vide et valeur non numérique : les numéros
+    # signalés sont ceux du fichier, en-tête compris, quel que soit le bloc
+    lines = [ROW] * 10
+    lines[2] = "5.1,3.5,1.4,0.2,9,9\n"   # ligne 4
+    lines[4] = "\n"                      # ligne 6
+    lines[7] = "5.1,abc,1.4,0.2\n"       # ligne 9
+    lines[8] = "5.1,3.5,1.4,99\n"        # ligne 10
+    for chunk_size in (2, 3, 4, 100):
+        chunks, report = read(HEADER + "".join(lines), chunk_size)
+        assert report.rows == 10
+        assert sum(len(frame) for _, frame, _ in chunks) == 10
+        assert [(e["ligne"], e["motif"]) for e in report.examples] == [
+            (4, "ligne mal formée"),
+            (6, "valeur manquante ou non numérique"),
+            (9, "valeur manquante ou non numérique"),
+            (10, "valeur hors bornes"),
+        ]
+        assert (report.malformed, report.missing, report.out_of_range) == (1, 2, 1)
+
+
+def test_strict_mode_keeps_blank_lines():
+    chunks, report = read(HEADER + ROW + "\n" + ROW, 2)
+    assert [e["ligne"] for e in report.examples] == [3]
+    assert [start for start, _, _ in chunks] == [0, 2]
+
+
+def test_result_writer_keeps_file_order(tmp_path):
+    chunks, _ = read(HEADER + ROW * 2 + "\n" + ROW * 4, 2)
+    writer = ingest.ResultWriter()
+    try:
+        sent = list(writer.track(iter(chunks)))
+        assert [start for start, _ in sent] == [0, 2, 4, 6]
+        # Réponses dans le désordre, une requête en échec, une sans réponse
+        writer.resolve(4, ["Virginica", "Virginica"])
+        writer.resolve(2, ["Versicolor"])
+        assert writer.rows == 0
+        writer.resolve(0, None)
+        assert writer.rows == 6
+        writer.close()
+
+        result = pd.read_csv(writer.path)
+        assert result["Prédiction"].tolist() == [
+            ingest.ERROR_LABEL, ingest.ERROR_LABEL,
+            ingest.INVALID_LABEL, "Versicolor",
+            "Virginica", "Virginica",
+            ingest.ERROR_LABEL,
+        ]
+        assert writer.rows == 7
+        assert writer.counts["Virginica"] == 2
+        # Pages lues à partir de la position des blocs, y compris à cheval
+        for start in range(7):
+            page = writer.read_page(start, 3)
+            pd.testing.assert_frame_equal(page, result.iloc[start:start + 3].reset_index(drop=True))
+        assert writer.read_page(7, 3).empty
+    finally:
+        os.remove(writer.path)
@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+import metrics
+import monitor
+
+
+def window(pid, requests, latency, ready=True, version="v1", microbatch=None, interval=2.0):
+    return {
+        "t": 1000.0,
+        "interval_s": interval,
+        "pid": pid,
+        "health": {"status": "healthy", "ready": ready, "model_version": version},
+        "queues": {"microbatch": microbatch, "admission": {"/predict/": {"in_flight": 1, "queued": 2}}},
+        "requests": requests,
+        "errors": 0,
+        "latency": latency,
+    }
+
+
+def test_merge_sums_workers():
+    buckets = len(metrics.http_latency.buckets) + 1
+    fast = [10] + [0] * (buckets - 1)
+    slow = [0] * (buckets - 2) + [10, 0]
+    merged = monitor.merge(
+        window(1, {"/predict/": 20}, {"/predict/": fast}),
+        [window(2, {"/predict/": 10}, {"/predict/": slow}, ready=False, version=None, interval=1.0)],
+    )
+    # Débits : 20 / 2 s + 10 / 1 s
+    assert merged["throughput"]["requests_per_s"] == 20.0
+    assert merged["throughput"]["routes"] == {"/predict/": 20.0}
+    # Percentiles sur les histogrammes additionnés : moitié rapide, moitié lente
+    assert merged["latency_ms"]["p50"] <= metrics.http_latency.buckets[0] * 1000
+    assert merged["latency_ms"]["p99"] > metrics.http_latency.buckets[-3] * 1000
+    assert merged["queues"] == {"microbatch": None, "admission": {"/predict/": {"in_flight": 2, "queued": 4}}}
+    assert merged["health"]["ready"] is False
+    assert merged["health"]["model_versions"] == ["v1"]
+    assert [worker["pid"] for worker in merged["workers"]] == [1, 2]
+
+
+def test_first_window_has_no_rate():
+    merged = monitor.merge(window(1, {}, {}, interval=None), [])
+    assert merged["throughput"]["requests_per_s"] is None
+    assert merged["latency_ms"]["p50"] is None
+
+
+def test_exchange_reads_recent_workers(tmp_path):
+    hub = monitor.MonitorHub(lambda: {}, interval=1.0, directory=str(tmp_path))
+    (tmp_path / "worker-1.json").write_text(json.dumps(window(1, {}, {})))
+    stale = tmp_path / "worker-2.json"
+    stale.write_text(json.dumps(window(2, {}, {})))
+    os.utime(stale, (0, 0))
+
+    others = hub._exchange(window(os.getpid(), {}, {}))
+    assert [other["pid"] for other in others] == [1]
+    assert json.loads((tmp_path / f"worker-{os.getpid()}.json").read_text())["pid"] == os.getpid()
+
+
+def test_app_merges_workers(api):
+    import app
+
+    # Fenêtre d'un autre worker publiée dans le répertoire partagé ; la
+    # tâche de fond (lancée au démarrage) la fusionne au prochain intervalle
+    path = os.path.join(app.monitor_hub.directory, "worker-999999.json")
+    deadline = time.monotonic() + 10
+    try:
+        while True:
+            with open(path, "w") as f:
+                json.dump(window(999999, {"/predict/": 50}, {}, microbatch=3, interval=1.0), f)
+            snapshot = app.monitor_hub._latest
+            if snapshot is not None and len(snapshot["workers"]) == 2 and snapshot["interval_s"] is not None:
+                break
+            assert time.monotonic() < deadline, "Fenêtre de l'autre worker non fusionnée"
+            time.sleep(0.2)
+        assert [worker["pid"] for worker in snapshot["workers"]] == [os.getpid(), 999999]
+        assert snapshot["throughput"]["requests_per_s"] >= 50
+        assert snapshot["queues"]["microbatch"] >= 3
+    finally:
+        os.remove(path)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+import registry
+from conftest import SERVER_DIR
+
+MODEL = os.path.join(SERVER_DIR, "iris_model.joblib")
+
+
+class FakePredictor:
+    def predict(self, data):
+        return data[:, 0]
+
+
+def load(version, path):
+    return registry.ModelVersion(version, path, FakePredictor())
+
+
+def test_workers_follow_the_active_pointer(tmp_path):
+    store = registry.ModelStore(str(tmp_path))
+    store.register(MODEL, version="v1")
+    store.register(MODEL, version="v2")
+    store.set_active("v1")
+
+    async def scenario():
+        # Deux workers du même registre ; /model/reload reçu par le premier
+        workers = [registry.ModelManager(store, load, warmup_sizes=(1,)) for _ in range(2)]
+        for manager in workers:
+            manager.reload(store.active())
+            await manager.wait()
+            manager.watch(0.01)
+
+        workers[0].reload("v2")
+        store.set_active("v2")
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if all(manager.ready and manager.active.version == "v2" for manager in workers):
+                break
+        versions = [manager.active.version for manager in workers]
+        for manager in workers:
+            await manager.stop()
+        return versions
+
+    assert asyncio.run(scenario()) == ["v2", "v2"]
+
+
+def test_active_pointer_ignores_unknown_versions(tmp_path):
+    store = registry.ModelStore(str(tmp_path))
+    assert store.active() is None
+    store.register(MODEL, version="v1")
+    (tmp_path / registry.ACTIVE).write_text("absente")
+    assert store.active() is None
+
+
+def test_pointer_written_only_after_successful_swap(tmp_path):
+    store = registry.ModelStore(str(tmp_path))
+    store.register(MODEL, version="v1")
+    store.register(MODEL, version="broken")
+    store.set_active("v1")
+
+    def load_or_fail(version, path):
+        if version == "broken":
+            raise ValueError("artefact illisible")
+        return load(version, path)
+
+    async def scenario():
+        manager = registry.ModelManager(store, load_or_fail, warmup_sizes=(1,))
+        manager.reload("v1")
+        await manager.wait()
+
+        manager.reload("broken", publish=True)
+        await manager.wait()
+        failed = (manager.active.version, store.active(), manager.last_error is not None)
+
+        store.register(MODEL, version="v2")
+        manager.reload("v2", publish=True)
+        await manager.wait()
+        return failed, (manager.active.version, store.active())
+
+    failed, swapped = asyncio.run(scenario())
+    assert failed == ("v1", "v1", True)
+    assert swapped == ("v2", "v2")
+
+
+def test_ensure_registers_each_bundled_model_once(tmp_path):
+    store = registry.ModelStore(str(tmp_path / "models"))
+    first = store.ensure(MODEL)
+    assert first is not None
+    assert store.ensure(MODEL) is None
+
+    # Image mise à jour : autre artefact au même chemin
+    updated = tmp_path / "iris_model.joblib"
+    updated.write_bytes(open(MODEL, "rb").read() + b"\0")
+    second = store.ensure(str(updated))
+    assert second not in (None, first)
+    assert store.versions() == [first, second]
+    assert store.ensure(str(updated)) is None
@@ -0,0 +1,32 @@
+import train
+
+
+def candidate(name, cv, row_us, size):
+    return {"name": name, "cv_accuracy": cv, "row_latency_us": row_us,
+            "batch_latency_us_per_row": 0.2, "size_bytes": size}
+
+
+def test_select_breaks_latency_ties_on_size():
+    results = [
+        candidate("baseline", 0.95, 900.0, 500000),
+        candidate("tree-d3", 0.95, 84.0, 2100),
+        candidate("distilled-d3", 0.95, 80.0, 2700),
+        candidate("tree-d2", 0.90, 60.0, 1800),
+        candidate("forest-5", 0.95, 95.0, 9000),
+    ]
+    # Écart de 5 % entre les deux arbres : égalité, le plus petit l'emporte
+    assert train.select(results, 0.0, margin=0.1)["name"] == "tree-d3"
+    assert train.select(results, 0.0, margin=0.0)["name"] == "distilled-d3"
+    # Plus de 10 % d'écart : le plus rapide l'emporte malgré sa taille
+    assert train.select(results, 0.05, margin=0.1)["name"] == "tree-d2"
+
+
+def test_select_ignores_measurement_order():
+    results = [
+        candidate("baseline", 0.95, 900.0, 500000),
+        candidate("b", 0.95, 80.0, 2000),
+        candidate("a", 0.95, 81.0, 2000),
+    ]
+    forward = train.select(results, 0.0)["name"]
+    backward = train.select([results[0]] + results[:0:-1], 0.0)["name"]
+    assert forward == backward == "a"